@@ -0,0 +1 @@
+"""Benchmark suite for the game core (run with `python -m benchmarks.run`)"""
@@ -0,0 +1,49 @@
+"""Vectorized balance simulator: throughput and agreement with GameLogic."""
+from __future__ import annotations
+
+import random
+import time
+from typing import Callable
+
+import numpy as np
+
+from utils.balance_sim import Policy, band_monsters, cross_check, scalar_fight, simulate_band, starting_loadout
+from utils.game_logic import GameLogic
+
+SEED = 1234
+BAND = 40  # 4000m: every early monster plus the wraith
+
+
+def bench_balance_throughput() -> dict[str, float]:
+    loadout = starting_loadout()
+    policy = Policy()
+    fights = 200_000
+    start = time.perf_counter()
+    simulate_band(BAND, loadout, fights, policy, np.random.default_rng(SEED))
+    vector_seconds = time.perf_counter() - start
+
+    game_logic = GameLogic(random.Random(SEED))
+    monsters, probabilities = band_monsters(BAND)
+    picks = np.random.default_rng(SEED).choice(len(monsters), size=fights // 20, p=probabilities)
+    start = time.perf_counter()
+    for i in picks:
+        scalar_fight(game_logic, loadout, monsters[i], policy)
+    scalar_seconds = time.perf_counter() - start
+    return {
+        "balance_vector_fights_per_sec": fights / vector_seconds,
+        "balance_scalar_fights_per_sec": len(picks) / scalar_seconds,
+    }
+
+
+def bench_balance_cross_check() -> dict[str, float]:
+    """Fails the run outright if the vectorized rules drift from GameLogic."""
+    problems = cross_check(seed=SEED)
+    if problems:
+        raise AssertionError("balance simulator disagrees with GameLogic:\n" + "\n".join(problems))
+    return {"balance_cross_check_mismatches": 0.0}
+
+
+BENCHMARKS: dict[str, Callable[[], dict[str, float]]] = {
+    "balance_throughput": bench_balance_throughput,
+    "balance_cross_check": bench_balance_cross_check,
+}
@@ -0,0 +1,72 @@
+"""Content catalog: load time and the cost of reading through it.
+
+Times a full ``load_catalog`` (read, validate, compile the band tables),
+item and monster lookups by id and by typed name, an event roll through
+``GameLogic`` (which finds the installed tables per roll so reloads take
+effect at once), and ``Player.refresh_definitions`` as run for every
+cached player on ``/reload_content``. Reloading unchanged files must give
+the same version and the same band tables.
+"""
+from __future__ import annotations
+
+import random
+import time
+
+from models import catalog
+from models.dungeon import get_monster_def
+from models.player import Player, find_item_def
+from utils.content import load_catalog
+from utils.game_logic import GameLogic
+
+LOADS = 20
+LOOKUPS = 100_000
+ROLLS = 100_000
+PLAYERS = 2_000
+
+
+def bench_content() -> dict[str, float]:
+    start = time.perf_counter()
+    for _ in range(LOADS):
+        fresh = load_catalog()
+    load = (time.perf_counter() - start) / LOADS
+
+    installed = catalog.current()
+    if fresh.version != installed.version:
+        raise AssertionError(f"reloading unchanged content changed the version: {installed.version} -> {fresh.version}")
+    for old, new in zip(installed.tables.events, fresh.tables.events):
+        if old.outcomes != new.outcomes or old.probabilities() != new.probabilities():
+            raise AssertionError("reloading unchanged content changed the event tables")
+
+    item_keys = [key for item_def in installed.items.values() for key in (item_def.item_id, item_def.name.upper())]
+    monster_keys = [key for monster_def in installed.monsters.values() for key in (monster_def.monster_id, monster_def.name)]
+    start = time.perf_counter()
+    for i in range(LOOKUPS):
+        find_item_def(item_keys[i % len(item_keys)])
+    item_lookup = (time.perf_counter() - start) / LOOKUPS
+    start = time.perf_counter()
+    for i in range(LOOKUPS):
+        get_monster_def(monster_keys[i % len(monster_keys)])
+    monster_lookup = (time.perf_counter() - start) / LOOKUPS
+
+    logic = GameLogic(random.Random(3))
+    start = time.perf_counter()
+    for i in range(ROLLS):
+        logic.tables.roll_event(i % 10_000, logic.rng)
+    roll = (time.perf_counter() - start) / ROLLS
+
+    players = [Player.create(user_id, f"p{user_id}") for user_id in range(PLAYERS)]
+    start = time.perf_counter()
+    for player in players:
+        player.refresh_definitions()
+    refresh = (time.perf_counter() - start) / PLAYERS
+
+    return {
+        "load_ms": load * 1e3,
+        "item_lookup_us": item_lookup * 1e6,
+        "monster_lookup_us": monster_lookup * 1e6,
+        "roll_event_us": roll * 1e6,
+        "refresh_player_us": refresh * 1e6,
+    }
+
+
+BENCHMARKS = {"content": bench_content}
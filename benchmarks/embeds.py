@@ -0,0 +1,104 @@
+"""Per-turn embed building: discord.Embed built inline vs. the utils.embed_templates builders."""
+from __future__ import annotations
+
+import time
+import tracemalloc
+from typing import Callable
+
+import discord
+
+from models.dungeon import MONSTER_CATALOG, Monster
+from models.player import Player
+from utils import embed_templates
+
+CALLS = 50_000
+DESCRIPTION = "⚔️ あなたはオークに**3**ダメージを与えた！\n👹 オークはあなたに**16**ダメージを与えた！\n"
+
+
+def _handwritten_combat(player: Player, monster: Monster, description: str) -> discord.Embed:
+    """What ``CombatCog._send_combat_update_embed`` did before the builders."""
+    embed = discord.Embed(title="⚔️ 戦闘状況", description=description, color=discord.Color.blue())
+    embed.add_field(name="あなた", value=f"HP: {player.hp}/{player.max_hp}", inline=True)
+    embed.add_field(name=f"敵: {monster.name}", value=f"HP: {monster.hp}/{monster.max_hp}", inline=True)
+    embed.set_footer(text=f"距離: {player.distance}m | レベル: {player.level}")
+    return embed
+
+
+def _builder_combat(player: Player, monster: Monster, description: str) -> discord.Embed:
+    return embed_templates.combat(
+        description=description,
+        hp=player.hp,
+        max_hp=player.max_hp,
+        monster=monster.name,
+        monster_hp=monster.hp,
+        monster_max_hp=monster.max_hp,
+        distance=player.distance,
+        level=player.level,
+    )
+
+
+def _handwritten_status(player: Player) -> discord.Embed:
+    embed = discord.Embed(title=f"👤 {player.name} のステータス", color=discord.Color.green())
+    embed.set_thumbnail(url="https://cdn.discordapp.com/embed/avatars/0.png")
+    embed.add_field(name="HP", value=f"{player.hp}/{player.max_hp}", inline=True)
+    embed.add_field(name="攻撃力 (ATK)", value=f"{player.atk}", inline=True)
+    embed.add_field(name="防御力 (DEF)", value=f"{player.def_val}", inline=True)
+    embed.add_field(name="進行距離", value=f"{player.distance}m", inline=False)
+    embed.add_field(name="装備品", value="武器: なし\n防具: なし", inline=False)
+    embed.set_footer(text="装備品はATK/DEFに影響します。")
+    return embed
+
+
+def _builder_status(player: Player) -> discord.Embed:
+    return embed_templates.status(
+        thumbnail="https://cdn.discordapp.com/embed/avatars/0.png",
+        name=player.name,
+        hp=player.hp,
+        max_hp=player.max_hp,
+        atk=player.atk,
+        def_val=player.def_val,
+        distance=player.distance,
+        equipment="武器: なし\n防具: なし",
+    )
+
+
+def _measure(render: Callable[[], discord.Embed], prefix: str) -> dict[str, float]:
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        render()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    render()
+    peak = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return {f"{prefix}_render_us": elapsed / CALLS * 1e6, f"{prefix}_render_bytes": float(peak)}
+
+
+def bench_combat_embed() -> dict[str, float]:
+    player = Player.create(1)
+    monster = Monster(MONSTER_CATALOG["orc"], hp=42)
+    old = _handwritten_combat(player, monster, DESCRIPTION).to_dict()
+    new = _builder_combat(player, monster, DESCRIPTION).to_dict()
+    if old != new:
+        raise AssertionError(f"builder payload differs:\n{old}\n{new}")
+    results = _measure(lambda: _handwritten_combat(player, monster, DESCRIPTION), "combat_handwritten")
+    results.update(_measure(lambda: _builder_combat(player, monster, DESCRIPTION), "combat_builder"))
+    return results
+
+
+def bench_status_embed() -> dict[str, float]:
+    player = Player.create(1)
+    if _handwritten_status(player).to_dict() != _builder_status(player).to_dict():
+        raise AssertionError("status builder payload differs")
+    results = _measure(lambda: _handwritten_status(player), "status_handwritten")
+    results.update(_measure(lambda: _builder_status(player), "status_builder"))
+    return results
+
+
+BENCHMARKS: dict[str, Callable[[], dict[str, float]]] = {
+    "combat_embed": bench_combat_embed,
+    "status_embed": bench_status_embed,
+}
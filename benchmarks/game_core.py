@@ -0,0 +1,87 @@
+"""GameLogic throughput and latency benchmarks."""
+from __future__ import annotations
+
+import random
+import time
+from typing import Callable
+
+from models.dungeon import MONSTER_CATALOG, Monster
+from models.player import ITEM_CATALOG, Player
+from utils.game_logic import GameLogic
+from utils.item_search import held_matches
+from utils.simulation import run_simulation
+
+SEED = 1234
+
+
+def _per_call_us(func: Callable[[], object], calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def bench_generate_event() -> dict[str, float]:
+    game_logic = GameLogic(random.Random(SEED))
+    player = Player.create(1)
+    results = {}
+    for distance in (0, 5000, 9999):
+        player.distance = distance
+        results[f"generate_event_{distance}m_us"] = _per_call_us(lambda: game_logic.generate_event(player), 200_000)
+    return results
+
+
+def bench_combat_formulas() -> dict[str, float]:
+    game_logic = GameLogic(random.Random(SEED))
+    player = Player.create(1)
+    monster = Monster(MONSTER_CATALOG["orc"])
+    return {
+        "calculate_damage_us": _per_call_us(lambda: game_logic.calculate_damage(player, monster), 200_000),
+        "calculate_monster_attack_us": _per_call_us(
+            lambda: game_logic.calculate_monster_attack(monster, player), 200_000
+        ),
+        "attempt_escape_us": _per_call_us(lambda: game_logic.attempt_escape(player, monster), 200_000),
+    }
+
+
+def bench_handle_monster_defeat() -> dict[str, float]:
+    game_logic = GameLogic(random.Random(SEED))
+    player = Player.create(1)
+    monster = Monster(MONSTER_CATALOG["goblin"])
+
+    def defeat() -> None:
+        game_logic.handle_monster_defeat(player, monster)
+        if len(player.inventory) > 20:
+            player.inventory.clear()
+
+    return {"handle_monster_defeat_us": _per_call_us(defeat, 100_000)}
+
+
+def bench_item_lookup() -> dict[str, float]:
+    """/equip lookups and per-keystroke autocomplete for a player holding every catalog item."""
+    player = Player.create(1)
+    for item_def in ITEM_CATALOG.values():
+        player.add_item(item_def, 5)
+    return {
+        "find_item_typed_name_us": _per_call_us(lambda: player.find_item("ミスリルの剣"), 200_000),
+        "autocomplete_equip_us": _per_call_us(lambda: held_matches(player.inventory, "剣", ("weapon", "armor")), 50_000),
+        "autocomplete_item_empty_us": _per_call_us(lambda: held_matches(player.inventory, "", ("consumable",)), 50_000),
+    }
+
+
+def bench_simulation() -> dict[str, float]:
+    report = run_simulation(players=1000, actions_per_player=200, seed=SEED, profile=False)
+    traced = run_simulation(players=200, actions_per_player=200, seed=SEED, profile=False, trace_allocations=True)
+    return {
+        "simulation_actions_per_sec": report.actions_per_second,
+        "simulation_alloc_bytes_per_action": traced.alloc_bytes_per_action or 0.0,
+    }
+
+
+BENCHMARKS: dict[str, Callable[[], dict[str, float]]] = {
+    "generate_event": bench_generate_event,
+    "combat_formulas": bench_combat_formulas,
+    "handle_monster_defeat": bench_handle_monster_defeat,
+    "item_lookup": bench_item_lookup,
+    "simulation": bench_simulation,
+}
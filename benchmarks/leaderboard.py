@@ -0,0 +1,76 @@
+"""Leaderboard queries over a large player base: the rank index vs. a full scan.
+
+Builds ``Leaderboard`` from ``PLAYERS`` synthetic rows (what
+``DataManager.standings`` does at startup), then times "my rank", a top-10
+page and a distance update against scanning every player, as answering
+them straight from the ``players`` rows would. Both answers must agree.
+"""
+from __future__ import annotations
+
+import random
+import time
+from typing import Callable
+
+import config
+from utils.leaderboard import Leaderboard
+
+PLAYERS = 200_000
+QUERIES = 2_000
+SCAN_QUERIES = 20
+
+
+def _rows(rng: random.Random) -> list[tuple[int, str, int, int]]:
+    rows = []
+    for user_id in range(PLAYERS):
+        best = int(rng.expovariate(1 / 800)) % (config.GOAL_DISTANCE + 1)
+        rows.append((user_id, f"p{user_id}", rng.randint(0, best), best))
+    return rows
+
+
+def bench_leaderboard() -> dict[str, float]:
+    rng = random.Random(7)
+    rows = _rows(rng)
+    best = {user_id: value for user_id, _, _, value in rows}
+
+    start = time.perf_counter()
+    leaderboard = Leaderboard.from_rows(rows)
+    build = time.perf_counter() - start
+
+    users = [rng.randrange(PLAYERS) for _ in range(QUERIES)]
+    start = time.perf_counter()
+    for user_id in users:
+        leaderboard.standing("best", user_id)
+    rank = (time.perf_counter() - start) / QUERIES
+
+    start = time.perf_counter()
+    for i in range(QUERIES):
+        leaderboard.top("best", 10, offset=(i % 50) * 10)
+    top = (time.perf_counter() - start) / QUERIES
+
+    start = time.perf_counter()
+    for user_id in users:
+        current = rng.randint(0, 12_000)
+        best[user_id] = max(best[user_id], current)
+        leaderboard.update(user_id, f"p{user_id}", current, best[user_id])
+    update = (time.perf_counter() - start) / QUERIES
+
+    start = time.perf_counter()
+    for user_id in users[:SCAN_QUERIES]:
+        value = best[user_id]
+        scan_rank = 1 + sum(1 for other in best.values() if other > value)
+        if scan_rank != leaderboard.standing("best", user_id).rank:
+            raise AssertionError(f"rank of {user_id} disagrees with a full scan")
+    scan = (time.perf_counter() - start) / SCAN_QUERIES
+
+    return {
+        "leaderboard_build_ms": build * 1e3,
+        "leaderboard_rank_us": rank * 1e6,
+        "leaderboard_top10_us": top * 1e6,
+        "leaderboard_update_us": update * 1e6,
+        "scan_rank_us": scan * 1e6,
+    }
+
+
+BENCHMARKS: dict[str, Callable[[], dict[str, float]]] = {
+    "leaderboard": bench_leaderboard,
+}
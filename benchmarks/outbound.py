@@ -0,0 +1,142 @@
+"""Outbound REST traffic under Discord-style rate limits: direct awaits vs. OutboundScheduler.
+
+A fake HTTP layer enforces a per-route and a global request window and
+raises ``discord.RateLimited`` past either. Each simulated player fires a
+burst of adventure-log edits and thread messages and then needs an
+interaction follow-up; the metrics are how long that follow-up takes,
+how many requests hit the API and how many of them were 429s.
+"""
+from __future__ import annotations
+
+import asyncio
+import statistics
+import time
+from collections import deque
+from typing import Callable, Hashable
+
+import discord
+
+from utils.outbound import OutboundScheduler, Priority, channel_route
+
+PLAYERS = 20
+EDITS_PER_PLAYER = 8
+MESSAGES_PER_PLAYER = 2
+LATENCY = 0.004
+WINDOW = 0.1
+ROUTE_LIMIT = 5  # per route per window
+GLOBAL_LIMIT = 40  # across routes per window
+
+
+class _FakeApi:
+    def __init__(self) -> None:
+        self.calls: dict[Hashable, deque[float]] = {}
+        self.global_calls: deque[float] = deque()
+        self.requests = 0
+        self.rate_limited = 0
+
+    @staticmethod
+    def _retry_after(calls: deque[float], limit: int, now: float) -> float | None:
+        while calls and calls[0] <= now - WINDOW:
+            calls.popleft()
+        if len(calls) >= limit:
+            return calls[0] + WINDOW - now
+        return None
+
+    async def request(self, route: Hashable) -> None:
+        self.requests += 1
+        now = time.monotonic()
+        calls = self.calls.setdefault(route, deque())
+        retry_after = self._retry_after(self.global_calls, GLOBAL_LIMIT, now)
+        if retry_after is None:
+            retry_after = self._retry_after(calls, ROUTE_LIMIT, now)
+        if retry_after is not None:
+            self.rate_limited += 1
+            raise discord.RateLimited(retry_after)
+        calls.append(now)
+        self.global_calls.append(now)
+        await asyncio.sleep(LATENCY)
+
+
+async def _direct(api: _FakeApi, route: Hashable) -> None:
+    # What awaiting the call in the cog amounts to: retry after each 429.
+    while True:
+        try:
+            return await api.request(route)
+        except discord.RateLimited as e:
+            await asyncio.sleep(e.retry_after)
+
+
+async def _burst(send: Callable[[int, str, int], asyncio.Future[None]]) -> list[float]:
+    """Every player's background traffic first, then their interaction; returns interaction latencies."""
+    background = []
+    for player in range(PLAYERS):
+        for i in range(MESSAGES_PER_PLAYER):
+            background.append(send(player, "message", i))
+        for i in range(EDITS_PER_PLAYER):
+            background.append(send(player, "edit", i))
+
+    async def interaction(player: int) -> float:
+        start = time.monotonic()
+        await send(player, "interaction", 0)
+        return time.monotonic() - start
+
+    latencies = await asyncio.gather(*(interaction(player) for player in range(PLAYERS)))
+    await asyncio.gather(*background)
+    return list(latencies)
+
+
+def _metrics(prefix: str, latencies: list[float], api: _FakeApi, elapsed: float) -> dict[str, float]:
+    latencies.sort()
+    return {
+        f"{prefix}_interaction_p50_ms": statistics.median(latencies) * 1e3,
+        f"{prefix}_interaction_p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1e3,
+        f"{prefix}_requests": float(api.requests),
+        f"{prefix}_429s": float(api.rate_limited),
+        f"{prefix}_total_ms": elapsed * 1e3,
+    }
+
+
+async def _run_direct() -> dict[str, float]:
+    api = _FakeApi()
+
+    def send(player: int, kind: str, i: int) -> asyncio.Future[None]:
+        route = ("webhook", player) if kind == "interaction" else channel_route(player)
+        return asyncio.ensure_future(_direct(api, route))
+
+    start = time.monotonic()
+    latencies = await _burst(send)
+    return _metrics("direct", latencies, api, time.monotonic() - start)
+
+
+async def _run_scheduled() -> dict[str, float]:
+    api = _FakeApi()
+    scheduler = OutboundScheduler(max_in_flight=10, max_retries=10, watch_library_log=False)
+    priorities = {"interaction": Priority.INTERACTION, "message": Priority.MESSAGE, "edit": Priority.LOG}
+
+    def send(player: int, kind: str, i: int) -> asyncio.Future[None]:
+        route = ("webhook", player) if kind == "interaction" else channel_route(player)
+        return scheduler.submit(
+            route,
+            lambda: api.request(route),
+            priority=priorities[kind],
+            supersede=("edit", player) if kind == "edit" else None,
+        )
+
+    start = time.monotonic()
+    latencies = await _burst(send)
+    elapsed = time.monotonic() - start
+    scheduler.close()
+    results = _metrics("scheduled", latencies, api, elapsed)
+    results["scheduled_superseded"] = float(scheduler.superseded)
+    return results
+
+
+def bench_outbound_burst() -> dict[str, float]:
+    results = asyncio.run(_run_direct())
+    results.update(asyncio.run(_run_scheduled()))
+    return results
+
+
+BENCHMARKS: dict[str, Callable[[], dict[str, float]]] = {
+    "outbound_burst": bench_outbound_burst,
+}
@@ -0,0 +1,116 @@
+"""Per-step persistence cost: full-row snapshots vs. the append-only journal.
+
+A few players each take a run of ``/m``-style steps (distance, the odd hp
+or gold change, the odd item), every step a durable save, i.e. one commit.
+Reports bytes appended to the WAL per save, durable saves per second, and
+the time to load a player back (a journal load replays up to
+``JOURNAL_SNAPSHOT_INTERVAL`` entries). Both modes must reload exactly the
+state that was saved.
+
+The WAL holds whole pages, so a commit costs at least one page per b-tree
+page it touches, whatever the delta's size: a journal entry dirties the
+``journal`` table's last page and the page holding the player's row
+(``journal_head``), against the ``players`` row, the inventory rows and
+the inventory index in snapshot mode. The encoded delta per save is
+reported next to the WAL bytes, as are the WAL bytes per save when every
+player's step shares one group commit (the writer's normal case). There
+neighbouring players' rows share pages in both modes, and the journal
+appends of the whole batch share the table's last page.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+import time
+from typing import Callable
+
+from models.player import Item, get_item_def
+from utils.data_manager import DataManager
+
+PLAYERS = 10
+STEPS = 200
+LOADS = 200
+
+
+def _wal_frames(manager: DataManager, mode: str) -> int:
+    # (busy, frames in the WAL, frames checkpointed); TRUNCATE also empties the WAL.
+    return manager._connection().execute(f"PRAGMA wal_checkpoint({mode})").fetchone()[1]
+
+
+def _start_counting(manager: DataManager) -> int:
+    """Empty the WAL and stop automatic checkpoints, so every frame written stays countable."""
+    conn = manager._connection()
+    conn.execute("PRAGMA wal_autocheckpoint=0")
+    _wal_frames(manager, "TRUNCATE")
+    return conn.execute("PRAGMA page_size").fetchone()[0]
+
+
+async def _run(mode: str) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as directory:
+        manager = DataManager(os.path.join(directory, "bench.db"), mode=mode)
+        players = [await manager.create_new_player(user_id, f"p{user_id}") for user_id in range(PLAYERS)]
+        await manager.flush()
+        page_size = await manager._run(_start_counting, manager)
+
+        start = time.perf_counter()
+        for step in range(STEPS):
+            for player in players:
+                player.distance += 1
+                if step % 3 == 0:
+                    player.hp -= 1
+                if step % 10 == 0:
+                    player.gold += 5
+                if step % 25 == 0:
+                    player.inventory.append(Item(get_item_def("potion")))
+                await manager.save_player_data(player, durable=True)
+        elapsed = time.perf_counter() - start
+        frames = await manager._run(_wal_frames, manager, "PASSIVE")
+        journal_bytes = manager.journal_bytes
+
+        # The same steps again, one group commit per step for all players.
+        await manager._run(_wal_frames, manager, "TRUNCATE")
+        for step in range(STEPS):
+            for player in players:
+                player.distance += 1
+                if step % 3 == 0:
+                    player.hp -= 1
+                await manager.save_player_data(player)
+            await manager.flush()
+        grouped_frames = await manager._run(_wal_frames, manager, "PASSIVE")
+        await manager.close()
+
+        reader = DataManager(manager.db_path, mode=mode)
+        start = time.perf_counter()
+        for i in range(LOADS):
+            await reader._run(reader._load, i % PLAYERS)
+        load_elapsed = time.perf_counter() - start
+        for player in players:
+            loaded = (await reader._run(reader._load, player.user_id))[0]
+            if (loaded.distance, loaded.hp, loaded.gold, len(loaded.inventory)) != (
+                player.distance, player.hp, player.gold, len(player.inventory)
+            ):
+                raise AssertionError(f"{mode}: player {player.user_id} did not round-trip")
+        await reader.close()
+
+    saves = PLAYERS * STEPS
+    results = {
+        f"{mode}_wal_bytes_per_save": frames * page_size / saves,
+        f"{mode}_grouped_wal_bytes_per_save": grouped_frames * page_size / saves,
+        f"{mode}_saves_per_sec": saves / elapsed,
+        f"{mode}_load_us": load_elapsed / LOADS * 1e6,
+    }
+    if mode == "journal":
+        results["journal_delta_bytes_per_save"] = journal_bytes / saves
+    return results
+
+
+def bench_persistence_step() -> dict[str, float]:
+    results = asyncio.run(_run("snapshot"))
+    results.update(asyncio.run(_run("journal")))
+    return results
+
+
+BENCHMARKS: dict[str, Callable[[], dict[str, float]]] = {
+    "persistence_step": bench_persistence_step,
+}
@@ -0,0 +1,96 @@
+"""Run the benchmark suite and compare against a saved baseline.
+
+    python -m benchmarks.run                     # run everything, compare with baseline if present
+    python -m benchmarks.run generate_event      # run selected benchmarks
+    python -m benchmarks.run --save-baseline     # record this machine's numbers
+
+Metrics ending in ``_per_sec`` are higher-is-better; all others are
+lower-is-better. A metric that is worse than the baseline by more than
+``--tolerance`` fails the run (exit status 1), so it can gate a deploy; so
+does a benchmark that raises, which is how consistency checks report.
+Baselines are machine specific: record one on the host that runs the check.
+"""
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import os
+import sys
+from typing import Callable
+
+MODULES: tuple[str, ...] = (
+    "benchmarks.game_core",
+    "benchmarks.balance",
+    "benchmarks.embeds",
+    "benchmarks.outbound",
+    "benchmarks.persistence",
+    "benchmarks.leaderboard",
+    "benchmarks.content",
+)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def collect() -> dict[str, Callable[[], dict[str, float]]]:
+    benchmarks: dict[str, Callable[[], dict[str, float]]] = {}
+    for module_name in MODULES:
+        benchmarks.update(importlib.import_module(module_name).BENCHMARKS)
+    return benchmarks
+
+
+def is_regression(metric: str, value: float, baseline: float, tolerance: float) -> bool:
+    if metric.endswith("_per_sec"):
+        return value < baseline * (1 - tolerance)
+    return value > baseline * (1 + tolerance)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the benchmark suite.")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default: all)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    args = parser.parse_args(argv)
+
+    benchmarks = collect()
+    unknown = set(args.names) - benchmarks.keys()
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    baseline: dict[str, float] = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results: dict[str, float] = {}
+    regressions: list[str] = []
+    for name in args.names or benchmarks:
+        print(f"[{name}]")
+        try:
+            metrics = benchmarks[name]()
+        except Exception as e:
+            print(f"  FAILED: {e}")
+            regressions.append(name)
+            continue
+        for metric, value in metrics.items():
+            results[metric] = value
+            line = f"  {metric:<44}{value:>14.3f}"
+            if metric in baseline:
+                line += f"   baseline {baseline[metric]:>12.3f}"
+                if is_regression(metric, value, baseline[metric], args.tolerance):
+                    line += "   REGRESSION"
+                    regressions.append(metric)
+            print(line)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.baseline}")
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
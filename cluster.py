@@ -0,0 +1,265 @@
+"""Cluster launcher: the bot as several processes, each running a slice of the shards.
+
+    python cluster.py
+
+``main.py`` runs one ``commands.Bot`` in one process, so every command
+shares a single core. Here a supervisor splits the shards
+(``CLUSTER_SHARD_COUNT``, or Discord's recommendation) into contiguous
+groups, one per worker process (``CLUSTER_WORKERS``, or one per core), and
+each worker runs an ``AutoShardedBot`` over its group with the same cogs
+(``main.create_bot`` / ``main.run_bot``). Every guild belongs to exactly
+one shard, so its interactions always reach the same worker.
+
+All workers open the same SQLite database with ``shared=True``; see
+``utils/data_manager.py`` for how cached players are kept in step. Only
+worker 0 syncs the slash commands.
+
+Per-player locks only serialize commands within one worker. A user
+playing in two guilds served by different workers can run two commands
+at once. Each worker's save is conditional on the revision it loaded,
+so the second one to commit is rejected instead of silently overwriting
+the first. Its change is lost (the command already replied) and is
+counted in ``dungeon_writer_write_conflicts_total``; the next command reloads
+the winning state.
+
+The supervisor:
+
+* starts workers one at a time, waiting until each has its shards
+  connected, so shard IDENTIFYs stay within Discord's startup limit;
+* restarts a worker that exits, with exponential backoff;
+* collects each worker's readiness and metrics page over a pipe every
+  ``CLUSTER_REPORT_INTERVAL`` seconds and serves them on ``$PORT``:
+  ``/ready`` is 200 only when every worker is ready, ``/metrics`` is the
+  workers' pages merged with a ``cluster`` label plus supervisor gauges;
+* on SIGTERM/SIGINT, asks every worker to close (flushing its saves) and
+  kills the ones still running after ``CLUSTER_STOP_TIMEOUT``.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import multiprocessing
+import os
+import signal
+import time
+from multiprocessing.connection import Connection
+from typing import Any
+
+import discord
+from discord.ext import commands
+
+import config
+import main
+from keep_alive import create_app, readiness, serve
+from utils.metrics import merge_prometheus, render_prometheus
+
+_mp = multiprocessing.get_context("spawn")  # fresh interpreters: no inherited loop, sockets or SQLite handles
+
+
+def shard_groups(shard_count: int, workers: int) -> list[list[int]]:
+    """Split ``range(shard_count)`` into at most ``workers`` contiguous groups."""
+    size = math.ceil(shard_count / max(1, workers))
+    return [list(range(start, min(start + size, shard_count))) for start in range(0, shard_count, size)]
+
+
+async def recommended_shard_count(token: str) -> int:
+    http = discord.http.HTTPClient(asyncio.get_running_loop())
+    try:
+        await http.static_login(token)
+        shards, _, _ = await http.get_bot_gateway()
+    finally:
+        await http.close()
+    return shards
+
+
+# --- worker process ---
+
+def _worker_entry(cluster_id: int, shard_ids: list[int], shard_count: int, conn: Connection) -> None:
+    asyncio.run(_worker_main(cluster_id, shard_ids, shard_count, conn))
+
+
+async def _worker_main(cluster_id: int, shard_ids: list[int], shard_count: int, conn: Connection) -> None:
+    bot = main.create_bot(
+        shard_ids=shard_ids, shard_count=shard_count, shared_store=True, sync_commands=cluster_id == 0,
+    )
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        # Close cleanly so run_bot flushes queued saves before the process exits.
+        loop.add_signal_handler(sig, lambda: asyncio.ensure_future(bot.close()))
+    reporter = asyncio.create_task(_report(bot, conn))
+    try:
+        await main.run_bot(bot, serve_http=False)
+    finally:
+        reporter.cancel()
+        conn.close()
+
+
+async def _report(bot: commands.Bot, conn: Connection) -> None:
+    while True:
+        try:
+            conn.send((readiness(bot), render_prometheus(bot)))
+        except (BrokenPipeError, OSError):
+            return  # supervisor is gone
+        await asyncio.sleep(config.CLUSTER_REPORT_INTERVAL)
+
+
+# --- supervisor ---
+
+class _Worker:
+    __slots__ = ("cluster_id", "shard_ids", "process", "conn", "started", "restarts", "backoff", "report", "metrics", "connected")
+
+    def __init__(self, cluster_id: int, shard_ids: list[int]) -> None:
+        self.cluster_id = cluster_id
+        self.shard_ids = shard_ids
+        self.process: multiprocessing.process.BaseProcess | None = None
+        self.conn: Connection | None = None
+        self.started = 0.0
+        self.restarts = 0
+        self.backoff = config.CLUSTER_RESTART_BACKOFF
+        self.report: dict[str, Any] = {}
+        self.metrics = ""
+        self.connected = asyncio.Event()
+
+
+class Supervisor:
+    """Starts, watches and restarts the worker processes, and serves their combined status."""
+
+    def __init__(self, shard_count: int, groups: list[list[int]]) -> None:
+        self.shard_count = shard_count
+        self.workers = [_Worker(cluster_id, shard_ids) for cluster_id, shard_ids in enumerate(groups)]
+        self._stopping = asyncio.Event()
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self._stopping.set)
+        runner = await serve(create_app(self.readiness, self.render_metrics))
+        try:
+            for worker in self.workers:
+                if self._stopping.is_set():
+                    break
+                self._start(worker)
+                # One worker's shards at a time keeps IDENTIFYs inside the startup limit.
+                try:
+                    await asyncio.wait_for(worker.connected.wait(), config.CLUSTER_START_TIMEOUT)
+                except asyncio.TimeoutError:
+                    print(f"Cluster {worker.cluster_id} not connected after {config.CLUSTER_START_TIMEOUT}s, starting the next")
+            await self._stopping.wait()
+        finally:
+            await self._stop_all()
+            await runner.cleanup()
+
+    # --- worker lifecycle ---
+
+    def _start(self, worker: _Worker) -> None:
+        if self._stopping.is_set():
+            return
+        reader, writer = _mp.Pipe(duplex=False)
+        process = _mp.Process(
+            target=_worker_entry,
+            args=(worker.cluster_id, worker.shard_ids, self.shard_count, writer),
+            name=f"cluster-{worker.cluster_id}",
+        )
+        process.start()
+        writer.close()  # the child holds the only write end, so its exit shows up as EOF
+        worker.process, worker.conn, worker.started = process, reader, time.monotonic()
+        worker.report, worker.metrics = {}, ""
+        worker.connected.clear()
+        loop = asyncio.get_running_loop()
+        # Pipe and exit are watched as file descriptors on this loop; no threads.
+        loop.add_reader(reader.fileno(), self._on_report, worker)
+        loop.add_reader(process.sentinel, self._on_exit, worker)
+        print(f"Started cluster {worker.cluster_id} (pid {process.pid}, shards {worker.shard_ids})")
+
+    def _on_report(self, worker: _Worker) -> None:
+        conn = worker.conn
+        try:
+            while conn.poll():
+                worker.report, worker.metrics = conn.recv()
+        except (EOFError, OSError):
+            asyncio.get_running_loop().remove_reader(conn.fileno())
+            return
+        if worker.report.get("gateway_connected"):
+            worker.connected.set()
+
+    def _on_exit(self, worker: _Worker) -> None:
+        loop = asyncio.get_running_loop()
+        process = worker.process
+        loop.remove_reader(process.sentinel)
+        process.join()
+        if worker.conn is not None:
+            loop.remove_reader(worker.conn.fileno())
+            worker.conn.close()
+            worker.conn = None
+        worker.connected.set()  # don't hold up the start sequence on a dead worker
+        if self._stopping.is_set():
+            return
+        uptime = time.monotonic() - worker.started
+        if uptime >= config.CLUSTER_RESTART_BACKOFF_MAX:
+            worker.backoff = config.CLUSTER_RESTART_BACKOFF
+        print(f"Cluster {worker.cluster_id} exited with {process.exitcode} after {uptime:.0f}s, restarting in {worker.backoff:.0f}s")
+        worker.restarts += 1
+        loop.call_later(worker.backoff, self._start, worker)
+        worker.backoff = min(worker.backoff * 2, config.CLUSTER_RESTART_BACKOFF_MAX)
+
+    async def _stop_all(self) -> None:
+        running = [w.process for w in self.workers if w.process is not None and w.process.is_alive()]
+        for process in running:
+            process.terminate()  # SIGTERM: the worker closes the bot and flushes
+        deadline = time.monotonic() + config.CLUSTER_STOP_TIMEOUT
+        while any(p.is_alive() for p in running) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        for process in running:
+            if process.is_alive():
+                print(f"Killing {process.name} (pid {process.pid})")
+                process.kill()
+            process.join()
+
+    # --- status ---
+
+    def readiness(self) -> dict[str, Any]:
+        workers = {}
+        for worker in self.workers:
+            alive = worker.process is not None and worker.process.is_alive()
+            workers[str(worker.cluster_id)] = {
+                "pid": worker.process.pid if worker.process is not None else None,
+                "alive": alive,
+                "shards": worker.shard_ids,
+                "restarts": worker.restarts,
+                **worker.report,
+            }
+        return {
+            "ready": all(w["alive"] and w.get("ready", False) for w in workers.values()),
+            "shard_count": self.shard_count,
+            "workers": workers,
+        }
+
+    def render_metrics(self) -> str:
+        page = merge_prometheus({str(w.cluster_id): w.metrics for w in self.workers if w.metrics})
+        lines = [
+            "# HELP dungeon_cluster_worker_up Worker process is running.",
+            "# TYPE dungeon_cluster_worker_up gauge",
+        ]
+        for worker in self.workers:
+            alive = worker.process is not None and worker.process.is_alive()
+            lines.append(f'dungeon_cluster_worker_up{{cluster="{worker.cluster_id}"}} {int(alive)}')
+        lines += [
+            "# HELP dungeon_cluster_worker_restarts_total Worker restarts after an exit.",
+            "# TYPE dungeon_cluster_worker_restarts_total counter",
+        ]
+        for worker in self.workers:
+            lines.append(f'dungeon_cluster_worker_restarts_total{{cluster="{worker.cluster_id}"}} {worker.restarts}')
+        return page + "\n".join(lines) + "\n"
+
+
+async def run_cluster() -> None:
+    token = os.getenv(config.DISCORD_TOKEN_ENV_VAR)
+    shard_count = config.CLUSTER_SHARD_COUNT or await recommended_shard_count(token)
+    workers = min(config.CLUSTER_WORKERS or os.cpu_count() or 1, shard_count)
+    groups = shard_groups(shard_count, workers)
+    print(f"Running {shard_count} shard(s) in {len(groups)} worker process(es)")
+    await Supervisor(shard_count, groups).run()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_cluster())
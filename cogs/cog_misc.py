@@ -4,58 +4,61 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 import random # For run command's random chance, if not fully handled by GameLogic
+import re
+import zlib
 
 # Import utility modules as per blueprint
+from utils import embed_templates
 from utils.data_manager import DataManager
 from utils.game_logic import GameLogic
-from models.player import Player # Assuming Player model might be used for type hinting or data structure
-from models.dungeon import Monster # Assuming Monster model might be used
-
-# Define a View for item selection
-class ItemSelectView(discord.ui.View):
+from utils.item_search import MAX_CHOICES, held_matches
+from utils.metrics import timed
+from utils.outbound import OutboundScheduler, Priority, interaction_route
+from utils.player_locks import PlayerLocks
+from models.player import Player
+from models.dungeon import Monster
+
+def item_menu_version(player: Player) -> str:
     """
-    戦闘中に使用するアイテムを選択するためのView。
-    プレイヤーのインベントリから選択肢を動的に生成します。
+    アイテム選択メニューが前提とする状態（戦闘中のモンスターと消耗品の所持数）の短いハッシュ。
+    プロセスに依存しない値なので、再起動後に押されたメニューでも古いかどうかを判定できる。
     """
-    def __init__(self, player_id: str, data_manager: DataManager, game_logic: GameLogic, timeout=180):
-        super().__init__(timeout=timeout)
-        self.player_id = player_id
-        self.data_manager = data_manager
-        self.game_logic = game_logic
-        self.selected_item = None # To store the selected item name
-        self.message = None # To store the message this view is attached to, for later editing
-
-    @discord.ui.select(
-        placeholder="使用するアイテムを選択してください...",
-        min_values=1,
-        max_values=1,
-        options=[] # This will be populated dynamically in the item command
+    monster = player.current_monster
+    state = (
+        monster.monster_id if monster else None,
+        monster.hp if monster else None,
+        tuple((item.item_id, item.quantity) for item in player.inventory.by_type("consumable")),
     )
-    async def select_item_callback(self, interaction: discord.Interaction, select: discord.ui.Select):
-        """
-        アイテムが選択されたときに呼び出されるコールバック。
-        選択されたアイテム名を保存し、Viewを停止します。
-        """
-        # Ensure only the player who initiated the command can interact with this specific view
-        if str(interaction.user.id) != self.player_id:
-            await interaction.response.send_message("このメニューはあなたのためのものではありません。", ephemeral=True)
-            return
+    return f"{zlib.crc32(repr(state).encode()):08x}"
 
-        self.selected_item = select.values[0]
-        await interaction.response.defer() # Defer the interaction to show thinking state
-        self.stop() # Stop the view, signaling that an item has been selected
 
-    async def on_timeout(self) -> None:
-        """
-        Viewがタイムアウトしたときに呼び出されます。
-        """
-        # Disable all items if the view times out
-        for item in self.children:
-            if isinstance(item, discord.ui.Select):
-                item.disabled = True
-        # Update the message to reflect timeout and disable the view
-        if self.message:
-            await self.message.edit(content="アイテム選択の時間が終了しました。", view=self)
+class ItemSelect(discord.ui.DynamicItem[discord.ui.Select], template=r"item:(?P<user_id>[0-9]+):(?P<version>[0-9a-f]{8})"):
+    """
+    戦闘中に使用するアイテムを選択するメニュー。
+    プレイヤーと状態のバージョンはcustom_idに入っているだけで、メニューごとのViewやコルーチンはメモリに残らない。
+    押されたときにcustom_idから復元され（再起動後も同じ）、CombatCogが最新の状態を読み込み直して処理する。
+    """
+    def __init__(self, user_id: int, version: str, options: list[discord.SelectOption] | None = None) -> None:
+        super().__init__(discord.ui.Select(
+            custom_id=f"item:{user_id}:{version}",
+            placeholder="使用するアイテムを選択してください...",
+            min_values=1,
+            max_values=1,
+            options=options or [],
+        ))
+        self.user_id = user_id
+        self.version = version
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Select, match: re.Match[str], /) -> ItemSelect:
+        return cls(int(match["user_id"]), match["version"])
+
+    async def callback(self, interaction: discord.Interaction) -> None:
+        cog = interaction.client.get_cog("CombatCog")
+        if cog is None:
+            await timed("response", interaction.response.send_message("現在アイテムを使用できません。少し待ってからもう一度試してください。", ephemeral=True))
+            return
+        await cog.select_item(interaction, self.user_id, self.version, self.item.values[0])
 
 class CombatCog(commands.Cog):
     """
@@ -63,231 +66,335 @@ class CombatCog(commands.Cog):
     """
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
-        self.data_manager = DataManager()
+        self.data_manager: DataManager = bot.data_manager
+        self.player_locks: PlayerLocks = bot.player_locks
+        self.outbound: OutboundScheduler = bot.outbound
         self.game_logic = GameLogic()
 
-    async def _send_combat_update_embed(self, interaction: discord.Interaction, player_data: dict, monster_data: dict, description: str, color: discord.Color = discord.Color.blue()) -> None:
+    async def cog_load(self) -> None:
+        # 送信済みのメニュー（再起動前のものも含む）をcustom_idで受け付ける
+        self.bot.add_dynamic_items(ItemSelect)
+
+    async def cog_unload(self) -> None:
+        self.bot.remove_dynamic_items(ItemSelect)
+
+    async def _send_combat_update_embed(self, interaction: discord.Interaction, player: Player, monster: Monster, description: str, color: discord.Color | None = None) -> None:
         """
         戦闘状況を更新するEmbedを送信するヘルパー関数。
+        タイトルや色などの固定部分は embed_templates の定数を使い、HPなどの値だけを埋め込む。
         """
-        embed = discord.Embed(
-            title="⚔️ 戦闘状況",
+        embed = embed_templates.combat(
+            colour=color,
             description=description,
-            color=color
+            hp=player.hp,
+            max_hp=player.max_hp,
+            monster=monster.name,
+            monster_hp=monster.hp,
+            monster_max_hp=monster.max_hp,
+            distance=player.distance,
+            level=player.level,
         )
-        # プレイヤー情報
-        embed.add_field(name="あなた", value=f"HP: {player_data.get('hp', 0)}/{player_data.get('max_hp', 0)}", inline=True)
-        # モンスター情報
-        embed.add_field(name=f"敵: {monster_data.get('name', 'Unknown')}", value=f"HP: {monster_data.get('hp', 0)}/{monster_data.get('max_hp', 0)}", inline=True)
-        embed.set_footer(text=f"距離: {player_data.get('distance', 0)}m | レベル: {player_data.get('level', 1)}")
-        await interaction.followup.send(embed=embed) # Use followup as initial interaction might be deferred
-
-    async def _handle_monster_defeat(self, interaction: discord.Interaction, player_id: str, player_data: dict, monster_data: dict) -> str:
+        # Use followup as initial interaction might be deferred; queued ahead of thread traffic
+        await timed("response", self.outbound.call(
+            interaction_route(interaction), lambda: interaction.followup.send(embed=embed), priority=Priority.INTERACTION
+        ))
+
+    async def _handle_monster_defeat(self, interaction: discord.Interaction, player: Player, monster: Monster) -> str:
         """
         モンスター撃破時の処理を行い、結果メッセージを返す。
         経験値獲得、アイテムドロップ、戦闘状態の解除など。
         """
         # モンスター撃破時のロジックをGameLogicに委譲
-        loot_message, level_up_message = self.game_logic.handle_monster_defeat(player_data, monster_data)
+        loot_message, level_up_message = self.game_logic.handle_monster_defeat(player, monster)
 
         # 戦闘状態を解除
-        player_data['in_combat'] = False
-        player_data['current_monster'] = None
+        player.in_combat = False
+        player.current_monster = None
 
         # データ保存
-        await self.data_manager.save_player_data(player_id, player_data)
+        await self.data_manager.save_player_data(player)
 
         # 結果メッセージを構築
-        result_message = f"モンスター「{monster_data['name']}」を倒した！\n{loot_message}"
+        result_message = f"モンスター「{monster.name}」を倒した！\n{loot_message}"
         if level_up_message:
             result_message += f"\n{level_up_message}"
         return result_message
 
-    async def _handle_player_defeat(self, interaction: discord.Interaction, player_id: str, player_data: dict) -> str:
+    async def _handle_player_defeat(self, interaction: discord.Interaction, player: Player) -> str:
         """
         プレイヤー敗北時の処理を行い、結果メッセージを返す。
         ゲームオーバー処理、プレイヤーデータの初期化など。
         """
-        # プレイヤー敗北時のロジックをGameLogicに委譲
-        game_over_message = self.game_logic.handle_game_over(player_data)
-
-        # 戦闘状態を解除
-        player_data['in_combat'] = False
-        player_data['current_monster'] = None
-
-        # プレイヤーデータをリセットまたは初期化（ゲームオーバー処理）
-        # 例: 距離を0に戻し、HPを最大にし、インベントリを初期化
-        player_data['hp'] = player_data['max_hp'] # HPを最大値に戻す
-        player_data['distance'] = 0 # 進行距離をリセット
-        player_data['inventory'] = [] # インベントリを初期化
-        player_data['equipment'] = {} # 装備をリセット
-        player_data['exp'] = 0 # 経験値をリセット
-        player_data['level'] = 1 # レベルをリセット
-        player_data['atk'] = 10 # 基本攻撃力をリセット
-        player_data['def'] = 5 # 基本防御力をリセット
+        # プレイヤー敗北時のロジック（戦闘状態の解除と進行状況のリセット）をGameLogicに委譲
+        game_over_message = self.game_logic.handle_game_over(player)
 
-        # データ保存
-        await self.data_manager.save_player_data(player_id, player_data)
+        # データ保存（ゲームオーバーはコミット完了まで待つ）
+        await self.data_manager.save_player_data(player, durable=True)
 
         return game_over_message
 
     @app_commands.command(name="attack", description="戦闘中に敵を攻撃します。")
-    async def attack(self, interaction: discord.Interaction) -> None:
+    @app_commands.describe(auto="決着がつくまで攻撃を繰り返します。倒れる前に自動で止まります。")
+    async def attack(self, interaction: discord.Interaction, auto: bool = False) -> None:
         """
         戦闘中に敵を攻撃し、ダメージ計算と戦闘状況の更新を行います。
         モンスターのHPが0になった場合は撃破処理、プレイヤーのHPが0になった場合はゲームオーバー処理を行います。
+        auto指定時は戦闘全体を一度に処理し、結果を1つのEmbedにまとめて表示します。
         """
-        await interaction.response.defer() # コマンド応答を遅延させ、処理中に「考え中...」を表示
+        await timed("defer", interaction.response.defer()) # コマンド応答を遅延させ、処理中に「考え中...」を表示
 
-        player_id = str(interaction.user.id)
-        player_data = await self.data_manager.load_player_data(player_id)
-
-        # プレイヤーデータが存在しない場合は、ゲームを開始していない旨を伝える
-        if not player_data:
-            await interaction.followup.send("冒険を開始していません。`/start`コマンドで新しい冒険を始めましょう！", ephemeral=True)
+        # 同じコマンドが処理中なら重複実行しない（他のコマンドは順番待ち）
+        if self.player_locks.in_flight(interaction.user.id, "attack"):
+            await timed("response", interaction.followup.send("前の操作を処理中です。少し待ってからもう一度試してください。", ephemeral=True))
             return
+        async with self.player_locks.hold(interaction.user.id, "attack"):
+            player = await self.data_manager.load_player_data(interaction.user.id)
+
+            # プレイヤーデータが存在しない場合は、ゲームを開始していない旨を伝える
+            if not player:
+                await timed("response", interaction.followup.send("冒険を開始していません。`/start`コマンドで新しい冒険を始めましょう！", ephemeral=True))
+                return
+
+            # 戦闘中かどうかのチェック
+            if not player.in_combat:
+                await timed("response", interaction.followup.send("現在、戦闘中ではありません。", ephemeral=True))
+                return
+
+            monster = player.current_monster
+            if not monster: # 念のため、モンスターデータがない場合も考慮
+                await timed("response", interaction.followup.send("戦闘中のモンスターデータが見つかりません。戦闘状態をリセットしました。", ephemeral=True))
+                player.in_combat = False
+                await self.data_manager.save_player_data(player)
+                return
+
+            if auto:
+                await self._auto_battle(interaction, player, monster)
+                return
+
+            # プレイヤーの攻撃
+            damage_dealt = self.game_logic.calculate_damage(player, monster)
+            monster.hp = max(0, monster.hp - damage_dealt) # HPが0未満にならないようにする
+
+            description = f"⚔️ あなたは{monster.name}に**{damage_dealt}**ダメージを与えた！\n"
+
+            if monster.hp <= 0:
+                # モンスター撃破処理
+                description += await self._handle_monster_defeat(interaction, player, monster)
+                await self._send_combat_update_embed(interaction, player, monster, description, discord.Color.green())
+                return # 戦闘終了のため、ここで処理を終える
+
+            # モンスターがまだ生きている場合、反撃
+            monster_damage = self.game_logic.calculate_monster_attack(monster, player)
+            player.hp = max(0, player.hp - monster_damage) # HPが0未満にならないようにする
+            description += f"👹 {monster.name}はあなたに**{monster_damage}**ダメージを与えた！\n"
+
+            if player.hp <= 0:
+                # プレイヤー敗北処理
+                description += await self._handle_player_defeat(interaction, player)
+                await self._send_combat_update_embed(interaction, player, monster, description, discord.Color.red())
+                return # ゲームオーバーのため、ここで処理を終える
 
-        # 戦闘中かどうかのチェック
-        if not player_data.get('in_combat'):
-            await interaction.followup.send("現在、戦闘中ではありません。", ephemeral=True)
-            return
-
-        monster_data = player_data.get('current_monster')
-        if not monster_data: # 念のため、モンスターデータがない場合も考慮
-            await interaction.followup.send("戦闘中のモンスターデータが見つかりません。戦闘状態をリセットしました。", ephemeral=True)
-            player_data['in_combat'] = False
-            await self.data_manager.save_player_data(player_id, player_data)
-            return
-
-        # プレイヤーの攻撃
-        damage_dealt = self.game_logic.calculate_damage(player_data, monster_data)
-        monster_data['hp'] = max(0, monster_data['hp'] - damage_dealt) # HPが0未満にならないようにする
-
-        description = f"⚔️ あなたは{monster_data['name']}に**{damage_dealt}**ダメージを与えた！\n"
-
-        if monster_data['hp'] <= 0:
-            # モンスター撃破処理
-            description += await self._handle_monster_defeat(interaction, player_id, player_data, monster_data)
-            await self._send_combat_update_embed(interaction, player_data, monster_data, description, discord.Color.green())
-            return # 戦闘終了のため、ここで処理を終える
+            # 戦闘継続の場合、データを保存
+            player.current_monster = monster # 更新されたモンスターデータを保存
+            await self.data_manager.save_player_data(player)
 
-        # モンスターがまだ生きている場合、反撃
-        monster_damage = self.game_logic.calculate_monster_attack(monster_data, player_data)
-        player_data['hp'] = max(0, player_data['hp'] - monster_damage) # HPが0未満にならないようにする
-        description += f"👹 {monster_data['name']}はあなたに**{monster_damage}**ダメージを与えた！\n"
+            # 戦闘状況をEmbedで表示
+            await self._send_combat_update_embed(interaction, player, monster, description)
 
-        if player_data['hp'] <= 0:
-            # プレイヤー敗北処理
-            description += await self._handle_player_defeat(interaction, player_id, player_data)
-            await self._send_combat_update_embed(interaction, player_data, monster_data, description, discord.Color.red())
-            return # ゲームオーバーのため、ここで処理を終える
+    async def _auto_battle(self, interaction: discord.Interaction, player: Player, monster: Monster) -> None:
+        """
+        攻撃と反撃を決着がつくまでメモリ上で繰り返し、保存と送信は最後に1回だけ行う。
+        反撃で倒れる手前で止まり、戦闘は継続したままにする。
+        """
+        result = self.game_logic.auto_battle(player, monster)
 
-        # 戦闘継続の場合、データを保存
-        player_data['current_monster'] = monster_data # 更新されたモンスターデータを保存
-        await self.data_manager.save_player_data(player_id, player_data)
+        if result.turns == 0:
+            await timed("response", interaction.followup.send(
+                f"次の{monster.name}の反撃で倒れてしまう！アイテムを使うか逃げよう。", ephemeral=True
+            ))
+            return
 
-        # 戦闘状況をEmbedで表示
-        await self._send_combat_update_embed(interaction, player_data, monster_data, description)
+        description = (
+            f"⚔️ {result.turns}ターンの自動戦闘\n"
+            f"あなたの攻撃: **{result.hit}**ダメージ × {result.turns}回（計{result.damage_dealt}）\n"
+        )
+        if result.counters:
+            description += (
+                f"👹 {monster.name}の反撃: **{result.counter}**ダメージ × {result.counters}回（計{result.damage_taken}）\n"
+            )
+
+        if result.won:
+            # 撃破処理（保存を含む）
+            description += await self._handle_monster_defeat(interaction, player, monster)
+            await self._send_combat_update_embed(interaction, player, monster, description, discord.Color.green())
+            return
 
+        description += "⚠️ これ以上はHPが持たないため、自動戦闘を中断した。"
+        player.current_monster = monster
+        await self.data_manager.save_player_data(player)
+        await self._send_combat_update_embed(interaction, player, monster, description, discord.Color.orange())
 
     @app_commands.command(name="item", description="戦闘中にアイテムを使用します。")
-    async def item(self, interaction: discord.Interaction) -> None:
+    @app_commands.describe(item_name="使用するアイテムの名前（省略するとメニューから選択します）")
+    async def item(self, interaction: discord.Interaction, item_name: str | None = None) -> None:
         """
-        戦闘中にアイテムを使用するための選択メニューを表示し、選択されたアイテムの効果を適用します。
+        戦闘中にアイテムを使用します。名前を指定した場合はそのまま使用し、
+        省略した場合は選択メニューを表示して、選択されたアイテムの効果を適用します。
         アイテム使用後、モンスターが反撃します。
         """
-        await interaction.response.defer(ephemeral=True) # コマンド応答を遅延させ、処理中に「考え中...」を表示（ユーザーにだけ見せる）
+        await timed("defer", interaction.response.defer(ephemeral=True)) # コマンド応答を遅延させ、処理中に「考え中...」を表示（ユーザーにだけ見せる）
 
-        player_id = str(interaction.user.id)
-        player_data = await self.data_manager.load_player_data(player_id)
-
-        if not player_data:
-            await interaction.followup.send("冒険を開始していません。`/start`コマンドで新しい冒険を始めましょう！", ephemeral=True)
+        # 同じコマンドが処理中なら重複実行しない（他のコマンドは順番待ち）
+        if self.player_locks.in_flight(interaction.user.id, "item"):
+            await timed("response", interaction.followup.send("前の操作を処理中です。少し待ってからもう一度試してください。", ephemeral=True))
             return
-
-        if not player_data.get('in_combat'):
-            await interaction.followup.send("現在、戦闘中ではありません。", ephemeral=True)
+        async with self.player_locks.hold(interaction.user.id, "item"):
+            player = await self.data_manager.load_player_data(interaction.user.id)
+
+            if not player:
+                await timed("response", interaction.followup.send("冒険を開始していません。`/start`コマンドで新しい冒険を始めましょう！", ephemeral=True))
+                return
+
+            if not player.in_combat:
+                await timed("response", interaction.followup.send("現在、戦闘中ではありません。", ephemeral=True))
+                return
+
+            # 名前が指定された場合は、メニューを出さずにそのまま使用する
+            if item_name is not None:
+                target = player.find_item(item_name)
+                if target is None or not self.game_logic.is_item_usable_in_combat(target.name, player):
+                    await timed("response", interaction.followup.send(f"「{item_name}」は戦闘中に使用できるアイテムではありません。", ephemeral=True))
+                    return
+                await self._use_item(interaction, target.name)
+                return
+
+            view = self._item_menu(player)
+
+        if view is None:
+            await timed("response", interaction.followup.send("戦闘中に使用できるアイテムがありません。", ephemeral=True))
             return
 
-        # 使用可能なアイテムをフィルタリング
-        usable_items = [
-            item for item in player_data.get('inventory', [])
-            if item.get('quantity', 0) > 0 and self.game_logic.is_item_usable_in_combat(item.get('name'), player_data)
-        ]
+        # メニューを送ったらコマンドは終了する（選択はItemSelect.callbackからselect_itemに届く）
+        await timed("response", interaction.followup.send("使用するアイテムを選択してください。", view=view, ephemeral=True))
 
-        if not usable_items:
-            await interaction.followup.send("戦闘中に使用できるアイテムがありません。", ephemeral=True)
+    @staticmethod
+    def _item_menu(player: Player) -> discord.ui.View | None:
+        """
+        現在の状態から選択メニューを作る。使用できるアイテムがなければNone。
+        DiscordのSelectOptionの最大数は25なので、それ以上は名前指定（オートコンプリート）で使用する。
+        """
+        select_options = [
+            discord.SelectOption(
+                label=f"{item.name} ({item.quantity})",
+                value=item.name,
+                description=item.description or "効果不明"
+            )
+            for item in held_matches(player.inventory, "", ("consumable",), limit=MAX_CHOICES)
+        ]
+        if not select_options:
+            return None
+        # DynamicItemだけのViewはViewStoreに保持されないため、timeoutは不要
+        view = discord.ui.View(timeout=None)
+        view.add_item(ItemSelect(player.user_id, item_menu_version(player), select_options))
+        return view
+
+    async def select_item(self, interaction: discord.Interaction, user_id: int, version: str, selected_item_name: str) -> None:
+        """
+        メニューでアイテムが選ばれたときの処理。状態は必ず読み込み直し、
+        メニューを出した後に状態が変わっていれば（バージョン不一致）使用せずにメニューを作り直す。
+        """
+        if interaction.user.id != user_id:
+            await timed("response", interaction.response.send_message("このメニューはあなたのためのものではありません。", ephemeral=True))
             return
+        # ロック待ちや読み込みより先に応答する（メニューの書き換えは後からedit_original_responseで行う）
+        await timed("defer", interaction.response.defer())
+        if self.player_locks.in_flight(user_id, "item"):
+            await timed("response", interaction.followup.send("前の操作を処理中です。少し待ってからもう一度試してください。", ephemeral=True))
+            return
+        async with self.player_locks.hold(user_id, "item"):
+            player = await self.data_manager.load_player_data(user_id)
+            if not player or not player.in_combat:
+                await timed("response", interaction.edit_original_response(content="現在、戦闘中ではありません。", view=None))
+                return
+
+            if item_menu_version(player) != version:
+                view = self._item_menu(player)
+                if view is None:
+                    await timed("response", interaction.edit_original_response(content="戦闘中に使用できるアイテムがありません。", view=None))
+                    return
+                await timed("response", interaction.edit_original_response(
+                    content="メニューを出した後に状況が変わりました。最新の内容からもう一度選択してください。", view=view
+                ))
+                return
+
+            # 元のEphemeralメッセージからメニューを外し、結果はfollowupで送る
+            await timed("response", interaction.edit_original_response(content="アイテム選択済み。", view=None))
+            await self._use_item(interaction, selected_item_name)
+
+    @item.autocomplete("item_name")
+    async def item_autocomplete(self, interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+        """所持している消耗品を、入力中の文字列で絞り込んで候補に出します。"""
+        player = await self.data_manager.load_player_data(interaction.user.id)
+        if not player:
+            return []
+        return [
+            app_commands.Choice(name=f"{item.name} ({item.quantity})", value=item.name)
+            for item in held_matches(player.inventory, current, ("consumable",))
+        ]
 
-        # Selectメニューのオプションを作成
-        select_options = []
-        for item in usable_items:
-            select_options.append(discord.SelectOption(
-                label=f"{item['name']} ({item['quantity']})",
-                value=item['name'],
-                description=f"{item.get('description', '効果不明')}"
-            ))
-            # DiscordのSelectOptionの最大数は25なので、それ以上は切り捨てる
-            if len(select_options) >= 25:
-                break
-
-        # ItemSelectViewを作成し、オプションを動的に設定
-        view = ItemSelectView(player_id, self.data_manager, self.game_logic)
-        view.children[0].options = select_options # SelectコンポーネントはViewの最初のchild
+    async def _use_item(self, interaction: discord.Interaction, selected_item_name: str) -> None:
+        """
+        選択されたアイテムを使用し、モンスターの反撃まで処理する。
+        呼び出し元とは別に読み込むため、最新の状態で再確認する。
+        """
+        player = await self.data_manager.load_player_data(interaction.user.id)
+        if not player or not player.in_combat:
+            await timed("response", interaction.followup.send("現在、戦闘中ではありません。", ephemeral=True))
+            return
+        if player.find_item(selected_item_name) is None:
+            await timed("response", interaction.followup.send(f"「{selected_item_name}」はもう持っていません。", ephemeral=True))
+            return
 
-        # アイテム選択メッセージを送信
-        message = await interaction.followup.send("使用するアイテムを選択してください。", view=view, ephemeral=True)
-        view.message = message # Store message to edit later if needed
+        description = ""
+        monster = player.current_monster
 
-        # ユーザーがアイテムを選択するのを待つ
-        await view.wait()
+        # アイテム効果を適用
+        item_effect_message = self.game_logic.apply_item_effect(selected_item_name, player)
+        description += f"🧪 あなたは**{selected_item_name}**を使用した！\n{item_effect_message}\n"
 
-        if view.selected_item:
-            selected_item_name = view.selected_item
-            description = ""
-            monster_data = player_data.get('current_monster')
+        # アイテムを消費
+        self.game_logic.consume_item(selected_item_name, player)
 
-            # アイテム効果を適用
-            item_effect_message = self.game_logic.apply_item_effect(selected_item_name, player_data)
-            description += f"🧪 あなたは**{selected_item_name}**を使用した！\n{item_effect_message}\n"
+        # データ保存
+        await self.data_manager.save_player_data(player)
 
-            # アイテムを消費
-            self.game_logic.consume_item(selected_item_name, player_data)
+        # 攻撃アイテムでモンスターを倒した場合は撃破処理
+        if monster and monster.hp <= 0:
+            description += await self._handle_monster_defeat(interaction, player, monster)
+            await self._send_combat_update_embed(interaction, player, monster, description, discord.Color.green())
+            return
 
-            # データ保存
-            await self.data_manager.save_player_data(player_id, player_data)
+        # モンスターの反撃
+        if monster and player.hp > 0: # プレイヤーがまだ生きている場合のみ
+            monster_damage = self.game_logic.calculate_monster_attack(monster, player)
+            player.hp = max(0, player.hp - monster_damage)
+            description += f"👹 {monster.name}はあなたに**{monster_damage}**ダメージを与えた！\n"
 
-            # モンスターの反撃
-            if monster_data and player_data.get('hp', 0) > 0: # プレイヤーがまだ生きている場合のみ
-                monster_damage = self.game_logic.calculate_monster_attack(monster_data, player_data)
-                player_data['hp'] = max(0, player_data['hp'] - monster_damage)
-                description += f"👹 {monster_data['name']}はあなたに**{monster_damage}**ダメージを与えた！\n"
+            if player.hp <= 0:
+                # プレイヤー敗北処理
+                description += await self._handle_player_defeat(interaction, player)
+                await self._send_combat_update_embed(interaction, player, monster, description, discord.Color.red())
+                return # ゲームオーバーのため、ここで処理を終える
 
-                if player_data['hp'] <= 0:
-                    # プレイヤー敗北処理
-                    description += await self._handle_player_defeat(interaction, player_id, player_data)
-                    await self._send_combat_update_embed(interaction, player_data, monster_data, description, discord.Color.red())
-                    # 元のEphemeralメッセージを編集してViewを無効化
-                    await message.edit(content="アイテム選択済み。", view=None)
-                    return # ゲームオーバーのため、ここで処理を終える
-                
-                # 更新されたモンスターデータを保存
-                player_data['current_monster'] = monster_data
-                await self.data_manager.save_player_data(player_id, player_data)
-
-            # 戦闘状況をEmbedで表示 (ephemeral=Falseで全体に表示されるようにする)
-            await interaction.followup.send(embed=discord.Embed(
-                title="⚔️ 戦闘状況 - アイテム使用",
-                description=description,
-                color=discord.Color.gold()
-            ))
-            # 元のEphemeralメッセージを編集してViewを無効化
-            await message.edit(content="アイテム選択済み。", view=None)
+            # 更新されたモンスターデータを保存
+            player.current_monster = monster
+            await self.data_manager.save_player_data(player)
 
-        else:
-            # タイムアウトまたはキャンセルされた場合
-            await interaction.followup.send("アイテム選択がキャンセルされました。", ephemeral=True)
-            await message.edit(content="アイテム選択がキャンセルされました。", view=None)
+        # 戦闘状況をEmbedで表示 (ephemeral=Falseで全体に表示されるようにする)
+        embed = embed_templates.combat_item(description=description)
+        await timed("response", self.outbound.call(
+            interaction_route(interaction), lambda: interaction.followup.send(embed=embed), priority=Priority.INTERACTION
+        ))
 
 
     @app_commands.command(name="run", description="戦闘から逃走を試みます。失敗することもあります。")
@@ -296,52 +403,56 @@ class CombatCog(commands.Cog):
         戦闘から逃走を試みます。成功または失敗し、結果に応じて処理が分岐します。
         失敗した場合はモンスターの反撃を受けます。
         """
-        await interaction.response.defer() # コマンド応答を遅延させ、処理中に「考え中...」を表示
-
-        player_id = str(interaction.user.id)
-        player_data = await self.data_manager.load_player_data(player_id)
-
-        if not player_data:
-            await interaction.followup.send("冒険を開始していません。`/start`コマンドで新しい冒険を始めましょう！", ephemeral=True)
-            return
+        await timed("defer", interaction.response.defer()) # コマンド応答を遅延させ、処理中に「考え中...」を表示
 
-        if not player_data.get('in_combat'):
-            await interaction.followup.send("現在、戦闘中ではありません。", ephemeral=True)
+        # 同じコマンドが処理中なら重複実行しない（他のコマンドは順番待ち）
+        if self.player_locks.in_flight(interaction.user.id, "run"):
+            await timed("response", interaction.followup.send("前の操作を処理中です。少し待ってからもう一度試してください。", ephemeral=True))
             return
+        async with self.player_locks.hold(interaction.user.id, "run"):
+            player = await self.data_manager.load_player_data(interaction.user.id)
+
+            if not player:
+                await timed("response", interaction.followup.send("冒険を開始していません。`/start`コマンドで新しい冒険を始めましょう！", ephemeral=True))
+                return
+
+            if not player.in_combat:
+                await timed("response", interaction.followup.send("現在、戦闘中ではありません。", ephemeral=True))
+                return
+
+            monster = player.current_monster
+            if not monster:
+                await timed("response", interaction.followup.send("戦闘中のモンスターデータが見つかりません。戦闘状態をリセットしました。", ephemeral=True))
+                player.in_combat = False
+                await self.data_manager.save_player_data(player)
+                return
+
+            # 逃走判定
+            escape_successful, escape_message = self.game_logic.attempt_escape(player, monster)
+            description = f"🏃 {escape_message}\n"
+
+            if escape_successful:
+                # 逃走成功
+                player.in_combat = False
+                player.current_monster = None
+                await self.data_manager.save_player_data(player)
+                await self._send_combat_update_embed(interaction, player, monster, description, discord.Color.green())
+            else:
+                # 逃走失敗、モンスターの反撃
+                monster_damage = self.game_logic.calculate_monster_attack(monster, player)
+                player.hp = max(0, player.hp - monster_damage)
+                description += f"👹 {monster.name}の追撃により**{monster_damage}**ダメージを受けた！\n"
+
+                if player.hp <= 0:
+                    # プレイヤー敗北処理
+                    description += await self._handle_player_defeat(interaction, player)
+                    await self._send_combat_update_embed(interaction, player, monster, description, discord.Color.red())
+                    return # ゲームオーバーのため、ここで処理を終える
 
-        monster_data = player_data.get('current_monster')
-        if not monster_data:
-            await interaction.followup.send("戦闘中のモンスターデータが見つかりません。戦闘状態をリセットしました。", ephemeral=True)
-            player_data['in_combat'] = False
-            await self.data_manager.save_player_data(player_id, player_data)
-            return
-
-        # 逃走判定
-        escape_successful, escape_message = self.game_logic.attempt_escape(player_data, monster_data)
-        description = f"🏃 {escape_message}\n"
-
-        if escape_successful:
-            # 逃走成功
-            player_data['in_combat'] = False
-            player_data['current_monster'] = None
-            await self.data_manager.save_player_data(player_id, player_data)
-            await self._send_combat_update_embed(interaction, player_data, monster_data, description, discord.Color.green())
-        else:
-            # 逃走失敗、モンスターの反撃
-            monster_damage = self.game_logic.calculate_monster_attack(monster_data, player_data)
-            player_data['hp'] = max(0, player_data['hp'] - monster_damage)
-            description += f"👹 {monster_data['name']}の追撃により**{monster_damage}**ダメージを受けた！\n"
-
-            if player_data['hp'] <= 0:
-                # プレイヤー敗北処理
-                description += await self._handle_player_defeat(interaction, player_id, player_data)
-                await self._send_combat_update_embed(interaction, player_data, monster_data, description, discord.Color.red())
-                return # ゲームオーバーのため、ここで処理を終える
-
-            # 戦闘継続の場合、データを保存
-            player_data['current_monster'] = monster_data # 更新されたモンスターデータを保存
-            await self.data_manager.save_player_data(player_id, player_data)
-            await self._send_combat_update_embed(interaction, player_data, monster_data, description, discord.Color.red())
+                # 戦闘継続の場合、データを保存
+                player.current_monster = monster # 更新されたモンスターデータを保存
+                await self.data_manager.save_player_data(player)
+                await self._send_combat_update_embed(interaction, player, monster, description, discord.Color.red())
 
 
 async def setup(bot: commands.Bot) -> None:
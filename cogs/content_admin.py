@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import asyncio
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+import config
+from models import catalog
+from utils.content import ContentError, load_catalog
+from utils.data_manager import DataManager
+from utils.metrics import timed
+
+
+class ContentAdminCog(commands.Cog):
+    """
+    ゲームデータ（content/ 以下のJSON）を再起動なしで再読み込みするCog。
+    読み込み・検証に失敗した場合は現在のデータをそのまま使い続ける。
+    クラスタモードではプロセスごとに読み込むため、各ワーカーで実行すること。
+    """
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+        self.data_manager: DataManager = bot.data_manager
+
+    @app_commands.command(name="reload_content", description="アイテム・モンスター・イベントのデータを再読み込みします。")
+    @app_commands.default_permissions(administrator=True)
+    async def reload_content(self, interaction: discord.Interaction) -> None:
+        '''content/ のJSONを読み込み直し、検証に通れば一度に差し替えます。'''
+        await timed("defer", interaction.response.defer(ephemeral=True, thinking=True))
+        try:
+            # File reads and validation stay off the event loop; installing does not.
+            new = await asyncio.to_thread(load_catalog, config.CONTENT_DIR)
+        except ContentError as e:
+            problems = "\n".join(f"- {problem}" for problem in e.problems[:20])
+            more = f"\n…ほか{len(e.problems) - 20}件" if len(e.problems) > 20 else ""
+            await timed("response", interaction.followup.send(
+                f"データに問題があるため再読み込みを中止しました。現在のデータを使い続けます。\n```\n{problems}{more}\n```",
+                ephemeral=True,
+            ))
+            return
+
+        # Install and repoint the cached players on the event loop with no await in between,
+        # so no command sees the new tables next to players holding the old definitions.
+        previous = catalog.install(new)
+        for player in self.data_manager.cache:
+            player.refresh_definitions()
+
+        unchanged = previous is not None and previous.version == new.version
+        # Stored players holding a removed id lose it when they are next loaded
+        removed = sorted(
+            (set(previous.items) - set(new.items)) | (set(previous.monsters) - set(new.monsters))
+        ) if previous is not None else []
+        dropped = (
+            f"\n削除されたID（保存済みのプレイヤーからは次の読み込み時に取り除かれます）: "
+            f"{', '.join(f'`{key}`' for key in removed[:20])}{' …' if len(removed) > 20 else ''}"
+        ) if removed else ""
+        await timed("response", interaction.followup.send(
+            f"ゲームデータを再読み込みしました{'（変更なし）' if unchanged else ''}。\n"
+            f"バージョン: `{new.version}`（前: `{previous.version if previous else '-'}`）\n"
+            f"アイテム {len(new.items)}件 / モンスター {len(new.monsters)}件 / "
+            f"ストーリー {len(new.stories)}件 / 読み込み {new.load_seconds * 1000:.1f}ms{dropped}",
+            ephemeral=True,
+        ))
+
+
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(ContentAdminCog(bot))
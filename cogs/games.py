@@ -4,217 +4,326 @@ from discord.ext import commands
 from discord import app_commands
 import asyncio
 
+import config
+
 # Assuming DataManager, GameLogic, and Player are correctly defined and imported
+from utils import embed_templates
+from utils.adventure_log import AdventureLog
 from utils.data_manager import DataManager
-from utils.game_logic import GameLogic
+from utils.game_logic import AdvanceResult, GameLogic
+from utils.metrics import timed
+from utils.outbound import OutboundScheduler, Priority, channel_route
+from utils.player_locks import PlayerLocks
+from utils.thread_resolver import ThreadResolver
 from models.player import Player
 
 class GamesCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        # Initialize DataManager and GameLogic for persistent data handling and game mechanics
-        self.data_manager = DataManager()
+        # The bot-wide DataManager (shared player cache) and GameLogic for game mechanics
+        self.data_manager: DataManager = bot.data_manager
+        self.player_locks: PlayerLocks = bot.player_locks
+        self.thread_resolver: ThreadResolver = bot.thread_resolver
+        self.outbound: OutboundScheduler = bot.outbound
+        # Rolling edit-in-place event feed (config.ADVENTURE_LOG_ENABLED)
+        self.adventure_log = AdventureLog(self.data_manager, self.player_locks, self.outbound)
         self.game_logic = GameLogic()
 
+    async def cog_unload(self) -> None:
+        await self.adventure_log.close()
+
+    @commands.Cog.listener()
+    async def on_player_idle(self, user_id: int) -> None:
+        # SessionSweeperがメモリから外したプレイヤーの冒険ログ状態も破棄する
+        self.adventure_log.forget(user_id)
+
     @app_commands.command(name="start_2", description="新しい冒険を開始し、専用のプライベートスレッドを作成します。")
     async def start(self, interaction: discord.Interaction):
         '''
         新しい冒険を開始し、ユーザー専用のプライベートスレッドを作成します。
         既存のゲームがある場合は、その旨を通知します。
         '''
-        user_id = interaction.user.id
-
-        # 1. ユーザーが既にアクティブなゲームを持っているかチェック
-        player_data_dict = self.data_manager.get_player_data(user_id)
-        if player_data_dict:
-            player = Player.from_dict(player_data_dict)
-            # 既存のスレッドがある場合は、そこへ誘導
-            if player.current_thread_id:
-                thread = self.bot.get_channel(player.current_thread_id) or await self.bot.fetch_channel(player.current_thread_id)
-                if thread:
-                    await interaction.response.send_message(
-                        f"あなたは既に冒険中です！続きは{thread.mention}で行ってください。\n" +
-                        "新しい冒険を始めるには、現在の冒険を終了する必要があります。（未実装）",
+        # スレッド作成や送信の順番待ちより先に応答する（3秒以内に応答しないとインタラクションが失敗する）
+        await timed("defer", interaction.response.defer(ephemeral=True))
+
+        # 同じコマンドが処理中なら重複実行しない（他のコマンドは順番待ち）
+        if self.player_locks.in_flight(interaction.user.id, "start"):
+            await timed("response", interaction.followup.send("前の操作を処理中です。少し待ってからもう一度試してください。", ephemeral=True))
+            return
+        async with self.player_locks.hold(interaction.user.id, "start"):
+            user_id = interaction.user.id
+
+            # 1. ユーザーが既にアクティブなゲームを持っているかチェック
+            player = await self.data_manager.load_player_data(user_id)
+            if player:
+                # 既存のスレッドがある場合は、そこへ誘導
+                if player.current_thread_id:
+                    thread = await self.thread_resolver.resolve(player.current_thread_id)
+                    if thread:
+                        await timed("response", interaction.followup.send(
+                            f"あなたは既に冒険中です！続きは{thread.mention}で行ってください。\n" +
+                            "新しい冒険を始めるには、現在の冒険を終了する必要があります。（未実装）",
+                            ephemeral=True
+                        ))
+                        return
+                # スレッド情報がないがプレイヤーデータはある場合
+                await timed("response", interaction.followup.send(
+                    f"あなたの冒険データが見つかりました。しかし、紐付けられたスレッドが見つかりません。\n" +
+                    "新しいスレッドを作成して冒険を再開します。",
+                    ephemeral=True
+                ))
+                # 既存のプレイヤーデータがあるがスレッドがない場合、新しいスレッドを作成して紐付け直す
+                player = self.game_logic.initialize_player(user_id) # 新しいプレイヤーとして初期化
+
+            else:
+                # 2. アクティブなゲームがない場合、新しいプレイヤーキャラクターを初期化
+                player = self.game_logic.initialize_player(user_id)
+
+            # 3. ユーザー専用のプライベートスレッドを作成
+            # スレッド名にユーザー名を含めることで、どのユーザーの冒険か分かりやすくする
+            thread_name = f"{interaction.user.display_name}の冒険"
+            try:
+                # interaction.channelがTextChannelであることを期待
+                if isinstance(interaction.channel, discord.TextChannel):
+                    thread = await timed("thread", interaction.channel.create_thread(
+                        name=thread_name,
+                        type=discord.ChannelType.private_thread, # プライベートスレッド
+                        reason=f"{interaction.user.display_name}の新しい冒険"
+                    ))
+                else:
+                    await timed("response", interaction.followup.send(
+                        "このチャンネルでは冒険を開始できません。テキストチャンネルで試してください。",
                         ephemeral=True
-                    )
+                    ))
                     return
-            # スレッド情報がないがプレイヤーデータはある場合
-            await interaction.response.send_message(
-                f"あなたの冒険データが見つかりました。しかし、紐付けられたスレッドが見つかりません。\n" +
-                "新しいスレッドを作成して冒険を再開します。",
-                ephemeral=True
-            )
-            # 既存のプレイヤーデータがあるがスレッドがない場合、新しいスレッドを作成して紐付け直す
-            player = self.game_logic.initialize_player(user_id) # 新しいプレイヤーとして初期化
-
-        else:
-            # 2. アクティブなゲームがない場合、新しいプレイヤーキャラクターを初期化
-            player = self.game_logic.initialize_player(user_id)
-
-        # 3. ユーザー専用のプライベートスレッドを作成
-        # スレッド名にユーザー名を含めることで、どのユーザーの冒険か分かりやすくする
-        thread_name = f"{interaction.user.display_name}の冒険"
-        try:
-            # interaction.channelがTextChannelであることを期待
-            if isinstance(interaction.channel, discord.TextChannel):
-                thread = await interaction.channel.create_thread(
-                    name=thread_name,
-                    type=discord.ChannelType.private_thread, # プライベートスレッド
-                    reason=f"{interaction.user.display_name}の新しい冒険"
-                )
-            else:
-                await interaction.response.send_message(
-                    "このチャンネルでは冒険を開始できません。テキストチャンネルで試してください。",
+            except discord.Forbidden:
+                await timed("response", interaction.followup.send(
+                    "スレッドを作成する権限がありません。ボットに適切な権限を与えてください。",
                     ephemeral=True
-                )
+                ))
                 return
-        except discord.Forbidden:
-            await interaction.response.send_message(
-                "スレッドを作成する権限がありません。ボットに適切な権限を与えてください。",
-                ephemeral=True
+            except Exception as e:
+                await timed("response", interaction.followup.send(
+                    f"スレッドの作成中にエラーが発生しました: {e}",
+                    ephemeral=True
+                ))
+                return
+
+            # 4. 新しいプレイヤーデータにスレッドIDを保存
+            player.current_thread_id = thread.id
+            self.thread_resolver.remember(thread)
+            await self.data_manager.save_player_data(player)
+
+            # 5. 新しく作成されたスレッドに初期のウェルカムメッセージとキャラクターのステータス概要を送信
+            welcome_embed = discord.Embed(
+                title="冒険の始まり！",
+                description=f"{interaction.user.display_name}さん、新しい冒険へようこそ！\n" +
+                            "このスレッドがあなたの冒険の舞台となります。",
+                color=discord.Color.green()
             )
-            return
-        except Exception as e:
-            await interaction.response.send_message(
-                f"スレッドの作成中にエラーが発生しました: {e}",
+            welcome_embed.add_field(name="目標", value="10000m踏破を目指しましょう！", inline=False)
+            welcome_embed.add_field(name="現在のステータス", value=player.get_status_string(), inline=False)
+            welcome_embed.set_footer(text="/m コマンドで前進し、ダンジョンを探索しましょう！")
+
+            await timed("thread", self.outbound.call(channel_route(thread.id), lambda: thread.send(embed=welcome_embed)))
+
+            # 6. 元のインタラクションに応答し、冒険が開始されたことと新しいスレッドへのリンクを通知
+            await timed("response", interaction.followup.send(
+                f"冒険が始まりました！あなたの冒険スレッドは {thread.mention} です。",
                 ephemeral=True
-            )
-            return
+            ))
 
-        # 4. 新しいプレイヤーデータにスレッドIDを保存
-        player.current_thread_id = thread.id
-        self.data_manager.update_player_data(user_id, player.to_dict())
+    @staticmethod
+    def _build_event_embed(event: dict, distance: int) -> discord.Embed:
+        """1イベント分のEmbedを作成する。"""
+        event_type = event.get("type")
 
-        # 5. 新しく作成されたスレッドに初期のウェルカムメッセージとキャラクターのステータス概要を送信
-        welcome_embed = discord.Embed(
-            title="冒険の始まり！",
-            description=f"{interaction.user.display_name}さん、新しい冒険へようこそ！\n" +
-                        "このスレッドがあなたの冒険の舞台となります。",
-            color=discord.Color.green()
+        if event_type == "monster":
+            # モンスターとの遭遇
+            monster = event["monster"]
+            return embed_templates.event_monster(
+                name=monster.name, hp=monster.hp, attack=monster.attack, defense=monster.defense, distance=distance
+            )
+        if event_type == "item":
+            # アイテムの発見
+            return embed_templates.event_item(name=event["item"].name, distance=distance)
+        if event_type == "story":
+            # ストーリーイベント
+            return embed_templates.event_story(message=event.get("message", "何かが起こった..."), distance=distance)
+        # empty or unknown event: 何も起こらない部屋
+        return embed_templates.event_empty(
+            message=event.get("message", "何も起こらなかった。静かな道のようだ。"), distance=distance
         )
-        welcome_embed.add_field(name="目標", value="10000m踏破を目指しましょう！", inline=False)
-        welcome_embed.add_field(name="現在のステータス", value=player.get_status_string(), inline=False)
-        welcome_embed.set_footer(text="/m コマンドで前進し、ダンジョンを探索しましょう！")
 
-        await thread.send(embed=welcome_embed)
+    def _build_advance_embed(self, result: AdvanceResult, player: Player) -> discord.Embed:
+        """前進結果のEmbedを作成する。複数歩の場合は道中のイベントを1つにまとめる。"""
+        if result.steps == 1:
+            return self._build_event_embed(result.events[0], player.distance)
 
-        # 6. 元のインタラクションに応答し、冒険が開始されたことと新しいスレッドへのリンクを通知
-        await interaction.response.send_message(
-            f"冒険が始まりました！あなたの冒険スレッドは {thread.mention} です。",
-            ephemeral=True
+        lines = []
+        # 道中で見つけたアイテム（種類ごとにまとめる）
+        found: dict[str, int] = {}
+        for event in result.events:
+            if event["type"] == "item":
+                found[event["item"].name] = found.get(event["item"].name, 0) + 1
+        if found:
+            lines.append("📦 " + "、".join(f"{name}×{count}" for name, count in found.items()) + " を見つけた！")
+        # 物語の断片（直近のものだけ表示）
+        stories = [event for event in result.events if event["type"] == "story"]
+        for event in stories[-config.ADVANCE_SUMMARY_MAX_STORIES:]:
+            lines.append(f"📜 {event['distance']}m: {event['message']}")
+        quiet_steps = sum(1 for event in result.events if event["type"] == "empty")
+        if quiet_steps:
+            lines.append(f"🚶‍♂️ 静かな道を{quiet_steps}m進んだ。")
+
+        if result.monster:
+            monster = result.monster
+            lines.append(
+                f"\n{result.events[-1]['distance']}m地点で{monster.name}が現れた！\n"
+                f"HP: {monster.hp}, ATK: {monster.attack}, DEF: {monster.defense}\n"
+                "どうする？ `/attack`, `/item`, `/run`"
+            )
+            return embed_templates.advance_monster(
+                name=monster.name, description="\n".join(lines), start=result.start_distance, distance=player.distance
+            )
+        return embed_templates.advance_summary(
+            steps=result.steps,
+            description="\n".join(lines) or "何も起こらなかった。",
+            start=result.start_distance,
+            distance=player.distance,
         )
 
+    @staticmethod
+    def _build_log_lines(result: AdvanceResult) -> list[str]:
+        """冒険ログ用に前進結果を1行ずつにする。連続する静かな道は1行にまとめる。"""
+        lines = []
+        quiet: list[dict] = []
+        for event in result.events + [None]:
+            if event is not None and event["type"] == "empty":
+                quiet.append(event)
+                continue
+            if len(quiet) == 1:
+                lines.append(f"🚶‍♂️ {quiet[0]['distance']}m: {quiet[0]['message']}")
+            elif quiet:
+                lines.append(f"🚶‍♂️ {quiet[0]['distance']}–{quiet[-1]['distance']}m: 静かな道が続いた。")
+            quiet = []
+            if event is None:
+                break
+            if event["type"] == "item":
+                lines.append(f"📦 {event['distance']}m: {event['item'].name}を見つけた！")
+            elif event["type"] == "story":
+                lines.append(f"📜 {event['distance']}m: {event['message']}")
+        return lines
+
     @app_commands.command(name="m", description="ダンジョンを前進します。ランダムなイベントが発生します。")
-    async def m(self, interaction: discord.Interaction):
+    @app_commands.describe(
+        steps="まとめて進む距離（m）。モンスターに遭遇した時点で止まります。",
+        auto="モンスターに遭遇するまで自動で進みます。"
+    )
+    async def m(
+        self,
+        interaction: discord.Interaction,
+        steps: app_commands.Range[int, 1, config.MAX_STEPS_PER_COMMAND] = 1,
+        auto: bool = False
+    ):
         '''
         ダンジョンを前進し、ランダムなイベント（敵、アイテム、ストーリーなど）を発生させます。
+        複数歩進む場合は、入力が必要なイベント（モンスター）で停止し、道中の結果を1つにまとめて表示します。
         '''
-        user_id = interaction.user.id
-
-        # 1. ユーザーがアクティブなゲームを持っているかチェック
-        player_data_dict = self.data_manager.get_player_data(user_id)
-        if not player_data_dict:
-            await interaction.response.send_message(
-                "冒険を開始するには `/start` コマンドを使用してください。",
-                ephemeral=True
-            )
-            return
-
-        player = Player.from_dict(player_data_dict)
+        # スレッドへの送信は混雑時に順番待ちになるため、先に応答を遅延させておく
+        await timed("defer", interaction.response.defer(ephemeral=True))
 
-        # 2. プレイヤーが現在戦闘中ではないかチェック
-        if player.in_combat:
-            await interaction.response.send_message(
-                "あなたは現在戦闘中です！ `/attack`, `/item`, `/run` のいずれかを使用してください。",
-                ephemeral=True
-            )
+        # 同じコマンドが処理中なら重複実行しない（他のコマンドは順番待ち）
+        if self.player_locks.in_flight(interaction.user.id, "m"):
+            await timed("response", interaction.followup.send("前の操作を処理中です。少し待ってからもう一度試してください。", ephemeral=True))
             return
+        async with self.player_locks.hold(interaction.user.id, "m"):
+            user_id = interaction.user.id
 
-        # 3. プレイヤーの現在のダンジョン状態とキャラクターデータを取得
-        # スレッドが現在のインタラクションのチャンネルと一致するか確認
-        if interaction.channel_id != player.current_thread_id:
-            # ユーザーが間違った場所でコマンドを実行した場合、正しいスレッドへ誘導
-            thread = self.bot.get_channel(player.current_thread_id) or await self.bot.fetch_channel(player.current_thread_id)
-            if thread:
-                await interaction.response.send_message(
-                    f"このコマンドはあなたの冒険スレッド {thread.mention} で実行してください。",
+            # 1. ユーザーがアクティブなゲームを持っているかチェック
+            player = await self.data_manager.load_player_data(user_id)
+            if not player:
+                await timed("response", interaction.followup.send(
+                    "冒険を開始するには `/start` コマンドを使用してください。",
                     ephemeral=True
-                )
-            else:
-                await interaction.response.send_message(
-                    "あなたの冒険スレッドが見つかりません。`/start` で新しい冒険を開始してください。",
+                ))
+                return
+
+            # 2. プレイヤーが現在戦闘中ではないかチェック
+            if player.in_combat:
+                await timed("response", interaction.followup.send(
+                    "あなたは現在戦闘中です！ `/attack`, `/item`, `/run` のいずれかを使用してください。",
                     ephemeral=True
-                )
-            return
+                ))
+                return
 
-        # 4. ダンジョンを前進させ、距離を更新
-        player.distance += 1
+            # 3. プレイヤーの現在のダンジョン状態とキャラクターデータを取得
+            # スレッドが現在のインタラクションのチャンネルと一致するか確認
+            if interaction.channel_id != player.current_thread_id:
+                # ユーザーが間違った場所でコマンドを実行した場合、正しいスレッドへ誘導
+                thread = await self.thread_resolver.resolve(player.current_thread_id)
+                if thread:
+                    await timed("response", interaction.followup.send(
+                        f"このコマンドはあなたの冒険スレッド {thread.mention} で実行してください。",
+                        ephemeral=True
+                    ))
+                else:
+                    await timed("response", interaction.followup.send(
+                        "あなたの冒険スレッドが見つかりません。`/start` で新しい冒険を開始してください。",
+                        ephemeral=True
+                    ))
+                return
 
-        # 5. GameLogicを使用して次のダンジョンイベントを決定
-        event = self.game_logic.generate_event(player)
-        event_type = event.get("type")
-        event_message = ""
-        event_embed = discord.Embed(color=discord.Color.blue())
+            # 4. GameLogicでダンジョンを前進させ、道中のイベントを決定（モンスター出現で停止）
+            max_steps = config.AUTO_EXPLORE_MAX_STEPS if auto else steps
+            result = self.game_logic.advance(player, max_steps)
 
-        if event_type == "monster":
-            # モンスターとの遭遇
-            monster = event.get("monster")
-            player.in_combat = True
-            player.current_monster = monster
-            event_embed.title = f"⚔️ モンスター出現！ - {monster['name']}"
-            event_embed.description = (
-                f"{monster['name']}が現れた！\n" +
-                f"HP: {monster['hp']}, ATK: {monster['attack']}, DEF: {monster['defense']}\n" +
-                "どうする？ `/attack`, `/item`, `/run`"
-            )
-            event_embed.color = discord.Color.red()
+            # 5. 更新されたプレイヤーデータを先に保存（スレッドへの投稿が失敗しても前進は失われない）
+            await self.data_manager.save_player_data(player)
 
-        elif event_type == "item":
-            # アイテムの発見
-            item = event.get("item")
-            player.inventory.append(item['name']) # アイテムをインベントリに追加
-            event_embed.title = f"📦 アイテム発見！ - {item['name']}"
-            event_embed.description = f"{item['name']}を見つけた！インベントリに追加されました。"
-            event_embed.color = discord.Color.gold()
+            # 6. プライベートアドベンチャースレッドにイベントを反映（失敗してもコマンドは続行する）
+            # コマンドはスレッド内で実行されているので、通常はキャッシュから即座に解決できる
+            adventure_thread = await self.thread_resolver.resolve(player.current_thread_id, unarchive=True)
+            posted = False
+            if adventure_thread:
+                last_message_id = player.last_event_message_id
+                try:
+                    if config.ADVENTURE_LOG_ENABLED and not result.monster:
+                        # 入力不要なイベントは冒険ログメッセージを編集して追記（編集はまとめて送信される）
+                        await self.adventure_log.append(player, adventure_thread, self._build_log_lines(result))
+                    else:
+                        # モンスターなど入力が必要なイベントは新しいメッセージとして送信
+                        event_embed = self._build_advance_embed(result, player)
+                        sent_message = await timed("thread", self.outbound.call(
+                            channel_route(adventure_thread.id), lambda: adventure_thread.send(embed=event_embed)
+                        ))
+                        if config.ADVENTURE_LOG_ENABLED:
+                            self.adventure_log.close_log(player) # 次の前進では新しいログをこの下に作る
+                        else:
+                            player.last_event_message_id = sent_message.id # 最後のイベントメッセージIDを保存
+                    posted = True
+                except discord.HTTPException as e:
+                    print(f"Failed to post to adventure thread {adventure_thread.id}: {e}")
+                if player.last_event_message_id != last_message_id:
+                    # メッセージIDの変更も保存（上の保存と同じコミットにまとめられる）
+                    await self.data_manager.save_player_data(player)
 
-        elif event_type == "story":
-            # ストーリーイベント
-            event_embed.title = "📜 物語の断片"
-            event_embed.description = event.get("message", "何かが起こった...")
-            event_embed.color = discord.Color.purple()
-
-        else: # empty or unknown event
-            # 何も起こらない部屋
-            event_embed.title = "🚶‍♂️ 静かな道"
-            event_embed.description = event.get("message", "何も起こらなかった。静かな道のようだ。")
-            event_embed.color = discord.Color.light_grey()
-
-        event_embed.set_footer(text=f"現在地: {player.distance}m")
-
-        # 6. 更新されたプレイヤーとダンジョンデータを保存
-        self.data_manager.update_player_data(user_id, player.to_dict())
-
-        # 7. プライベートアドベンチャースレッドにイベントの詳細メッセージを送信
-        adventure_thread = self.bot.get_channel(player.current_thread_id)
-        if adventure_thread:
-            # 以前のイベントメッセージがある場合、それを編集して新しいイベントを追加する（オプション）
-            # 今回はシンプルに新しいメッセージを送信
-            sent_message = await adventure_thread.send(embed=event_embed)
-            player.last_event_message_id = sent_message.id # 最後のイベントメッセージIDを保存
-            self.data_manager.update_player_data(user_id, player.to_dict())
-        else:
-            # スレッドが見つからない場合はエラーを報告
-            await interaction.followup.send(
-                "冒険スレッドが見つかりませんでした。`/start` で新しい冒険を開始してください。",
-                ephemeral=True
-            )
-            return
+            if not adventure_thread:
+                # スレッドが見つからない場合はエラーを報告
+                await timed("response", interaction.followup.send(
+                    "冒険スレッドが見つかりませんでした。`/start` で新しい冒険を開始してください。",
+                    ephemeral=True
+                ))
+                return
 
-        # 8. 元のインタラクションに応答し、プレイヤーが移動したことを確認
-        await interaction.response.send_message(
-            f"ダンジョンを前進しました。現在地: {player.distance}m",
-            ephemeral=True
-        )
+            # 7. 元のインタラクションに応答し、プレイヤーが移動したことを確認
+            message = f"ダンジョンを{result.steps}m前進しました。現在地: {player.distance}m"
+            if not posted:
+                # スレッドに結果が出ていないので、ここで伝える
+                message += "\n⚠️ 冒険スレッドへの投稿に失敗しました。"
+                if result.monster:
+                    message += f"\n{result.monster.name}が現れた！ `/attack`, `/item`, `/run`"
+            await timed("response", interaction.followup.send(message, ephemeral=True))
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(GamesCog(bot))
\ No newline at end of file
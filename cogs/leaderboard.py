@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+import config
+from utils import embed_templates
+from utils.data_manager import DataManager
+from utils.leaderboard import Standing
+from utils.metrics import timed
+
+BOARD_TITLES = {"best": "最高到達距離", "current": "現在の進行距離"}
+BOARD_CHOICES = [app_commands.Choice(name=title, value=board) for board, title in BOARD_TITLES.items()]
+MEDALS = {1: "🥇", 2: "🥈", 3: "🥉"}
+
+
+class LeaderboardCog(commands.Cog):
+    """
+    距離ランキング（/leaderboard, /rank）を表示するCog。
+    順位はDataManagerが保存のたびに更新する索引から求めるため、全プレイヤーを走査しない。
+    """
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+        self.data_manager: DataManager = bot.data_manager
+
+    @staticmethod
+    def _format_standing(standing: Standing) -> str:
+        place = MEDALS.get(standing.rank, f"{standing.rank}位")
+        goal = " 🏁" if standing.distance >= config.GOAL_DISTANCE else ""
+        return f"{place} **{standing.name}** - {standing.distance}m{goal}"
+
+    @app_commands.command(name="leaderboard", description="到達距離のランキングを表示します。")
+    @app_commands.describe(board="ランキングの種類", page="表示するページ")
+    @app_commands.choices(board=BOARD_CHOICES)
+    async def leaderboard(
+        self,
+        interaction: discord.Interaction,
+        board: app_commands.Choice[str] | None = None,
+        page: app_commands.Range[int, 1, 1000] = 1,
+    ) -> None:
+        '''上位プレイヤーを1ページ分表示します。'''
+        board_name = board.value if board else "best"
+        standings = await self.data_manager.standings()
+        page_size = config.LEADERBOARD_PAGE_SIZE
+        entries = standings.top(board_name, page_size, offset=(page - 1) * page_size)
+
+        if not entries:
+            message = "まだ誰も冒険を始めていません。" if page == 1 else f"{page}ページ目には誰もいません。"
+            await timed("response", interaction.response.send_message(message, ephemeral=True))
+            return
+
+        lines = "\n".join(self._format_standing(standing) for standing in entries)
+        own = standings.standing(board_name, interaction.user.id)
+        if own is not None and own.user_id not in {standing.user_id for standing in entries}:
+            lines += f"\n…\nあなた: {self._format_standing(own)}"
+
+        embed = embed_templates.leaderboard(
+            title=BOARD_TITLES[board_name],
+            lines=lines,
+            page=page,
+            players=len(standings),
+            goal=config.GOAL_DISTANCE,
+        )
+        await timed("response", interaction.response.send_message(embed=embed))
+
+    @app_commands.command(name="rank", description="自分（または指定したユーザー）の順位を表示します。")
+    @app_commands.describe(user="順位を調べるユーザー（省略時は自分）")
+    async def rank(self, interaction: discord.Interaction, user: discord.User | None = None) -> None:
+        '''最高到達距離と現在の進行距離、それぞれの順位を表示します。'''
+        target = user or interaction.user
+        standings = await self.data_manager.standings()
+        best = standings.standing("best", target.id)
+        current = standings.standing("current", target.id)
+
+        if best is None or current is None:
+            message = (
+                "冒険が始まっていません。`/start` コマンドで新しい冒険を開始してください。"
+                if target.id == interaction.user.id
+                else f"{target.display_name}さんはまだ冒険を始めていません。"
+            )
+            await timed("response", interaction.response.send_message(message, ephemeral=True))
+            return
+
+        embed = embed_templates.rank(
+            thumbnail=target.display_avatar.url,
+            name=best.name,
+            best=f"{best.rank}位 ({best.distance}m)",
+            current=f"{current.rank}位 ({current.distance}m)",
+            players=len(standings),
+            goal=config.GOAL_DISTANCE,
+        )
+        await timed("response", interaction.response.send_message(embed=embed, ephemeral=True))
+
+
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(LeaderboardCog(bot))
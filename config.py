@@ -6,17 +6,63 @@ DISCORD_TOKEN_ENV_VAR: str = "DISCORD_TOKEN"
 
 # --- Data Persistence Configuration ---
 DATA_DIR: str = "data"
+DATABASE_FILE: str = os.path.join(DATA_DIR, "database.db")
+SQLITE_STATEMENT_CACHE_SIZE: int = 64
+SQLITE_BUSY_TIMEOUT_MS: int = 5000  # how long a write waits for another process's transaction
+PLAYER_CACHE_SIZE: int = 2048  # players kept decoded in memory (LRU)
+WRITE_BATCH_INTERVAL: float = 0.005  # seconds between group commits
+WRITE_BATCH_MAX_RECORDS: int = 256  # commit early once this many players are dirty
+WRITE_RETRY_DELAY: float = 1.0
+PERSISTENCE_MODE: str = "snapshot"  # "snapshot": rewrite the player per save; "journal": append a delta per save
+JOURNAL_SNAPSHOT_INTERVAL: int = 50  # journal mode: full player rewrite every this many entries
+LEADERBOARD_PAGE_SIZE: int = 10  # players per /leaderboard page
+LEADERBOARD_REFRESH_INTERVAL: float = 60.0  # shared store: seconds between rebuilds that pick up other processes' players
+THREAD_CACHE_SIZE: int = 4096  # adventure threads kept resolved in memory (LRU)
+THREAD_NEGATIVE_TTL: float = 300.0  # seconds a missing/forbidden thread id is remembered
+SESSION_SWEEP_INTERVAL: float = 300.0  # seconds between idle-session sweeps; 0 disables the sweeper
+SESSION_IDLE_SECONDS: float = 1800.0  # players unused this long are flushed and evicted from memory
+THREAD_ARCHIVE_IDLE_SECONDS: float = 900.0  # idle players' adventure threads are archived after this long
+THREAD_ARCHIVE_CONCURRENCY: int = 2  # archive requests one sweep keeps queued at once (lowest outbound priority)
+OUTBOUND_MAX_IN_FLIGHT: int = 10  # concurrent REST calls across all routes
+OUTBOUND_MAX_RETRIES: int = 3  # retries of a request answered with 429
+
+# Legacy whole-file JSON stores (superseded by DATABASE_FILE)
 PLAYER_DATA_FILE: str = os.path.join(DATA_DIR, "player_data.json")
 DUNGEON_DATA_FILE: str = os.path.join(DATA_DIR, "dungeon_data.json")
 GAME_STATE_FILE: str = os.path.join(DATA_DIR, "game_state.json")
+MIGRATION_STATE_FILE: str = os.path.join(DATA_DIR, "legacy_migration.db")  # checkpoints of utils/legacy_migration.py
+MIGRATION_BATCH_SIZE: int = 500  # legacy records imported per transaction
+COMMAND_SYNC_HASH_FILE: str = os.path.join(DATA_DIR, "command_tree.sha256")  # hash of the last synced slash commands
 
 # --- Game Constants ---
+CONTENT_DIR: str = "content"  # items.json, monsters.json, events.json; /reload_content re-reads them
 STARTING_HEALTH: int = 100
 STARTING_ATTACK: int = 10
 STARTING_DEFENSE: int = 5
 STARTING_GOLD: int = 0
 MAX_INVENTORY_SLOTS: int = 10
+GOAL_DISTANCE: int = 10000
+ENCOUNTER_BAND_WIDTH: int = 100  # metres per precompiled event table
+MAX_STEPS_PER_COMMAND: int = 50  # /m steps:N upper bound
+AUTO_EXPLORE_MAX_STEPS: int = 200  # /m auto:True walks until an encounter or this many metres
+ADVANCE_SUMMARY_MAX_STORIES: int = 5  # story lines shown in a multi-step summary
+ADVENTURE_LOG_ENABLED: bool = True  # /m edits one rolling log message instead of posting per step
+ADVENTURE_LOG_SIZE: int = 10  # events kept in the log message
+ADVENTURE_LOG_EDIT_INTERVAL: float = 1.0  # seconds; edits inside this window are coalesced
+BASE_MONSTER_CHANCE: float = 0.20  # per-step encounter rate at 0m
+MAX_MONSTER_CHANCE: float = 0.35  # per-step encounter rate at the goal
+BASE_ESCAPE_CHANCE: float = 0.5
+MONSTER_DROP_CHANCE: float = 0.3
+
+# --- Cluster Mode (cluster.py) ---
+CLUSTER_WORKERS: int = 0  # worker processes; 0 = one per CPU core (never more than shards)
+CLUSTER_SHARD_COUNT: int = 0  # total shards; 0 = Discord's recommendation for the bot
+CLUSTER_REPORT_INTERVAL: float = 5.0  # seconds between a worker's status/metrics reports
+CLUSTER_START_TIMEOUT: float = 120.0  # wait this long for a worker's shards before starting the next
+CLUSTER_RESTART_BACKOFF: float = 5.0  # first restart delay after a worker dies; doubles per crash
+CLUSTER_RESTART_BACKOFF_MAX: float = 300.0  # cap; a worker that ran this long restarts at the base delay
+CLUSTER_STOP_TIMEOUT: float = 30.0  # seconds a worker gets to flush and exit before it is killed
 
-# --- Flask Server Configuration (for keep_alive.py) ---
-FLASK_PORT_ENV_VAR: str = "PORT"
-DEFAULT_FLASK_PORT: int = 8080
+# --- Health Server Configuration (for keep_alive.py) ---
+HTTP_PORT_ENV_VAR: str = "PORT"
+DEFAULT_HTTP_PORT: int = 8080
@@ -1,20 +1,81 @@
+"""Health, readiness and metrics HTTP server on the bot's own event loop.
+
+aiohttp is already a discord.py dependency, so the endpoints are served
+from the same loop as the gateway: no second runtime, no server thread,
+and handlers can read bot state directly. Uptime probes only touch a few
+attributes, so a burst of them costs nothing beyond the sockets.
+
+* ``/`` and ``/healthz`` - liveness: the process and its loop respond
+* ``/ready`` - readiness: 200 once the gateway is connected and every cog
+  loaded, 503 (with the details as JSON) otherwise
+* ``/metrics`` - Prometheus text (see ``utils/metrics.py``)
+"""
 from __future__ import annotations
+
+import math
 import os
-from flask import Flask
-from threading import Thread
+from typing import Any, Callable
+
+import discord
+from aiohttp import web
+from discord.ext import commands
+
+import config
+from utils.metrics import render_prometheus
+
+
+def gateway_connected(bot: commands.Bot) -> bool:
+    if not bot.is_ready() or bot.is_closed():
+        return False
+    if isinstance(bot, discord.AutoShardedClient):
+        return bool(bot.shards) and all(not shard.is_closed() for shard in bot.shards.values())
+    # is_ready() stays true across reconnects; the socket tells whether we are connected now.
+    return bot.ws is not None and bot.ws.open
+
+
+def readiness(bot: commands.Bot) -> dict[str, Any]:
+    """The /ready body: gateway state plus per-cog load status and time."""
+    cogs: dict[str, str] = bot.extension_status
+    connected = gateway_connected(bot)
+    return {
+        "ready": connected and bool(cogs) and all(status == "loaded" for status in cogs.values()),
+        "gateway_connected": connected,
+        "latency": bot.latency if math.isfinite(bot.latency) else None,
+        "cogs": cogs,
+        "cog_load_ms": {ext: round(seconds * 1000, 1) for ext, seconds in bot.extension_load_seconds.items()},
+    }
+
+
+def create_app(ready: Callable[[], dict[str, Any]], metrics: Callable[[], str]) -> web.Application:
+    """Routes over two callables, so the cluster supervisor can serve aggregates the same way."""
+
+    async def home(request: web.Request) -> web.Response:
+        return web.Response(text="OK")
+
+    async def ready_route(request: web.Request) -> web.Response:
+        body = ready()
+        return web.json_response(body, status=200 if body["ready"] else 503)
+
+    async def metrics_route(request: web.Request) -> web.Response:
+        return web.Response(text=metrics(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/", home)
+    app.router.add_get("/healthz", home)
+    app.router.add_get("/ready", ready_route)
+    app.router.add_get("/metrics", metrics_route)
+    return app
 
-app = Flask(__name__)
 
-@app.route('/')
-def home() -> str:
-    return "OK"
+async def serve(app: web.Application) -> web.AppRunner:
+    """Start serving ``app`` on ``$PORT``; call ``await runner.cleanup()`` on shutdown."""
+    port = int(os.getenv(config.HTTP_PORT_ENV_VAR, config.DEFAULT_HTTP_PORT))
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host="0.0.0.0", port=port).start()
+    print(f"Health server listening on port {port}")
+    return runner
 
-def run_flask_app() -> None:
-    port = int(os.getenv("PORT", 8080))
-    print(f"Starting Flask server on port {port}...")
-    app.run(host='0.0.0.0', port=port)
 
-def start_server() -> None:
-    server_thread = Thread(target=run_flask_app)
-    server_thread.daemon = True # Allows the main program to exit even if the thread is still running
-    server_thread.start()
+async def keep_alive(bot: commands.Bot) -> web.AppRunner:
+    return await serve(create_app(lambda: readiness(bot), lambda: render_prometheus(bot)))
@@ -3,51 +3,137 @@ from __future__ import annotations
 
 import asyncio
 import os
+import time
 from pathlib import Path
 
 import discord
 from discord.ext import commands
 
 from keep_alive import keep_alive
+from models import catalog
+from utils.command_sync import sync_if_changed
+from utils.data_manager import DataManager
+from utils.metrics import CommandMetrics, InstrumentedTree
+from utils.outbound import OutboundScheduler
+from utils.player_locks import PlayerLocks
+from utils.session_sweeper import SessionSweeper
+from utils.thread_resolver import ThreadResolver
 
 
-intents = discord.Intents.default()
-intents.message_content = True
-intents.guilds = True
-intents.members = True
+def create_bot(
+    *,
+    shard_ids: list[int] | None = None,
+    shard_count: int | None = None,
+    shared_store: bool = False,
+    sync_commands: bool = True,
+) -> commands.Bot:
+    """Build the bot and the objects its cogs share.
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+    With ``shard_ids`` it is an ``AutoShardedBot`` running just those shards
+    of ``shard_count`` (one cluster worker, see cluster.py); ``shared_store``
+    tells the DataManager other processes write the same database.
+    """
+    intents = discord.Intents.default()
+    intents.message_content = True
+    intents.guilds = True
+    intents.members = True
 
+    if shard_ids is None:
+        bot = commands.Bot(command_prefix="!", intents=intents, tree_cls=InstrumentedTree)
+    else:
+        bot = commands.AutoShardedBot(
+            command_prefix="!", intents=intents, tree_cls=InstrumentedTree,
+            shard_ids=shard_ids, shard_count=shard_count,
+        )
+    # Per-command phase timings, served at /metrics
+    bot.metrics = CommandMetrics()
+    # One store and player cache shared by every cog
+    bot.data_manager = DataManager(shared=shared_store)
+    # Serializes state-changing commands per player
+    bot.player_locks = PlayerLocks()
+    # Adventure thread lookups without a REST call per command
+    bot.thread_resolver = ThreadResolver(bot)
+    # Prioritized, per-route queue for thread messages, log edits and follow-ups
+    bot.outbound = OutboundScheduler()
+    # Evicts idle players and archives their threads (started in setup_hook)
+    bot.session_sweeper = SessionSweeper(
+        bot, bot.data_manager, bot.player_locks, bot.thread_resolver, bot.outbound
+    )
+    # Extension name -> "loaded" or the load error, and load time in seconds; reported by /ready
+    bot.extension_status = {}
+    bot.extension_load_seconds = {}
 
-@bot.event
-async def on_ready():
-    print(f"Logged in as {bot.user}")
-    await bot.tree.sync()
-    print("Commands synced!")
+    @bot.event
+    async def setup_hook():
+        # Runs once per process (after login, before the gateway connects), not on
+        # every reconnect like on_ready; and only syncs when the commands changed.
+        try:
+            await bot.data_manager.standings()  # rankings ready before the first /leaderboard
+        except Exception as e:
+            print(f"Failed to build the leaderboard: {e}")
+        bot.session_sweeper.start()
+        if not sync_commands:
+            return
+        try:
+            synced = await sync_if_changed(bot)
+        except discord.HTTPException as e:
+            print(f"Failed to sync commands: {e}")
+            return
+        print("Commands synced!" if synced else "Commands unchanged, skipped sync")
+
+    @bot.event
+    async def on_ready():
+        print(f"Logged in as {bot.user}")
 
+    return bot
 
-async def load_cogs() -> None:
+
+async def load_cogs(bot: commands.Bot) -> None:
     """Load all cogs dynamically from ./cogs"""
     cogs_dir = Path(__file__).parent / "cogs"
     if not cogs_dir.exists():
         print("No cogs/ directory found")
         return
 
-    for path in sorted(cogs_dir.glob("*.py")):
-        if path.name == "__init__.py":
-            continue
-        ext = f"cogs.{path.stem}"
+    async def load(ext: str) -> None:
+        start = time.perf_counter()
         try:
             await bot.load_extension(ext)
-            print(f"Loaded {ext}")
         except Exception as e:
+            bot.extension_status[ext] = f"failed: {e}"
             print(f"Failed to load {ext}: {e}")
+        else:
+            bot.extension_status[ext] = "loaded"
+            print(f"Loaded {ext} in {(time.perf_counter() - start) * 1000:.1f}ms")
+        bot.extension_load_seconds[ext] = time.perf_counter() - start
+
+    # Each cog's setup() runs concurrently; a slow or failing cog does not hold up the rest.
+    start = time.perf_counter()
+    extensions = [f"cogs.{path.stem}" for path in sorted(cogs_dir.glob("*.py")) if path.name != "__init__.py"]
+    await asyncio.gather(*(load(ext) for ext in extensions))
+    print(f"Loaded {len(extensions)} extensions in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+
+async def run_bot(bot: commands.Bot, *, serve_http: bool = True) -> None:
+    """Load the cogs and run ``bot`` until it closes, then flush and close the store."""
+    # Served from this loop; up before the cogs so liveness probes pass during startup
+    health_server = await keep_alive(bot) if serve_http else None
+    # Invalid content raises ContentError here rather than on the first command
+    content = catalog.current()
+    print(f"Loaded content {content.version} in {content.load_seconds * 1000:.1f}ms")
+    await load_cogs(bot)
+    try:
+        await bot.start(os.getenv("DISCORD_TOKEN"))
+    finally:
+        if health_server is not None:
+            await health_server.cleanup()
+        await bot.session_sweeper.stop()
+        bot.outbound.close()
+        await bot.data_manager.close()
 
 
 async def main() -> None:
-    keep_alive()
-    await load_cogs()
-    await bot.start(os.getenv("DISCORD_TOKEN"))
+    await run_bot(create_bot())
 
 
 if __name__ == "__main__":
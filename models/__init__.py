@@ -0,0 +1 @@
+"""Game models package"""
@@ -0,0 +1,98 @@
+"""The live game content: items, monsters and road events.
+
+A ``Catalog`` is built by ``utils.content.load_catalog`` from the files in
+``CONTENT_DIR``: validated, then compiled into read-only tables (by id, by
+display name, by type, and the per-band encounter tables). It is never
+modified afterwards. ``current()`` returns the installed one, loading the
+content directory on first use; ``install`` swaps in a new one with a
+single assignment, so a reload is atomic: a command sees either the old
+catalog or the new one, never a mix.
+
+``ITEM_CATALOG``, ``MONSTER_CATALOG`` and friends are ``LiveMapping``
+views that always read the installed catalog, so modules that imported
+them keep working across reloads.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Iterator, Mapping
+
+if TYPE_CHECKING:
+    from models.dungeon import MonsterDef
+    from models.player import ItemDef
+    from utils.encounter_tables import EncounterTables
+
+
+class Catalog:
+    """One compiled, immutable version of the game content."""
+    __slots__ = (
+        "version", "source", "load_seconds",
+        "items", "items_by_name", "items_by_key", "items_by_type", "starter_kit",
+        "monsters", "monsters_by_name",
+        "loot", "stories", "empty_messages", "item_event_chance", "story_event_chance",
+        "tables",
+    )
+
+    def __init__(self, **tables: Any) -> None:
+        for name in self.__slots__:
+            object.__setattr__(self, name, tables[name])
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("Catalog is immutable; build a new one and install() it")
+
+    # Declared for type checkers; set in __init__.
+    version: str  # content hash of the source files
+    source: str  # directory it was loaded from
+    load_seconds: float  # read + validate + compile
+    items: Mapping[str, ItemDef]
+    items_by_name: Mapping[str, ItemDef]
+    items_by_key: Mapping[str, ItemDef]  # normalized display name and id
+    items_by_type: Mapping[str, tuple[ItemDef, ...]]
+    starter_kit: tuple[tuple[ItemDef, int], ...]
+    monsters: Mapping[str, MonsterDef]
+    monsters_by_name: Mapping[str, MonsterDef]
+    loot: tuple[tuple[int, ItemDef, int], ...]  # (min_distance, item, weight)
+    stories: tuple[tuple[int, str], ...]  # (min_distance, message)
+    empty_messages: tuple[str, ...]
+    item_event_chance: float
+    story_event_chance: float
+    tables: EncounterTables
+
+
+_current: Catalog | None = None
+
+
+def current() -> Catalog:
+    if _current is None:
+        from utils.content import load_catalog  # the loader imports the models; load lazily
+        install(load_catalog())
+    return _current
+
+
+def install(catalog: Catalog) -> Catalog | None:
+    """Make ``catalog`` the live content; returns the one it replaced."""
+    global _current
+    previous, _current = _current, catalog
+    return previous
+
+
+class LiveMapping(Mapping[str, Any]):
+    """Read-only view of one table of whichever catalog is installed."""
+    __slots__ = ("_table",)
+
+    def __init__(self, table: str) -> None:
+        self._table = table
+
+    def __getitem__(self, key: str) -> Any:
+        return getattr(current(), self._table)[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(current(), self._table).get(key, default)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(getattr(current(), self._table))
+
+    def __len__(self) -> int:
+        return len(getattr(current(), self._table))
+
+    def __repr__(self) -> str:
+        return f"LiveMapping({self._table!r})"
@@ -0,0 +1,78 @@
+"""Monster models.
+
+Monster stats come from the content catalog (``content/monsters.json``,
+see ``models/catalog.py``); a live monster only stores its template and
+its current HP.
+"""
+from __future__ import annotations
+
+from typing import Any, Mapping, NamedTuple
+
+from models import catalog
+
+
+class MonsterDef(NamedTuple):
+    """Immutable monster template. It appears from ``min_distance`` metres on."""
+    monster_id: str
+    name: str
+    max_hp: int
+    attack: int
+    defense: int
+    exp: int
+    gold: int
+    min_distance: int
+    weight: int = 10  # relative encounter weight among eligible monsters
+
+
+# Views of the installed catalog's tables (they follow reloads)
+MONSTER_CATALOG: Mapping[str, MonsterDef] = catalog.LiveMapping("monsters")
+MONSTERS_BY_NAME: Mapping[str, MonsterDef] = catalog.LiveMapping("monsters_by_name")
+
+
+def get_monster_def(key: str) -> MonsterDef:
+    """Look up a template by id, falling back to its display name."""
+    content = catalog.current()
+    monster_def = content.monsters.get(key) or content.monsters_by_name.get(key)
+    if monster_def is None:
+        raise KeyError(f"Unknown monster: {key}")
+    return monster_def
+
+
+class Monster:
+    """A monster in combat: a shared ``MonsterDef`` plus its remaining HP."""
+    __slots__ = ("definition", "hp")
+
+    def __init__(self, definition: MonsterDef, hp: int | None = None) -> None:
+        self.definition = definition
+        self.hp = definition.max_hp if hp is None else hp
+
+    @property
+    def monster_id(self) -> str:
+        return self.definition.monster_id
+
+    @property
+    def name(self) -> str:
+        return self.definition.name
+
+    @property
+    def max_hp(self) -> int:
+        return self.definition.max_hp
+
+    @property
+    def attack(self) -> int:
+        return self.definition.attack
+
+    @property
+    def defense(self) -> int:
+        return self.definition.defense
+
+    def __repr__(self) -> str:
+        return f"Monster({self.monster_id!r}, hp={self.hp})"
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"id": self.monster_id, "hp": self.hp}
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> Monster:
+        # Older records carried the full stat block keyed by "name".
+        return cls(get_monster_def(data.get("id") or data["name"]), data.get("hp"))
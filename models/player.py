@@ -0,0 +1,365 @@
+"""Player and item models shared by the cogs and the data layer.
+
+Item definitions live in the content catalog (``content/items.json``, see
+``models/catalog.py``) and are shared by every player; an inventory entry
+only holds a reference to its definition plus the per-instance quantity.
+An ``Inventory`` holds one stack per catalog item, indexed by id and
+bucketed by type, so finding, adding and consuming an item never scans the
+other stacks.
+"""
+from __future__ import annotations
+
+import unicodedata
+from typing import Any, Iterable, Iterator, Mapping, NamedTuple
+
+import config
+from models import catalog
+from models.dungeon import Monster
+
+EQUIPMENT_SLOTS: tuple[str, ...] = ("weapon", "armor")
+
+
+class ItemDef(NamedTuple):
+    """Immutable catalog entry. ``value`` is the heal/damage amount or the ATK/DEF bonus."""
+    item_id: str
+    name: str
+    item_type: str  # "consumable", "weapon" or "armor"
+    description: str
+    value: int
+    slot: str | None = None
+    effect: str | None = None  # consumables: "heal" or "damage"
+
+
+# Views of the installed catalog's tables (they follow reloads)
+ITEM_CATALOG: Mapping[str, ItemDef] = catalog.LiveMapping("items")
+ITEMS_BY_NAME: Mapping[str, ItemDef] = catalog.LiveMapping("items_by_name")
+ITEMS_BY_KEY: Mapping[str, ItemDef] = catalog.LiveMapping("items_by_key")  # normalized display name and id
+
+
+def normalize_name(name: str) -> str:
+    """Lookup key for a typed item name or id: NFKC (full/half width), case-folded, trimmed."""
+    return unicodedata.normalize("NFKC", name).casefold().strip()
+
+
+def find_item_def(key: str) -> ItemDef | None:
+    """Catalog entry by id or display name, as typed (any case or width), or None."""
+    content = catalog.current()
+    return content.items.get(key) or content.items_by_name.get(key) or content.items_by_key.get(normalize_name(key))
+
+
+def get_item_def(key: str) -> ItemDef:
+    """Look up a catalog entry by id, falling back to its display name."""
+    item_def = find_item_def(key)
+    if item_def is None:
+        raise KeyError(f"Unknown item: {key}")
+    return item_def
+
+
+class Item:
+    """An inventory entry: a shared ``ItemDef`` plus this stack's quantity."""
+    __slots__ = ("definition", "quantity")
+
+    def __init__(self, definition: ItemDef, quantity: int = 1) -> None:
+        self.definition = definition
+        self.quantity = quantity
+
+    @property
+    def item_id(self) -> str:
+        return self.definition.item_id
+
+    @property
+    def name(self) -> str:
+        return self.definition.name
+
+    @property
+    def item_type(self) -> str:
+        return self.definition.item_type
+
+    @property
+    def description(self) -> str:
+        return self.definition.description
+
+    @property
+    def value(self) -> int:
+        return self.definition.value
+
+    @property
+    def slot(self) -> str | None:
+        return self.definition.slot
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Item):
+            return NotImplemented
+        return self.definition is other.definition and self.quantity == other.quantity
+
+    def __repr__(self) -> str:
+        return f"Item({self.item_id!r}, quantity={self.quantity})"
+
+    def to_dict(self) -> dict[str, Any]:
+        data: dict[str, Any] = {"id": self.item_id}
+        if self.quantity != 1:
+            data["quantity"] = self.quantity
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> Item:
+        # Older records carried a full copy of the item keyed by "name".
+        return cls(get_item_def(data.get("id") or data["name"]), data.get("quantity", 1))
+
+
+class Inventory:
+    """Unequipped items: one ``Item`` stack per catalog id, also bucketed by item type.
+
+    Iterates like the list it replaced (stacks in the order first acquired);
+    ``append``/``remove`` keep working for whole stacks.
+    """
+    __slots__ = ("_stacks", "_by_type")
+
+    def __init__(self, items: Iterable[Item] = ()) -> None:
+        self._stacks: dict[str, Item] = {}
+        self._by_type: dict[str, dict[str, Item]] = {}
+        for item in items:
+            self.append(item)
+
+    def __len__(self) -> int:
+        return len(self._stacks)
+
+    def __iter__(self) -> Iterator[Item]:
+        return iter(self._stacks.values())
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Inventory):
+            return NotImplemented
+        return self._stacks == other._stacks
+
+    def __repr__(self) -> str:
+        return f"Inventory({list(self._stacks.values())!r})"
+
+    def get(self, key: str) -> Item | None:
+        """The stack for a catalog id or display name (any case or width)."""
+        item = self._stacks.get(key)
+        if item is None:
+            item_def = find_item_def(key)
+            item = self._stacks.get(item_def.item_id) if item_def is not None else None
+        return item
+
+    def by_type(self, item_type: str) -> Iterable[Item]:
+        return self._by_type.get(item_type, {}).values()
+
+    def add(self, item_def: ItemDef, quantity: int = 1) -> Item:
+        """Add ``quantity`` of ``item_def`` onto its stack; returns the stack."""
+        item = self._stacks.get(item_def.item_id)
+        if item is not None:
+            item.quantity += quantity
+            return item
+        item = Item(item_def, quantity)
+        self._stacks[item_def.item_id] = item
+        self._by_type.setdefault(item_def.item_type, {})[item_def.item_id] = item
+        return item
+
+    def append(self, item: Item) -> None:
+        self.add(item.definition, item.quantity)
+
+    def take(self, item_def: ItemDef, quantity: int = 1) -> Item | None:
+        """Remove ``quantity`` from the stack (dropping it when empty); None if there are not enough."""
+        item = self._stacks.get(item_def.item_id)
+        if item is None or item.quantity < quantity:
+            return None
+        item.quantity -= quantity
+        if item.quantity <= 0:
+            self._drop(item_def)
+        return Item(item_def, quantity)
+
+    def remove(self, item: Item) -> None:
+        """Remove the whole stack ``item`` belongs to."""
+        if item.item_id not in self._stacks:
+            raise ValueError(f"{item!r} is not in the inventory")
+        self._drop(item.definition)
+
+    def _drop(self, item_def: ItemDef) -> None:
+        del self._stacks[item_def.item_id]
+        bucket = self._by_type[item_def.item_type]
+        del bucket[item_def.item_id]
+        if not bucket:
+            del self._by_type[item_def.item_type]
+
+    def clear(self) -> None:
+        self._stacks.clear()
+        self._by_type.clear()
+
+
+def _empty_equipment() -> dict[str, Item | None]:
+    return {slot: None for slot in EQUIPMENT_SLOTS}
+
+
+class Player:
+    """State of a single adventurer, keyed by Discord user id."""
+    __slots__ = (
+        "user_id", "name", "hp", "max_hp", "atk", "def_val", "level", "exp", "gold",
+        "distance", "best_distance", "in_combat", "current_monster", "current_thread_id",
+        "last_event_message_id", "inventory", "equipped_items",
+    )
+
+    def __init__(
+        self,
+        user_id: int,
+        name: str = "冒険者",
+        hp: int = config.STARTING_HEALTH,
+        max_hp: int = config.STARTING_HEALTH,
+        atk: int = config.STARTING_ATTACK,
+        def_val: int = config.STARTING_DEFENSE,  # ``def`` is a keyword
+        level: int = 1,
+        exp: int = 0,
+        gold: int = config.STARTING_GOLD,
+        distance: int = 0,
+        best_distance: int = 0,  # furthest reached across runs; survives game over
+        in_combat: bool = False,
+        current_monster: Monster | None = None,
+        current_thread_id: int | None = None,
+        last_event_message_id: int | None = None,
+        inventory: Iterable[Item] = (),
+        equipped_items: dict[str, Item | None] | None = None,
+    ) -> None:
+        self.user_id = user_id
+        self.name = name
+        self.hp = hp
+        self.max_hp = max_hp
+        self.atk = atk
+        self.def_val = def_val
+        self.level = level
+        self.exp = exp
+        self.gold = gold
+        self.distance = distance
+        self.best_distance = max(best_distance, distance)
+        self.in_combat = in_combat
+        self.current_monster = current_monster
+        self.current_thread_id = current_thread_id
+        self.last_event_message_id = last_event_message_id
+        self.inventory = inventory if isinstance(inventory, Inventory) else Inventory(inventory)
+        self.equipped_items = equipped_items if equipped_items is not None else _empty_equipment()
+
+    @classmethod
+    def create(cls, user_id: int, name: str = "冒険者") -> Player:
+        """Build a fresh level 1 player with the starter kit."""
+        return cls(
+            user_id=user_id,
+            name=name,
+            inventory=[Item(item_def, quantity) for item_def, quantity in catalog.current().starter_kit],
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Player):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"Player(user_id={self.user_id}, distance={self.distance}, hp={self.hp}/{self.max_hp})"
+
+    @property
+    def total_atk(self) -> int:
+        weapon = self.equipped_items.get("weapon")
+        return self.atk + (weapon.value if weapon else 0)
+
+    @property
+    def total_def(self) -> int:
+        armor = self.equipped_items.get("armor")
+        return self.def_val + (armor.value if armor else 0)
+
+    def find_item(self, name: str) -> Item | None:
+        """Return the inventory stack with this display name or id."""
+        return self.inventory.get(name)
+
+    def add_item(self, item_def: ItemDef, quantity: int = 1) -> Item:
+        """Add to the inventory, stacking onto an existing entry."""
+        return self.inventory.add(item_def, quantity)
+
+    def equip(self, item_def: ItemDef) -> Item | None:
+        """Move one ``item_def`` from the inventory into its slot.
+
+        Returns the item it replaced, which goes back into the inventory.
+        Raises ``ValueError`` if the item is not held or has no slot.
+        """
+        if item_def.slot is None:
+            raise ValueError(f"{item_def.name} cannot be equipped")
+        item = self.inventory.take(item_def)
+        if item is None:
+            raise ValueError(f"{item_def.name} is not in the inventory")
+        old_item = self.equipped_items.get(item_def.slot)
+        if old_item is not None:
+            self.inventory.append(old_item)
+        self.equipped_items[item_def.slot] = item
+        return old_item
+
+    def refresh_definitions(self) -> None:
+        """Point items and the current monster at the installed catalog (after a content reload).
+
+        Entries the new catalog no longer has keep their old definition.
+        """
+        content = catalog.current()
+        self.inventory = Inventory(
+            Item(content.items.get(item.item_id, item.definition), item.quantity) for item in self.inventory
+        )
+        for slot, item in self.equipped_items.items():
+            if item is not None:
+                self.equipped_items[slot] = Item(content.items.get(item.item_id, item.definition), item.quantity)
+        monster = self.current_monster
+        if monster is not None:
+            monster.definition = content.monsters.get(monster.monster_id, monster.definition)
+            monster.hp = min(monster.hp, monster.max_hp)
+
+    def get_status_string(self) -> str:
+        return (
+            f"HP: {self.hp}/{self.max_hp} | ATK: {self.total_atk} | DEF: {self.total_def}\n"
+            f"レベル: {self.level} | 進行距離: {self.distance}m"
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "user_id": self.user_id,
+            "name": self.name,
+            "hp": self.hp,
+            "max_hp": self.max_hp,
+            "atk": self.atk,
+            "def": self.def_val,
+            "level": self.level,
+            "exp": self.exp,
+            "gold": self.gold,
+            "distance": self.distance,
+            "best_distance": self.best_distance,
+            "in_combat": self.in_combat,
+            "current_monster": self.current_monster.to_dict() if self.current_monster else None,
+            "current_thread_id": self.current_thread_id,
+            "last_event_message_id": self.last_event_message_id,
+            "inventory": [item.to_dict() for item in self.inventory],
+            "equipped_items": {slot: item.item_id for slot, item in self.equipped_items.items() if item},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> Player:
+        equipped = _empty_equipment()
+        for slot, item in (data.get("equipped_items") or {}).items():
+            if item:
+                equipped[slot] = Item.from_dict(item) if isinstance(item, dict) else Item(get_item_def(item))
+        monster = data.get("current_monster")
+        return cls(
+            user_id=int(data["user_id"]),
+            name=data.get("name", "冒険者"),
+            hp=data.get("hp", config.STARTING_HEALTH),
+            max_hp=data.get("max_hp", config.STARTING_HEALTH),
+            atk=data.get("atk", config.STARTING_ATTACK),
+            def_val=data.get("def", config.STARTING_DEFENSE),
+            level=data.get("level", 1),
+            exp=data.get("exp", 0),
+            gold=data.get("gold", config.STARTING_GOLD),
+            distance=data.get("distance", 0),
+            best_distance=data.get("best_distance", 0),
+            in_combat=bool(data.get("in_combat", False)),
+            current_monster=Monster.from_dict(monster) if monster else None,
+            current_thread_id=data.get("current_thread_id"),
+            last_event_message_id=data.get("last_event_message_id"),
+            inventory=[Item.from_dict(item) for item in data.get("inventory", [])],
+            equipped_items=equipped,
+        )
@@ -0,0 +1,165 @@
+"""Rolling, edit-in-place adventure log for the ``/m`` event feed.
+
+Instead of one thread message per step, each player has a single "adventure
+log" message (``Player.last_event_message_id``) showing the last
+``ADVENTURE_LOG_SIZE`` events. Steps append lines and schedule an edit;
+all steps that land within ``ADVENTURE_LOG_EDIT_INTERVAL`` of the previous
+edit are folded into the next one, so a burst of ``/m`` costs one PATCH.
+Edits go through the outbound scheduler at ``Priority.LOG``.
+Events that need input (monsters) are still posted as their own message
+by the cog, which then starts a fresh log below them.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+
+import discord
+
+import config
+from models.player import Player
+from utils import embed_templates
+from utils.data_manager import DataManager
+from utils.metrics import timed
+from utils.outbound import OutboundScheduler, Priority, channel_route
+from utils.player_locks import PlayerLocks
+
+
+class _Feed:
+    """In-memory state of one player's log message."""
+    __slots__ = ("player", "thread", "message_id", "lines", "last_edit", "task")
+
+    def __init__(self, player: Player, thread: discord.Thread, message_id: int) -> None:
+        self.player = player
+        self.thread = thread
+        self.message_id = message_id
+        self.lines: deque[str] = deque(maxlen=config.ADVENTURE_LOG_SIZE)
+        self.last_edit = time.monotonic()
+        self.task: asyncio.Task[None] | None = None
+
+
+class AdventureLog:
+    """Per-player rolling log messages with coalesced edits."""
+
+    def __init__(
+        self,
+        data_manager: DataManager,
+        player_locks: PlayerLocks,
+        outbound: OutboundScheduler,
+        edit_interval: float = config.ADVENTURE_LOG_EDIT_INTERVAL,
+        capacity: int = config.PLAYER_CACHE_SIZE,
+    ) -> None:
+        self.data_manager = data_manager
+        self.player_locks = player_locks
+        self.outbound = outbound
+        self.edit_interval = edit_interval
+        self.capacity = capacity
+        self._feeds: OrderedDict[int, _Feed] = OrderedDict()
+        self.edits = 0
+        self.coalesced = 0  # appends folded into an edit that was already scheduled
+
+    @staticmethod
+    def render(feed: _Feed) -> discord.Embed:
+        return embed_templates.adventure_log(lines="\n".join(feed.lines), distance=feed.player.distance)
+
+    async def append(self, player: Player, thread: discord.Thread, lines: list[str]) -> None:
+        """Add lines to the player's log. Call with the player's lock held.
+
+        Posts a new log message if the player has none we can edit (first
+        step, after a monster, or after a restart, since the previous lines
+        only live in memory); otherwise schedules a coalesced edit.
+        """
+        feed = self._feeds.get(player.user_id)
+        if feed is None or feed.message_id != player.last_event_message_id or feed.thread.id != thread.id:
+            # An edit still pending for the old message goes out on its own.
+            self._feeds.pop(player.user_id, None)
+            feed = _Feed(player, thread, 0)
+            feed.lines.extend(lines)
+            embed = self.render(feed)
+            message = await timed("thread", self.outbound.call(channel_route(thread.id), lambda: thread.send(embed=embed)))
+            feed.message_id = player.last_event_message_id = message.id
+            self._feeds[player.user_id] = feed
+            while len(self._feeds) > self.capacity:
+                self._feeds.popitem(last=False)
+            return
+
+        self._feeds.move_to_end(player.user_id)
+        feed.player = player
+        feed.lines.extend(lines)
+        if feed.task is not None:
+            self.coalesced += 1
+            return
+        delay = max(0.0, feed.last_edit + self.edit_interval - time.monotonic())
+        feed.task = asyncio.create_task(self._edit_later(feed, delay))
+
+    def close_log(self, player: Player) -> None:
+        """End the current log (e.g. a monster message was just posted below it).
+
+        A pending edit still goes out; the next step starts a new log message.
+        """
+        player.last_event_message_id = None
+        feed = self._feeds.get(player.user_id)
+        if feed is not None and feed.task is None:
+            del self._feeds[player.user_id]
+
+    def forget(self, user_id: int) -> None:
+        """Drop the player's log state (idle-session sweep); a pending edit still goes out."""
+        feed = self._feeds.get(user_id)
+        if feed is not None and feed.task is None:
+            del self._feeds[user_id]
+
+    async def _edit_later(self, feed: _Feed, delay: float) -> None:
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+        finally:
+            feed.task = None
+        feed.last_edit = time.monotonic()
+        try:
+            await self._edit(feed)
+            self.edits += 1
+        except discord.NotFound:
+            # Someone deleted the log: forget it so the next step posts a new one.
+            await self._reset_message_id(feed)
+        except discord.HTTPException as e:
+            print(f"Failed to edit adventure log {feed.message_id}: {e}")
+        finally:
+            if self._feeds.get(feed.player.user_id) is feed and feed.message_id != feed.player.last_event_message_id:
+                del self._feeds[feed.player.user_id]
+
+    def _edit(self, feed: _Feed) -> asyncio.Future[discord.Message]:
+        # Low priority; an edit of the same message still waiting in the queue is replaced.
+        embed = self.render(feed)
+        message = feed.thread.get_partial_message(feed.message_id)
+        return self.outbound.submit(
+            channel_route(feed.thread.id),
+            lambda: message.edit(embed=embed),
+            priority=Priority.LOG,
+            supersede=("edit", feed.message_id),
+        )
+
+    async def _reset_message_id(self, feed: _Feed) -> None:
+        async with self.player_locks.hold(feed.player.user_id):
+            player = await self.data_manager.load_player_data(feed.player.user_id)
+            if player is not None and player.last_event_message_id == feed.message_id:
+                player.last_event_message_id = None
+                await self.data_manager.save_player_data(player)
+        if self._feeds.get(feed.player.user_id) is feed:
+            del self._feeds[feed.player.user_id]
+
+    async def close(self) -> None:
+        """Send any pending edits now (cog unload / shutdown)."""
+        pending = [feed for feed in self._feeds.values() if feed.task is not None]
+        for feed in pending:
+            feed.task.cancel()
+        for feed in pending:
+            feed.task = None
+            try:
+                await self._edit(feed)
+            except discord.HTTPException:
+                pass
+        self._feeds.clear()
+
+    def stats(self) -> dict[str, float]:
+        return {"feeds": len(self._feeds), "edits": self.edits, "coalesced": self.coalesced}
@@ -0,0 +1,453 @@
+"""Vectorized Monte Carlo combat balance simulator.
+
+Resolves large batches of fights per distance band at once with NumPy,
+using the same rules as the combat commands:
+
+* ``/attack``: the player hits for ``max(1, ATK - monster DEF)``; if the
+  monster survives it counters for ``max(1, monster ATK - DEF)``.
+* ``/run``: escape succeeds with ``GameLogic.escape_chance``; on failure the
+  monster counters.
+* ``/item``: a heal restores up to its value (capped at max HP), a bomb deals
+  its value; either way the monster counters unless the bomb killed it.
+
+A ``Policy`` picks one of those commands each turn, mirroring the headless
+``Simulation`` bot. ``cross_check`` replays fights through the scalar
+``GameLogic`` and reports any disagreement; the benchmark suite runs it.
+Tune stats from the command line::
+
+    python -m utils.balance_sim --atk 14 --def 9 --fights 200000 --every 500
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+import config
+from models.dungeon import MONSTER_CATALOG, Monster, MonsterDef
+from models.player import ITEM_CATALOG, Player
+from utils.encounter_tables import EncounterTables, default_tables
+from utils.game_logic import GameLogic
+from utils.simulation import ESCAPE_THRESHOLD, HEAL_THRESHOLD
+
+MAX_TURNS = 10_000  # safety net; every turn deals at least 1 damage, so fights end long before this
+
+# Fight outcomes
+ONGOING, WIN, DEATH, ESCAPE, TIMEOUT = 0, 1, 2, 3, 4
+
+
+class Loadout(NamedTuple):
+    """What the player brings into a fight. ``heals`` lists heal amounts in the order they get used."""
+    hp: int
+    max_hp: int
+    atk: int  # total, equipment included
+    defense: int  # total, equipment included
+    heals: tuple[int, ...] = ()
+    bombs: int = 0
+    bomb_damage: int = ITEM_CATALOG["bomb"].value
+
+    @classmethod
+    def from_player(cls, player: Player) -> Loadout:
+        heals: list[int] = []
+        bombs = 0
+        bomb_damage = ITEM_CATALOG["bomb"].value
+        for item in player.inventory:
+            effect = item.definition.effect
+            if effect == "heal":
+                heals.extend([item.value] * item.quantity)
+            elif effect == "damage":
+                bombs += item.quantity
+                bomb_damage = item.value
+        return cls(player.hp, player.max_hp, player.total_atk, player.total_def, tuple(heals), bombs, bomb_damage)
+
+    def to_player(self) -> Player:
+        """A player with exactly these stats and consumables (no equipment; ATK/DEF are totals)."""
+        player = Player(0, hp=self.hp, max_hp=self.max_hp, atk=self.atk, def_val=self.defense)
+        for value in self.heals:
+            player.add_item(_heal_item(value))
+        if self.bombs:
+            player.add_item(ITEM_CATALOG["bomb"], self.bombs)
+        return player
+
+
+def _heal_item(value: int):
+    for item_def in ITEM_CATALOG.values():
+        if item_def.effect == "heal" and item_def.value == value:
+            return item_def
+    raise KeyError(f"No healing item restores {value} HP")
+
+
+def starting_loadout() -> Loadout:
+    """A fresh character with the starter kit, wooden sword equipped."""
+    player = Player.create(0)
+    sword = player.find_item("wooden_sword")
+    if sword is not None:
+        player.inventory.remove(sword)
+        player.equipped_items["weapon"] = sword
+    return Loadout.from_player(player)
+
+
+class Policy(NamedTuple):
+    """Which command to use each turn, checked in this order.
+
+    Heal (``/item``) below ``heal_below`` of max HP while potions last; ``/run``
+    below ``run_below``; throw a bomb (``/item``) when ``use_bombs`` and a
+    plain hit would not finish the monster; otherwise ``/attack``.
+    """
+    heal_below: float = HEAL_THRESHOLD
+    run_below: float = ESCAPE_THRESHOLD
+    use_bombs: bool = False
+
+
+ATTACK_ONLY = Policy(heal_below=0.0, run_below=0.0)
+
+
+class FightBatch(NamedTuple):
+    """Per-fight results of ``simulate_fights``."""
+    monster_index: np.ndarray  # index into the ``monsters`` argument
+    outcome: np.ndarray  # WIN / DEATH / ESCAPE / TIMEOUT
+    turns: np.ndarray  # commands used
+    hp_left: np.ndarray
+    heals_used: np.ndarray
+    bombs_used: np.ndarray
+
+
+class BandStats(NamedTuple):
+    band_start: int
+    fights: int
+    win_rate: float
+    death_rate: float
+    escape_rate: float
+    mean_turns: float
+    mean_hp_loss: float  # net of healing; a death loses everything
+    mean_heals_used: float
+
+
+def player_damage(atk: int | np.ndarray, monster_defense: np.ndarray) -> np.ndarray:
+    """Vectorized ``GameLogic.calculate_damage``."""
+    return np.maximum(1, atk - monster_defense)
+
+
+def monster_damage(monster_attack: np.ndarray, defense: int | np.ndarray) -> np.ndarray:
+    """Vectorized ``GameLogic.calculate_monster_attack``."""
+    return np.maximum(1, monster_attack - defense)
+
+
+def escape_chance(defense: int | np.ndarray, monster_attack: np.ndarray) -> np.ndarray:
+    """Vectorized ``GameLogic.escape_chance``."""
+    return np.clip(config.BASE_ESCAPE_CHANCE + (defense - monster_attack) * 0.02, 0.2, 0.9)
+
+
+def band_monsters(band: int, tables: EncounterTables | None = None) -> tuple[list[MonsterDef], np.ndarray]:
+    """Monsters that can appear in a band and the probability of each, given an encounter."""
+    table = (tables or default_tables()).events[band]
+    monsters: list[MonsterDef] = []
+    weights: list[float] = []
+    for (kind, payload), p in zip(table.outcomes, table.probabilities()):
+        if kind == "monster":
+            monsters.append(payload)
+            weights.append(p)
+    probabilities = np.asarray(weights)
+    return monsters, probabilities / probabilities.sum()
+
+
+def simulate_fights(
+    loadout: Loadout,
+    monsters: list[MonsterDef],
+    monster_index: np.ndarray,
+    policy: Policy,
+    rng: np.random.Generator,
+) -> FightBatch:
+    """Fight ``monster_index[i]`` once for every i, all in lock step.
+
+    Only fights still in progress are carried to the next turn, so the cost
+    per turn shrinks as fights finish.
+    """
+    n = len(monster_index)
+    outcome = np.zeros(n, dtype=np.int8)
+    turns = np.zeros(n, dtype=np.int32)
+    hp_left = np.zeros(n, dtype=np.int32)
+    heals_used_out = np.zeros(n, dtype=np.int32)
+    bombs_used_out = np.zeros(n, dtype=np.int32)
+
+    m_hp_table = np.array([m.max_hp for m in monsters], dtype=np.int32)
+    m_atk_table = np.array([m.attack for m in monsters], dtype=np.int32)
+    m_def_table = np.array([m.defense for m in monsters], dtype=np.int32)
+    # One spare entry so indexing past the last potion stays in bounds (masked out anyway).
+    heal_values = np.array(loadout.heals + (0,), dtype=np.int32)
+    n_heals = len(loadout.heals)
+
+    # State of the fights still running; ``idx`` maps them back to result slots.
+    idx = np.arange(n)
+    php = np.full(n, loadout.hp, dtype=np.int32)
+    mhp = m_hp_table[monster_index]
+    hit = player_damage(loadout.atk, m_def_table[monster_index]).astype(np.int32)
+    counter = monster_damage(m_atk_table[monster_index], loadout.defense).astype(np.int32)
+    flee = escape_chance(loadout.defense, m_atk_table[monster_index])
+    heals_used = np.zeros(n, dtype=np.int32)
+    bombs_used = np.zeros(n, dtype=np.int32)
+
+    for turn in range(1, MAX_TURNS + 1):
+        if not len(idx):
+            break
+        ratio = php / loadout.max_hp
+        heal = (ratio < policy.heal_below) & (heals_used < n_heals)
+        run = ~heal & (ratio < policy.run_below)
+        bomb = ~heal & ~run & (bombs_used < loadout.bombs) & (mhp > hit) if policy.use_bombs else np.zeros_like(heal)
+        attack = ~heal & ~run & ~bomb
+
+        php = np.where(heal, np.minimum(loadout.max_hp, php + heal_values[heals_used]), php)
+        heals_used += heal
+        escaped = run & (rng.random(len(idx)) < flee)
+        mhp = mhp - np.where(bomb, np.minimum(loadout.bomb_damage, mhp), 0) - np.where(attack, hit, 0)
+        bombs_used += bomb
+        killed = ~heal & ~run & (mhp <= 0)
+
+        countered = ~killed & ~escaped
+        php = np.where(countered, np.maximum(0, php - counter), php)
+        died = countered & (php <= 0)
+
+        result = np.where(killed, WIN, np.where(died, DEATH, np.where(escaped, ESCAPE, ONGOING)))
+        done = result != ONGOING
+        if done.any():
+            finished = idx[done]
+            outcome[finished] = result[done]
+            turns[finished] = turn
+            hp_left[finished] = php[done]
+            heals_used_out[finished] = heals_used[done]
+            bombs_used_out[finished] = bombs_used[done]
+            keep = ~done
+            idx, php, mhp, hit, counter, flee = idx[keep], php[keep], mhp[keep], hit[keep], counter[keep], flee[keep]
+            heals_used, bombs_used = heals_used[keep], bombs_used[keep]
+
+    if len(idx):
+        outcome[idx] = TIMEOUT
+        turns[idx] = MAX_TURNS
+        hp_left[idx] = php
+        heals_used_out[idx] = heals_used
+        bombs_used_out[idx] = bombs_used
+    return FightBatch(monster_index, outcome, turns, hp_left, heals_used_out, bombs_used_out)
+
+
+def summarize(band_start: int, loadout: Loadout, batch: FightBatch) -> BandStats:
+    fights = len(batch.outcome)
+    return BandStats(
+        band_start=band_start,
+        fights=fights,
+        win_rate=float(np.mean(batch.outcome == WIN)),
+        death_rate=float(np.mean(batch.outcome == DEATH)),
+        escape_rate=float(np.mean(batch.outcome == ESCAPE)),
+        mean_turns=float(batch.turns.mean()),
+        mean_hp_loss=float(loadout.hp - batch.hp_left.mean()),
+        mean_heals_used=float(batch.heals_used.mean()),
+    )
+
+
+def simulate_band(
+    band: int,
+    loadout: Loadout,
+    fights: int,
+    policy: Policy = Policy(),
+    rng: np.random.Generator | None = None,
+    tables: EncounterTables | None = None,
+) -> BandStats:
+    """Monte Carlo one band: monsters are drawn with the band's encounter weights."""
+    tables = tables or default_tables()
+    rng = rng or np.random.default_rng()
+    monsters, probabilities = band_monsters(band, tables)
+    monster_index = rng.choice(len(monsters), size=fights, p=probabilities)
+    batch = simulate_fights(loadout, monsters, monster_index, policy, rng)
+    return summarize(band * tables.band_width, loadout, batch)
+
+
+def simulate_bands(
+    loadout: Loadout,
+    fights: int,
+    policy: Policy = Policy(),
+    seed: int | None = None,
+    every: int = config.ENCOUNTER_BAND_WIDTH,
+    tables: EncounterTables | None = None,
+) -> list[BandStats]:
+    """``simulate_band`` for the band at every ``every`` metres up to the goal."""
+    tables = tables or default_tables()
+    rng = np.random.default_rng(seed)
+    step = max(1, every // tables.band_width)
+    return [simulate_band(b, loadout, fights, policy, rng, tables) for b in range(0, len(tables.events), step)]
+
+
+# --- consistency with the scalar rules ---
+
+def scalar_fight(game_logic: GameLogic, loadout: Loadout, monster_def: MonsterDef, policy: Policy) -> tuple[int, int, int]:
+    """Play one fight through ``GameLogic`` exactly as the commands do. Returns (outcome, turns, hp left)."""
+    player = loadout.to_player()
+    monster = Monster(monster_def)
+    player.in_combat = True
+    player.current_monster = monster
+    bombs_used = 0
+    for turn in range(1, MAX_TURNS + 1):
+        ratio = player.hp / player.max_hp
+        potion = next((i for i in player.inventory if i.definition.effect == "heal"), None)
+        if ratio < policy.heal_below and potion is not None:
+            game_logic.apply_item_effect(potion.name, player)
+            game_logic.consume_item(potion.name, player)
+        elif ratio < policy.run_below:
+            escaped, _ = game_logic.attempt_escape(player, monster)
+            if escaped:
+                return ESCAPE, turn, player.hp
+        elif (
+            policy.use_bombs
+            and bombs_used < loadout.bombs
+            and monster.hp > game_logic.calculate_damage(player, monster)
+        ):
+            bomb = player.find_item("bomb")
+            game_logic.apply_item_effect(bomb.name, player)
+            game_logic.consume_item(bomb.name, player)
+            bombs_used += 1
+            if monster.hp <= 0:
+                return WIN, turn, player.hp
+        else:
+            monster.hp = max(0, monster.hp - game_logic.calculate_damage(player, monster))
+            if monster.hp <= 0:
+                return WIN, turn, player.hp
+        player.hp = max(0, player.hp - game_logic.calculate_monster_attack(monster, player))
+        if player.hp <= 0:
+            return DEATH, turn, 0
+    return TIMEOUT, MAX_TURNS, player.hp
+
+
+def _check_loadouts() -> list[Loadout]:
+    start = starting_loadout()
+    return [
+        start,
+        start._replace(hp=40),
+        Loadout(100, 100, 3, 0),
+        Loadout(100, 100, 24, 19, heals=(30, 30, 80), bombs=2),
+        Loadout(250, 250, 40, 30, heals=(9999,), bombs=5),
+    ]
+
+
+def cross_check(fights: int = 20_000, seed: int = 0, sigmas: float = 5.0) -> list[str]:
+    """Compare the vectorized simulator with the scalar ``GameLogic``. Returns the mismatches found.
+
+    1. The vectorized formulas equal the scalar ones for every monster.
+    2. With no randomness (attack only) every fight matches turn for turn,
+       and so does the closed-form ``GameLogic.auto_battle``.
+    3. With the default and bomb policies, per-band outcome rates and mean
+       turns agree within ``sigmas`` standard errors.
+    """
+    problems: list[str] = []
+    game_logic = GameLogic(random.Random(seed))
+    monsters = list(MONSTER_CATALOG.values())
+    m_atk = np.array([m.attack for m in monsters])
+    m_def = np.array([m.defense for m in monsters])
+
+    for loadout in _check_loadouts():
+        player = loadout.to_player()
+        hits = player_damage(loadout.atk, m_def)
+        counters = monster_damage(m_atk, loadout.defense)
+        flees = escape_chance(loadout.defense, m_atk)
+        for i, monster_def in enumerate(monsters):
+            monster = Monster(monster_def)
+            if hits[i] != game_logic.calculate_damage(player, monster):
+                problems.append(f"calculate_damage {loadout} vs {monster_def.monster_id}")
+            if counters[i] != game_logic.calculate_monster_attack(monster, player):
+                problems.append(f"calculate_monster_attack {loadout} vs {monster_def.monster_id}")
+            if not math.isclose(flees[i], game_logic.escape_chance(player, monster)):
+                problems.append(f"escape_chance {loadout} vs {monster_def.monster_id}")
+
+        batch = simulate_fights(loadout, monsters, np.arange(len(monsters)), ATTACK_ONLY, np.random.default_rng(seed))
+        for i, monster_def in enumerate(monsters):
+            expected = scalar_fight(game_logic, loadout, monster_def, ATTACK_ONLY)
+            got = (int(batch.outcome[i]), int(batch.turns[i]), int(batch.hp_left[i]))
+            if got != expected:
+                problems.append(f"attack-only fight {loadout} vs {monster_def.monster_id}: {got} != {expected}")
+            player, monster = loadout.to_player(), Monster(monster_def)
+            closed = game_logic.auto_battle(player, monster)
+            if closed.won and (WIN, closed.turns, player.hp) != expected:
+                problems.append(f"auto_battle {loadout} vs {monster_def.monster_id}: won in {closed.turns} != {expected}")
+            if not closed.won and (expected[0] != DEATH or closed.turns != expected[1] - 1):
+                problems.append(f"auto_battle {loadout} vs {monster_def.monster_id}: stopped at {closed.turns} != {expected}")
+
+    rng = np.random.default_rng(seed)
+    tables = default_tables()
+    for policy in (Policy(), Policy(use_bombs=True)):
+        for loadout in _check_loadouts()[:2] + _check_loadouts()[3:4]:
+            for band in (0, len(tables.events) // 2, len(tables.events) - 1):
+                vector = simulate_band(band, loadout, fights, policy, rng, tables)
+                band_defs, probabilities = band_monsters(band, tables)
+                scalar = [
+                    scalar_fight(game_logic, loadout, band_defs[j], policy)
+                    for j in rng.choice(len(band_defs), size=fights // 4, p=probabilities)
+                ]
+                problems.extend(_compare(f"{policy} {loadout} band {band}", vector, scalar, sigmas))
+    return problems
+
+
+def _compare(label: str, vector: BandStats, scalar: list[tuple[int, int, int]], sigmas: float) -> list[str]:
+    problems: list[str] = []
+    n = len(scalar)
+    for name, code, rate in (
+        ("win", WIN, vector.win_rate), ("death", DEATH, vector.death_rate), ("escape", ESCAPE, vector.escape_rate),
+    ):
+        observed = sum(1 for outcome, _, _ in scalar if outcome == code) / n
+        p = (rate + observed) / 2
+        se = math.sqrt(max(p * (1 - p), 1e-9) * (1 / n + 1 / vector.fights))
+        if abs(rate - observed) > sigmas * se + 1e-9:
+            problems.append(f"{label}: {name} rate {rate:.4f} vs scalar {observed:.4f}")
+    turns = [t for _, t, _ in scalar]
+    mean = sum(turns) / n
+    sd = math.sqrt(sum((t - mean) ** 2 for t in turns) / max(1, n - 1))
+    se = sd * math.sqrt(1 / n + 1 / vector.fights)
+    if abs(vector.mean_turns - mean) > sigmas * se + 1e-9:
+        problems.append(f"{label}: mean turns {vector.mean_turns:.3f} vs scalar {mean:.3f}")
+    return problems
+
+
+def format_table(stats: list[BandStats]) -> str:
+    lines = [f"{'band':>6}{'win':>8}{'death':>8}{'escape':>8}{'turns':>8}{'hp loss':>9}{'heals':>7}"]
+    for s in stats:
+        lines.append(
+            f"{s.band_start:>5}m{s.win_rate:>8.1%}{s.death_rate:>8.1%}{s.escape_rate:>8.1%}"
+            f"{s.mean_turns:>8.2f}{s.mean_hp_loss:>9.1f}{s.mean_heals_used:>7.2f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> None:
+    start = starting_loadout()
+    parser = argparse.ArgumentParser(description="Vectorized combat balance simulation per distance band.")
+    parser.add_argument("--hp", type=int, default=start.max_hp)
+    parser.add_argument("--atk", type=int, default=start.atk, help="total ATK including weapon")
+    parser.add_argument("--def", dest="defense", type=int, default=start.defense, help="total DEF including armor")
+    parser.add_argument("--potions", type=int, default=len(start.heals), help="30 HP potions carried")
+    parser.add_argument("--bombs", type=int, default=0)
+    parser.add_argument("--heal-below", type=float, default=HEAL_THRESHOLD)
+    parser.add_argument("--run-below", type=float, default=ESCAPE_THRESHOLD)
+    parser.add_argument("--fights", type=int, default=100_000, help="fights per band")
+    parser.add_argument("--every", type=int, default=500, help="report a band every N metres")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--cross-check", action="store_true", help="verify against the scalar GameLogic and exit")
+    args = parser.parse_args(argv)
+
+    if args.cross_check:
+        problems = cross_check(seed=args.seed or 0)
+        print("\n".join(problems) if problems else "vectorized simulator matches GameLogic")
+        raise SystemExit(1 if problems else 0)
+
+    potion = ITEM_CATALOG["potion"].value
+    loadout = Loadout(args.hp, args.hp, args.atk, args.defense, (potion,) * args.potions, args.bombs)
+    policy = Policy(args.heal_below, args.run_below, args.bombs > 0)
+    started = time.perf_counter()
+    stats = simulate_bands(loadout, args.fights, policy, args.seed, args.every)
+    elapsed = time.perf_counter() - started
+    print(f"{loadout}\n{policy}")
+    print(format_table(stats))
+    print(f"{len(stats) * args.fights:,} fights in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Skip the global slash-command sync when nothing changed.
+
+``CommandTree.sync`` replaces every global command in one bulk request and
+is heavily rate limited, yet the command set only changes with a deploy.
+``sync_if_changed`` hashes the payload that ``sync`` would upload (names,
+descriptions, options, permissions of every global command) together with
+the application id, and only syncs when that hash differs from the one
+stored after the last successful sync in ``COMMAND_SYNC_HASH_FILE``.
+Delete the file to force a sync.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+
+from discord.ext import commands
+
+import config
+
+
+def command_tree_hash(bot: commands.Bot) -> str:
+    payload = sorted(
+        (command.to_dict(bot.tree) for command in bot.tree.get_commands()),
+        key=lambda command: (command.get("type", 1), command["name"]),
+    )
+    blob = json.dumps({"application_id": bot.application_id, "commands": payload}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _stored_hash(path: str) -> str | None:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _store_hash(path: str, digest: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(digest + "\n")
+    os.replace(tmp_path, path)
+
+
+async def sync_if_changed(bot: commands.Bot, path: str = config.COMMAND_SYNC_HASH_FILE) -> bool:
+    """Sync the global command tree if its hash changed; return whether it synced."""
+    digest = command_tree_hash(bot)
+    if digest == _stored_hash(path):
+        return False
+    await bot.tree.sync()
+    _store_hash(path, digest)
+    return True
@@ -0,0 +1,256 @@
+"""Load, validate and compile the game content from ``CONTENT_DIR``.
+
+    content/items.json     items and the starter kit
+    content/monsters.json  monster templates
+    content/events.json    loot and story tables, empty-road messages, event chances
+
+``load_catalog`` reads the three files, checks every record (types,
+ranges, unique ids and names, references between files, and that every
+distance band has something to roll) and compiles them into a
+``models.catalog.Catalog``: read-only tables by id, by display name, by
+type, plus the per-band ``EncounterTables``. Any problem raises
+``ContentError`` listing all of them, and nothing is installed.
+
+``load_catalog`` only builds the catalog, so it can run in a worker
+thread. Installing it (``models.catalog.install``) and pointing the cached
+players at the new definitions are left to the caller
+(``cogs/content_admin.py``), which does both on the event loop with no
+await in between, so no command sees new tables next to old players. In
+cluster mode each worker process holds its own catalog and reloads
+separately.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from types import MappingProxyType
+from typing import Any, Callable
+
+import config
+from models.catalog import Catalog
+from models.dungeon import MonsterDef
+from models.player import EQUIPMENT_SLOTS, ItemDef, normalize_name
+from utils.encounter_tables import EncounterTables, monster_chance
+
+CONTENT_FILES: tuple[str, ...] = ("items.json", "monsters.json", "events.json")
+ITEM_TYPES: tuple[str, ...] = ("consumable", *EQUIPMENT_SLOTS)
+ITEM_EFFECTS: tuple[str, ...] = ("heal", "damage")
+
+
+class ContentError(ValueError):
+    """The content files are missing, malformed or inconsistent."""
+
+    def __init__(self, problems: list[str]) -> None:
+        super().__init__("Invalid content:\n" + "\n".join(f"- {problem}" for problem in problems))
+        self.problems = problems
+
+
+class _Checker:
+    """Collects every problem instead of stopping at the first."""
+
+    def __init__(self) -> None:
+        self.problems: list[str] = []
+
+    def field(self, where: str, record: Any, name: str, kind: type, *, default: Any = ..., check: Callable[[Any], bool] | None = None, rule: str = "") -> Any:
+        if not isinstance(record, dict):
+            self.problems.append(f"{where}: expected an object")
+            return None
+        if name not in record:
+            if default is ...:
+                self.problems.append(f"{where}: missing {name!r}")
+            return None if default is ... else default
+        value = record[name]
+        # bool is an int subclass; never accept it for numbers
+        if not isinstance(value, kind) or (isinstance(value, bool) and kind is not bool):
+            self.problems.append(f"{where}: {name!r} must be {getattr(kind, '__name__', 'a number')}")
+            return None
+        if check is not None and not check(value):
+            self.problems.append(f"{where}: {name!r} {rule} (got {value!r})")
+            return None
+        return value
+
+    def unique(self, where: str, kind: str, value: Any, seen: set[Any]) -> None:
+        if value in seen:
+            self.problems.append(f"{where}: duplicate {kind} {value!r}")
+        seen.add(value)
+
+
+def _non_negative(value: int) -> bool:
+    return value >= 0
+
+
+def _positive(value: int) -> bool:
+    return value > 0
+
+
+def _read(directory: str, checker: _Checker, digest: Any) -> dict[str, Any]:
+    documents: dict[str, Any] = {}
+    for filename in CONTENT_FILES:
+        path = os.path.join(directory, filename)
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+            documents[filename] = json.loads(raw)
+        except (OSError, ValueError) as e:
+            checker.problems.append(f"{filename}: {e}")
+            documents[filename] = {}
+            continue
+        digest.update(filename.encode() + b"\0" + raw)
+        if not isinstance(documents[filename], dict):
+            checker.problems.append(f"{filename}: top level must be an object")
+            documents[filename] = {}
+    return documents
+
+
+def _items(document: dict[str, Any], checker: _Checker) -> dict[str, ItemDef]:
+    items: dict[str, ItemDef] = {}
+    names: set[str] = set()
+    keys: set[str] = set()
+    for i, record in enumerate(document.get("items") or []):
+        where = f"items.json: items[{i}]"
+        item_id = checker.field(where, record, "id", str, check=bool, rule="must not be empty")
+        name = checker.field(where, record, "name", str, check=bool, rule="must not be empty")
+        item_type = checker.field(where, record, "type", str, check=ITEM_TYPES.__contains__, rule=f"must be one of {ITEM_TYPES}")
+        description = checker.field(where, record, "description", str, default="")
+        value = checker.field(where, record, "value", int, check=_non_negative, rule="must be >= 0")
+        effect = checker.field(where, record, "effect", str, default=None, check=ITEM_EFFECTS.__contains__, rule=f"must be one of {ITEM_EFFECTS}")
+        slot = checker.field(where, record, "slot", str, default=item_type if item_type in EQUIPMENT_SLOTS else None)
+        if None in (item_id, name, item_type, value):
+            continue
+        if item_type == "consumable" and (effect is None or slot is not None):
+            checker.problems.append(f"{where}: a consumable needs an 'effect' and no 'slot'")
+        if item_type in EQUIPMENT_SLOTS and (slot != item_type or effect is not None):
+            checker.problems.append(f"{where}: a {item_type} goes in the {item_type!r} slot and has no 'effect'")
+        checker.unique(where, "item id", item_id, set(items))
+        checker.unique(where, "item name", name, names)
+        # Typed lookups (``/equip``, autocomplete) must resolve to exactly one item.
+        for key in {normalize_name(item_id), normalize_name(name)}:
+            checker.unique(where, "normalized item name or id", key, keys)
+        items[item_id] = ItemDef(item_id, name, item_type, description, value, slot, effect)
+    if not items:
+        checker.problems.append("items.json: 'items' must list at least one item")
+    return items
+
+
+def _starter_kit(document: dict[str, Any], items: dict[str, ItemDef], checker: _Checker) -> tuple[tuple[ItemDef, int], ...]:
+    kit: list[tuple[ItemDef, int]] = []
+    for i, record in enumerate(document.get("starter_kit") or []):
+        where = f"items.json: starter_kit[{i}]"
+        item_id = checker.field(where, record, "id", str)
+        quantity = checker.field(where, record, "quantity", int, default=1, check=_positive, rule="must be > 0")
+        if item_id is not None and item_id not in items:
+            checker.problems.append(f"{where}: unknown item {item_id!r}")
+        elif item_id is not None and quantity is not None:
+            kit.append((items[item_id], quantity))
+    return tuple(kit)
+
+
+def _monsters(document: dict[str, Any], checker: _Checker) -> dict[str, MonsterDef]:
+    monsters: dict[str, MonsterDef] = {}
+    names: set[str] = set()
+    for i, record in enumerate(document.get("monsters") or []):
+        where = f"monsters.json: monsters[{i}]"
+        monster_id = checker.field(where, record, "id", str, check=bool, rule="must not be empty")
+        name = checker.field(where, record, "name", str, check=bool, rule="must not be empty")
+        max_hp = checker.field(where, record, "max_hp", int, check=_positive, rule="must be > 0")
+        stats = [
+            checker.field(where, record, stat, int, check=_non_negative, rule="must be >= 0")
+            for stat in ("attack", "defense", "exp", "gold", "min_distance")
+        ]
+        weight = checker.field(where, record, "weight", int, default=10, check=_positive, rule="must be > 0")
+        if None in (monster_id, name, max_hp, weight, *stats):
+            continue
+        checker.unique(where, "monster id", monster_id, set(monsters))
+        checker.unique(where, "monster name", name, names)
+        monsters[monster_id] = MonsterDef(monster_id, name, max_hp, *stats, weight)
+    if not any(monster.min_distance == 0 for monster in monsters.values()):
+        checker.problems.append("monsters.json: at least one monster must appear from 0m")
+    return monsters
+
+
+def _events(
+    document: dict[str, Any], items: dict[str, ItemDef], checker: _Checker
+) -> tuple[tuple[tuple[int, ItemDef, int], ...], tuple[tuple[int, str], ...], tuple[str, ...], float, float]:
+    probability = (float, int)
+    item_chance = checker.field("events.json", document, "item_event_chance", probability, check=lambda p: 0 <= p <= 1, rule="must be between 0 and 1")
+    story_chance = checker.field("events.json", document, "story_event_chance", probability, check=lambda p: 0 <= p <= 1, rule="must be between 0 and 1")
+
+    loot: list[tuple[int, ItemDef, int]] = []
+    for i, record in enumerate(document.get("loot") or []):
+        where = f"events.json: loot[{i}]"
+        min_distance = checker.field(where, record, "min_distance", int, check=_non_negative, rule="must be >= 0")
+        item_id = checker.field(where, record, "item", str)
+        weight = checker.field(where, record, "weight", int, check=_positive, rule="must be > 0")
+        if item_id is not None and item_id not in items:
+            checker.problems.append(f"{where}: unknown item {item_id!r}")
+        elif None not in (min_distance, item_id, weight):
+            loot.append((min_distance, items[item_id], weight))
+
+    stories: list[tuple[int, str]] = []
+    for i, record in enumerate(document.get("stories") or []):
+        where = f"events.json: stories[{i}]"
+        min_distance = checker.field(where, record, "min_distance", int, check=_non_negative, rule="must be >= 0")
+        message = checker.field(where, record, "message", str, check=bool, rule="must not be empty")
+        if None not in (min_distance, message):
+            stories.append((min_distance, message))
+
+    empty_messages = document.get("empty_messages") or []
+    if not empty_messages or not all(isinstance(m, str) and m for m in empty_messages):
+        checker.problems.append("events.json: 'empty_messages' must be a non-empty list of non-empty strings")
+        empty_messages = []
+
+    # Every band rolls from all four groups, so each needs an entry from 0m on.
+    if not any(min_distance == 0 for min_distance, _, _ in loot):
+        checker.problems.append("events.json: at least one loot entry must be available from 0m")
+    if not any(min_distance == 0 for min_distance, _ in stories):
+        checker.problems.append("events.json: at least one story must be available from 0m")
+    if item_chance is not None and story_chance is not None:
+        highest = max(monster_chance(0), monster_chance(config.GOAL_DISTANCE))
+        if highest + item_chance + story_chance >= 1:
+            checker.problems.append(
+                f"events.json: item + story chance ({item_chance + story_chance}) leaves no room for empty steps"
+                f" next to a {highest} encounter chance"
+            )
+    return tuple(loot), tuple(stories), tuple(empty_messages), float(item_chance or 0), float(story_chance or 0)
+
+
+def load_catalog(directory: str = config.CONTENT_DIR) -> Catalog:
+    """Read, validate and compile the content in ``directory``; raises ``ContentError``."""
+    start = time.perf_counter()
+    checker = _Checker()
+    digest = hashlib.sha256()
+    documents = _read(directory, checker, digest)
+    items = _items(documents["items.json"], checker)
+    starter_kit = _starter_kit(documents["items.json"], items, checker)
+    monsters = _monsters(documents["monsters.json"], checker)
+    loot, stories, empty_messages, item_chance, story_chance = _events(documents["events.json"], items, checker)
+    if checker.problems:
+        raise ContentError(checker.problems)
+
+    items_by_key: dict[str, ItemDef] = {}
+    items_by_type: dict[str, list[ItemDef]] = {item_type: [] for item_type in ITEM_TYPES}
+    for item_def in items.values():
+        items_by_key[normalize_name(item_def.item_id)] = item_def
+        items_by_key[normalize_name(item_def.name)] = item_def
+        items_by_type[item_def.item_type].append(item_def)
+    tables = EncounterTables(list(monsters.values()), loot, stories, empty_messages, item_chance, story_chance)
+    return Catalog(
+        version=digest.hexdigest()[:12],
+        source=directory,
+        load_seconds=time.perf_counter() - start,
+        items=MappingProxyType(items),
+        items_by_name=MappingProxyType({d.name: d for d in items.values()}),
+        items_by_key=MappingProxyType(items_by_key),
+        items_by_type=MappingProxyType({t: tuple(defs) for t, defs in items_by_type.items()}),
+        starter_kit=starter_kit,
+        monsters=MappingProxyType(monsters),
+        monsters_by_name=MappingProxyType({d.name: d for d in monsters.values()}),
+        loot=loot,
+        stories=stories,
+        empty_messages=empty_messages,
+        item_event_chance=item_chance,
+        story_event_chance=story_chance,
+        tables=tables,
+    )
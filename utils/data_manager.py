@@ -0,0 +1,765 @@
+"""SQLite-backed persistence for player state.
+
+Each player is one row in ``players`` plus one row per inventory entry in
+``inventory``; saving a player only rewrites that player's rows. Saves are
+group-committed: a background writer merges them per user and commits the
+merged set in one transaction.
+
+Several processes may open the same database (``cluster.py``). SQLite's
+locking keeps their writes intact, and every save stamps the row with a
+random ``revision``: with ``shared=True`` a cached player is only reused
+while the row still carries the revision this process last read or wrote,
+so a player who moved on in another process is reloaded, not overwritten
+with stale state. Writes are conditional too: inside the commit's write
+transaction each user's stored revision is compared with the one the
+queued save was based on, and on a mismatch (another process saved the
+player since) that save is rejected rather than overwriting the other
+process's update. The player is dropped from the cache, so the next
+command reloads the other process's state; the rejected command's change
+is lost and counted in ``write_conflicts``. Per-player locks are per
+process, so this is the only guard across processes.
+
+With ``mode="journal"`` (``PERSISTENCE_MODE``) a save appends a delta of
+the changed fields to ``journal`` instead (see ``utils/journal.py``), and
+the ``players``/``inventory`` rows are only rewritten as a snapshot every
+``JOURNAL_SNAPSHOT_INTERVAL`` entries; ``players.journal_id`` is the last
+entry a snapshot includes. Each entry links to the same player's previous
+one (``prev``) and ``players.journal_head`` holds the newest, so loads walk
+the chain back from the head and ``journal`` needs no per-user index: an
+append dirties the table's last page and the player's row, which
+neighbouring players' saves in the same group commit share. The revision
+is then the newest journal id (0 for a player with no entries yet).
+
+``standings`` returns the distance rankings (``utils/leaderboard.py``):
+built from ``players`` once, then kept current by every save. In shared
+mode it is rebuilt in the background every ``LEADERBOARD_REFRESH_INTERVAL``
+seconds to pick up the other processes' players.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Sequence, TypeVar
+
+import config
+from models.dungeon import Monster
+from models.player import Item, Player, find_item_def
+from utils import journal
+from utils.journal import JournalEntry
+from utils.leaderboard import Leaderboard
+from utils.metrics import current_command, timed_phase
+from utils.player_cache import PlayerCache
+
+T = TypeVar("T")
+
+Rows = tuple[tuple[Any, ...], list[tuple[Any, ...]]]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    user_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    thread_id INTEGER,
+    last_event_message_id INTEGER,
+    current_hp INTEGER NOT NULL,
+    max_hp INTEGER NOT NULL,
+    atk INTEGER NOT NULL,
+    def INTEGER NOT NULL,
+    level INTEGER NOT NULL,
+    exp INTEGER NOT NULL,
+    gold INTEGER NOT NULL,
+    distance INTEGER NOT NULL,
+    in_battle INTEGER NOT NULL,
+    current_monster TEXT,
+    revision INTEGER NOT NULL DEFAULT 0,
+    journal_id INTEGER NOT NULL DEFAULT 0,
+    best_distance INTEGER NOT NULL DEFAULT 0,
+    journal_head INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS inventory (
+    user_id INTEGER NOT NULL,
+    item_name TEXT NOT NULL,
+    item_type TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    is_equipped INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_inventory_user_id ON inventory (user_id);
+CREATE TABLE IF NOT EXISTS journal (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    at INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    command TEXT,
+    delta TEXT NOT NULL,
+    prev INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# Columns added after the first release: name -> (definition, backfill statement)
+_ADDED_COLUMNS = {
+    "revision": ("INTEGER NOT NULL DEFAULT 0", None),
+    "journal_id": ("INTEGER NOT NULL DEFAULT 0", None),
+    "best_distance": ("INTEGER NOT NULL DEFAULT 0", "UPDATE players SET best_distance = distance"),
+    "journal_head": (
+        "INTEGER NOT NULL DEFAULT 0",
+        "UPDATE players SET journal_head = COALESCE((SELECT MAX(id) FROM journal WHERE journal.user_id = players.user_id), 0)",
+    ),
+}
+# Journals written before entries were chained: link them up while the old per-user index still exists.
+_CHAIN_JOURNAL = (
+    "ALTER TABLE journal ADD COLUMN prev INTEGER NOT NULL DEFAULT 0",
+    "UPDATE journal SET prev = COALESCE("
+    "(SELECT MAX(older.id) FROM journal AS older WHERE older.user_id = journal.user_id AND older.id < journal.id), 0)",
+    "DROP INDEX IF EXISTS idx_journal_user_id",
+)
+
+# Statements are module constants so sqlite3's per-connection statement cache
+# hands back the same prepared statement on every call.
+_SELECT_PLAYER = (
+    "SELECT user_id, name, thread_id, last_event_message_id, current_hp, max_hp, atk, def,"
+    " level, exp, gold, distance, in_battle, current_monster, best_distance, revision, journal_id, journal_head"
+    " FROM players WHERE user_id = ?"
+)
+_SELECT_REVISION = "SELECT revision FROM players WHERE user_id = ?"
+_SELECT_JOURNAL_HEAD = "SELECT journal_head FROM players WHERE user_id = ?"
+_SELECT_INVENTORY = (
+    "SELECT item_name, quantity, is_equipped FROM inventory WHERE user_id = ?"
+)
+_UPSERT_PLAYER = (
+    "INSERT INTO players (user_id, name, thread_id, last_event_message_id, current_hp, max_hp,"
+    " atk, def, level, exp, gold, distance, in_battle, current_monster, best_distance, revision)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    " ON CONFLICT(user_id) DO UPDATE SET name = excluded.name, thread_id = excluded.thread_id,"
+    " last_event_message_id = excluded.last_event_message_id, current_hp = excluded.current_hp,"
+    " max_hp = excluded.max_hp, atk = excluded.atk, def = excluded.def, level = excluded.level,"
+    " exp = excluded.exp, gold = excluded.gold, distance = excluded.distance,"
+    " in_battle = excluded.in_battle, current_monster = excluded.current_monster,"
+    " best_distance = excluded.best_distance, revision = excluded.revision"
+)
+_DELETE_INVENTORY = "DELETE FROM inventory WHERE user_id = ?"
+_INSERT_INVENTORY = (
+    "INSERT INTO inventory (user_id, item_name, item_type, quantity, is_equipped) VALUES (?, ?, ?, ?, ?)"
+)
+_DELETE_PLAYER = "DELETE FROM players WHERE user_id = ?"
+_INSERT_JOURNAL = "INSERT INTO journal (user_id, at, kind, command, delta, prev) VALUES (?, ?, ?, ?, ?, ?)"
+_SET_JOURNAL_HEAD = "UPDATE players SET journal_head = ? WHERE user_id = ?"
+# A player's entries are found by following prev back from players.journal_head.
+_SELECT_JOURNAL_SINCE = (
+    "WITH RECURSIVE chain(id, prev, delta) AS ("
+    " SELECT id, prev, delta FROM journal WHERE id = ? AND id > ?"
+    " UNION ALL SELECT journal.id, journal.prev, journal.delta FROM journal JOIN chain ON journal.id = chain.prev"
+    " WHERE journal.id > ?"
+    ") SELECT delta FROM chain ORDER BY id"
+)
+_SELECT_JOURNAL_RECENT = (
+    "WITH RECURSIVE chain(id, prev, at, kind, command, delta) AS ("
+    " SELECT id, prev, at, kind, command, delta FROM journal"
+    " WHERE id = (SELECT journal_head FROM players WHERE user_id = ?)"
+    " UNION ALL SELECT journal.id, journal.prev, journal.at, journal.kind, journal.command, journal.delta"
+    " FROM journal JOIN chain ON journal.id = chain.prev LIMIT ?"
+    ") SELECT id, at, kind, command, delta FROM chain ORDER BY id DESC"
+)
+_SET_SNAPSHOT_JOURNAL_ID = "UPDATE players SET journal_id = journal_head WHERE user_id = ?"
+_DELETE_JOURNAL = (
+    "DELETE FROM journal WHERE id IN ("
+    "WITH RECURSIVE chain(id) AS ("
+    " SELECT journal_head FROM players WHERE user_id = ?"
+    " UNION ALL SELECT journal.prev FROM journal JOIN chain ON journal.id = chain.id WHERE journal.prev > 0"
+    ") SELECT id FROM chain)"
+)
+_SELECT_STANDINGS = "SELECT user_id, name, distance, best_distance FROM players"
+# A revision no stored row carries: a save based on it always conflicts (see _commit_pending).
+_CONFLICTED = -1
+_SELECT_STORED = "SELECT user_id FROM players WHERE user_id IN ({})"
+
+
+class _Persisted:
+    """What the database holds (or will, once queued writes commit) for one cached player."""
+    __slots__ = ("row", "inventory", "revision", "entries")
+
+    def __init__(self, row: tuple[Any, ...], inventory: list[journal.InventoryRow], revision: int, entries: int) -> None:
+        self.row = row
+        self.inventory = inventory
+        self.revision = revision
+        self.entries = entries  # journal entries since the last snapshot
+
+
+class _Pending:
+    """One user's queued writes: the latest rows, plus journal entries in journal mode."""
+    __slots__ = ("player", "rows", "entries", "snapshot", "base")
+
+    def __init__(self, player: Player, rows: Rows, snapshot: bool, base: int | None) -> None:
+        self.player = player
+        self.rows = rows
+        self.entries: list[tuple[Any, ...]] = []
+        self.snapshot = snapshot  # rewrite the players/inventory rows in this commit
+        # Shared mode: the revision the stored player must still carry; None writes unconditionally (new player).
+        self.base = base
+
+
+class DataManager:
+    """Async facade over a single WAL-mode SQLite connection.
+
+    The connection lives on a dedicated one-thread executor, so every blocking
+    call runs off the event loop and calls are naturally serialized. Loaded
+    players are kept in a shared ``PlayerCache``; the bot owns one instance
+    (``bot.data_manager``) that every cog uses.
+
+    ``save_player_data`` only queues the player's rows. A writer task commits
+    everything queued every ``WRITE_BATCH_INTERVAL`` seconds, or as soon as
+    ``WRITE_BATCH_MAX_RECORDS`` users are dirty; the last save per user wins
+    (in journal mode every save's entry is kept).
+    Pass ``durable=True`` (or call ``flush``) to wait for the commit.
+
+    With ``shared=True`` (other processes write the same database) a cache
+    hit costs one indexed revision lookup to confirm the entry is current.
+    """
+
+    def __init__(
+        self,
+        db_path: str = config.DATABASE_FILE,
+        cache_size: int = config.PLAYER_CACHE_SIZE,
+        *,
+        shared: bool = False,
+        mode: str = config.PERSISTENCE_MODE,
+        snapshot_interval: int = config.JOURNAL_SNAPSHOT_INTERVAL,
+    ) -> None:
+        if mode not in ("snapshot", "journal"):
+            raise ValueError(f"Unknown persistence mode: {mode!r}")
+        self.db_path = db_path
+        self.shared = shared
+        self.journaled = mode == "journal"
+        self.snapshot_interval = snapshot_interval
+        self.cache = PlayerCache(cache_size)
+        # Stored state per cached user as last read or written by this process
+        self._persisted: dict[int, _Persisted] = {}
+        self.stale_reloads = 0  # shared mode: cache entries replaced after another process saved
+        self.write_conflicts = 0  # shared mode: saves rejected because another process saved first
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._conn: sqlite3.Connection | None = None
+        self._pending_loads: dict[int, asyncio.Task[Player | None]] = {}
+        # Group-commit state (event loop thread only)
+        self._dirty: dict[int, _Pending] = {}
+        self._inflight: dict[int, _Pending] = {}
+        self._durability_waiters: list[asyncio.Future[None]] = []
+        self._wake = asyncio.Event()
+        self._commit_now = asyncio.Event()
+        self._writer: asyncio.Task[None] | None = None
+        self.commits = 0
+        self.records_committed = 0
+        self.snapshots = 0
+        self.journal_entries = 0
+        self.journal_bytes = 0  # encoded deltas appended
+        # Distance rankings; None until first built from the database
+        self.leaderboard: Leaderboard | None = None
+        self._leaderboard_built = 0.0
+        self._leaderboard_task: asyncio.Task[None] | None = None
+
+    # --- connection handling (executor thread only) ---
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(
+                self.db_path,
+                isolation_level=None,  # transactions are opened explicitly
+                cached_statements=config.SQLITE_STATEMENT_CACHE_SIZE,
+            )
+            conn.execute(f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS}")  # wait out other processes' commits
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(players)")}
+            for column, (definition, backfill) in _ADDED_COLUMNS.items():
+                if column not in columns:
+                    # Database created before the column existed
+                    conn.execute(f"ALTER TABLE players ADD COLUMN {column} {definition}")
+                    if backfill:
+                        conn.execute(backfill)
+            if "prev" not in {row[1] for row in conn.execute("PRAGMA table_info(journal)")}:
+                for statement in _CHAIN_JOURNAL:
+                    conn.execute(statement)
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def close(self) -> None:
+        """Commit queued saves, then close the connection and stop the executor thread."""
+        await self.flush()
+        if self._writer is not None:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+        await self._run(self._close)
+        self._executor.shutdown(wait=True)
+
+    # --- group commit ---
+
+    def _ensure_writer(self) -> None:
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._writer_loop(), name="data-manager-writer")
+
+    async def _writer_loop(self) -> None:
+        while True:
+            await self._wake.wait()
+            if not self._commit_now.is_set():
+                try:
+                    await asyncio.wait_for(self._commit_now.wait(), config.WRITE_BATCH_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+            self._wake.clear()
+            self._commit_now.clear()
+            await self._commit_pending()
+
+    async def _commit_pending(self) -> None:
+        batch, self._dirty = self._dirty, {}
+        waiters, self._durability_waiters = self._durability_waiters, []
+        if batch:
+            self._inflight = batch  # delete_player_data may drop users from it while we commit
+            try:
+                writes = [
+                    (user_id, pending.rows if pending.snapshot else None, pending.entries, pending.base if self.shared else None)
+                    for user_id, pending in batch.items()
+                ]
+                last_ids, conflicts = await self._run(self._save_many, writes)
+            except Exception as e:
+                # Keep the data queued (newer rows win, entries stay in order) and tell durable callers.
+                for user_id, pending in batch.items():
+                    newer = self._dirty.get(user_id)
+                    if newer is None:
+                        self._dirty[user_id] = pending
+                    else:
+                        newer.entries[:0] = pending.entries
+                        newer.snapshot = newer.snapshot or pending.snapshot
+                        newer.base = pending.base
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+                print(f"Failed to commit {len(batch)} player(s), retrying: {e}")
+                await asyncio.sleep(config.WRITE_RETRY_DELAY)
+                self._wake.set()
+                return
+            finally:
+                self._inflight = {}
+            self.commits += 1
+            self.records_committed += len(batch) - len(conflicts)
+            self.snapshots += sum(pending.snapshot for user_id, pending in batch.items() if user_id not in conflicts)
+            for user_id, last_id in last_ids.items():
+                persisted = self._persisted.get(user_id)
+                if persisted is not None:
+                    persisted.revision = last_id
+                newer = self._dirty.get(user_id)
+                if newer is not None and self.journaled:
+                    newer.base = last_id  # queued while we committed, on top of these entries
+            for user_id in conflicts:
+                # Another process saved this player after our save's base revision. Its state wins:
+                # drop ours (and saves queued on top of it) so the next command reloads.
+                self.write_conflicts += 1
+                self._dirty.pop(user_id, None)
+                self.cache.pop(user_id)
+                persisted = self._persisted.get(user_id)
+                if persisted is not None:
+                    persisted.revision = _CONFLICTED  # a command still holding the player saves in vain
+                print(f"Rejected a save of player {user_id}: another process saved it first")
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def flush(self) -> None:
+        """Wait until every save queued so far is committed."""
+        if self._writer is None:
+            return
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._durability_waiters.append(waiter)
+        self._commit_now.set()
+        self._wake.set()
+        await waiter
+
+    # --- row mapping ---
+
+    @staticmethod
+    def _player_row(player: Player, revision: int) -> tuple[Any, ...]:
+        monster = json.dumps(player.current_monster.to_dict()) if player.current_monster else None
+        return (
+            player.user_id, player.name, player.current_thread_id, player.last_event_message_id,
+            player.hp, player.max_hp, player.atk, player.def_val, player.level, player.exp,
+            player.gold, player.distance, int(player.in_combat), monster, player.best_distance, revision,
+        )
+
+    @staticmethod
+    def _inventory_rows(player: Player) -> list[tuple[Any, ...]]:
+        # item_name holds the catalog id; everything else comes from the catalog.
+        rows = [(player.user_id, item.item_id, item.item_type, item.quantity, 0) for item in player.inventory]
+        rows.extend(
+            (player.user_id, item.item_id, item.item_type, item.quantity, 1)
+            for item in player.equipped_items.values()
+            if item is not None
+        )
+        return rows
+
+    @staticmethod
+    def _player_from_rows(row: Sequence[Any], inventory_rows: list[tuple[Any, ...]]) -> Player:
+        (user_id, name, thread_id, last_message_id, hp, max_hp, atk, def_val,
+         level, exp, gold, distance, in_battle, monster, best_distance) = row[:15]
+        # A content reload may have removed an id this row still holds. Only cached players
+        # keep the old definition, so decoding drops what the catalog no longer knows
+        # instead of making the player unloadable.
+        current_monster = None
+        if monster:
+            try:
+                current_monster = Monster.from_dict(json.loads(monster))
+            except KeyError as e:
+                print(f"Dropped combat for player {user_id}: {e}")
+                in_battle = False
+        player = Player(
+            user_id=user_id, name=name, hp=hp, max_hp=max_hp, atk=atk, def_val=def_val,
+            level=level, exp=exp, gold=gold, distance=distance, best_distance=best_distance,
+            in_combat=bool(in_battle), current_monster=current_monster,
+            current_thread_id=thread_id, last_event_message_id=last_message_id,
+        )
+        for item_id, quantity, is_equipped in inventory_rows:
+            item_def = find_item_def(item_id)
+            if item_def is None:
+                print(f"Dropped unknown item {item_id!r} x{quantity} from player {user_id}")
+                continue
+            item = Item(item_def, quantity)
+            if is_equipped and item.slot:
+                player.equipped_items[item.slot] = item
+            else:
+                player.inventory.append(item)
+        return player
+
+    # --- blocking operations ---
+
+    def _load(self, user_id: int) -> tuple[Player, int, int] | None:
+        """(player, revision, journal entries replayed) or None."""
+        conn = self._connection()
+        row = conn.execute(_SELECT_PLAYER, (user_id,)).fetchone()
+        if row is None:
+            return None
+        inventory = conn.execute(_SELECT_INVENTORY, (user_id,)).fetchall()
+        if not self.journaled:
+            return self._player_from_rows(row, inventory), row[15], 0
+        # Snapshot, then every entry written after it
+        snapshot_id, head = row[16], row[17]
+        deltas = conn.execute(_SELECT_JOURNAL_SINCE, (head, snapshot_id, snapshot_id)).fetchall()
+        row = list(row)
+        for (delta,) in deltas:
+            inventory = journal.apply(row, inventory, delta)
+        return self._player_from_rows(row, inventory), head, len(deltas)
+
+    def _revision(self, user_id: int) -> int | None:
+        conn = self._connection()
+        row = conn.execute(_SELECT_JOURNAL_HEAD if self.journaled else _SELECT_REVISION, (user_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def _save_many(
+        self, batch: list[tuple[int, Rows | None, list[tuple[Any, ...]], int | None]]
+    ) -> tuple[dict[int, int], set[int]]:
+        """Append journal entries and write snapshots; returns each user's newest journal id and the conflicts.
+
+        A user with a base revision is only written if the stored player still
+        carries it (the write lock is held from BEGIN IMMEDIATE, so no other
+        process can save in between); otherwise the user is skipped and
+        reported as a conflict.
+        """
+        conn = self._connection()
+        last_ids: dict[int, int] = {}
+        conflicts: set[int] = set()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for user_id, _, _, base in batch:
+                if base is not None and self._revision(user_id) != base:
+                    conflicts.add(user_id)
+            snapshots = [rows for user_id, rows, _, _ in batch if rows is not None and user_id not in conflicts]
+            if snapshots:
+                conn.executemany(_UPSERT_PLAYER, [player_row for player_row, _ in snapshots])
+                conn.executemany(_DELETE_INVENTORY, [(player_row[0],) for player_row, _ in snapshots])
+                conn.executemany(_INSERT_INVENTORY, [row for _, inventory_rows in snapshots for row in inventory_rows])
+            # After the snapshots: a requeued first save carries both, and the entries hang off its row.
+            for user_id, _, entries, _ in batch:
+                head = self._revision(user_id) if entries and user_id not in conflicts else None
+                if head is None:
+                    continue  # nothing to append, or the player was deleted meanwhile
+                for entry in entries:
+                    head = conn.execute(_INSERT_JOURNAL, (*entry, head)).lastrowid
+                conn.execute(_SET_JOURNAL_HEAD, (head, user_id))
+                last_ids[user_id] = head
+            if snapshots and self.journaled:
+                conn.executemany(_SET_SNAPSHOT_JOURNAL_ID, [(player_row[0],) for player_row, _ in snapshots])
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return last_ids, conflicts
+
+    def import_players(self, players: Sequence[Player], *, dry_run: bool = False) -> list[int]:
+        """Store the players that are not in the database yet, in one transaction; returns their ids.
+
+        Blocking and outside the group-commit writer: for offline tools such
+        as ``utils/legacy_migration.py``. Players already stored are left as
+        they are (as is a repeat of a user within ``players``: the first one
+        wins), so importing the same batch twice writes nothing the second
+        time. With ``dry_run=True`` nothing is written.
+        """
+        conn = self._connection()
+        user_ids = [player.user_id for player in players]
+        conn.execute("BEGIN" if dry_run else "BEGIN IMMEDIATE")
+        try:
+            seen = {
+                user_id
+                for start in range(0, len(user_ids), 500)  # SQLite's host-parameter limit
+                for (user_id,) in conn.execute(
+                    _SELECT_STORED.format(",".join("?" * len(user_ids[start:start + 500]))), user_ids[start:start + 500]
+                )
+            }
+            new: list[Player] = []
+            for player in players:
+                if player.user_id not in seen:
+                    seen.add(player.user_id)
+                    new.append(player)
+            if not dry_run:
+                conn.executemany(_UPSERT_PLAYER, [
+                    self._player_row(player, 0 if self.journaled else random.getrandbits(63)) for player in new
+                ])
+                conn.executemany(_INSERT_INVENTORY, [row for player in new for row in self._inventory_rows(player)])
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("ROLLBACK" if dry_run else "COMMIT")
+        return [player.user_id for player in new]
+
+    def _delete(self, user_id: int) -> None:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(_DELETE_JOURNAL, (user_id,))  # found through the player's row, so first
+            conn.execute(_DELETE_INVENTORY, (user_id,))
+            conn.execute(_DELETE_PLAYER, (user_id,))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _build_leaderboard(self) -> Leaderboard:
+        return Leaderboard.from_rows(self._connection().execute(_SELECT_STANDINGS))
+
+    def _read_journal(self, user_id: int, limit: int) -> list[JournalEntry]:
+        rows = self._connection().execute(_SELECT_JOURNAL_RECENT, (user_id, limit)).fetchall()
+        return [JournalEntry(id_, at, kind, command, json.loads(delta)) for id_, at, kind, command, delta in reversed(rows)]
+
+    # --- stored state per cached player ---
+
+    def _remember(self, user_id: int, persisted: _Persisted) -> None:
+        self._persisted[user_id] = persisted
+        if len(self._persisted) > 2 * self.cache.capacity:
+            # Evicted players with a save still queued or committing keep their base revision.
+            self._persisted = {
+                uid: p for uid, p in self._persisted.items()
+                if uid in self.cache or uid in self._dirty or uid in self._inflight
+            }
+
+    async def _is_current(self, user_id: int) -> bool:
+        persisted = self._persisted.get(user_id)
+        return persisted is not None and await self._run(self._revision, user_id) == persisted.revision
+
+    # --- public API ---
+
+    @timed_phase("load")
+    async def load_player_data(self, user_id: int) -> Player | None:
+        """Return the live player, or ``None`` if the user has not started.
+
+        Repeated calls return the same object while it stays cached; concurrent
+        misses for one user share a single database read.
+        """
+        user_id = int(user_id)
+        player = self.cache.get(user_id)
+        queued = self._dirty.get(user_id) or self._inflight.get(user_id)
+        if player is not None:
+            if not self.shared or queued is not None or await self._is_current(user_id):
+                return player
+            # Another process saved this player after we last read or wrote it.
+            self.cache.pop(user_id)
+            self.stale_reloads += 1
+        elif queued is not None:
+            # Evicted before its save was committed; the row on disk is stale.
+            return self.cache.setdefault(queued.player)
+        # The read runs in its own task, so a cancelled caller does not cancel it for the others.
+        task = self._pending_loads.get(user_id)
+        if task is None:
+            task = self._pending_loads[user_id] = asyncio.ensure_future(self._load_shared(user_id))
+            task.add_done_callback(lambda done: self._load_done(user_id, done))
+        return await asyncio.shield(task)
+
+    async def _load_shared(self, user_id: int) -> Player | None:
+        loaded = await self._run(self._load, user_id)
+        if loaded is None:
+            return self.cache.peek(user_id)
+        # A save that landed while we were reading wins over the stale row.
+        player = self.cache.setdefault(loaded[0])
+        if player is loaded[0]:
+            _, revision, entries = loaded
+            row = self._player_row(player, revision)
+            inventory = journal.inventory_state(self._inventory_rows(player))
+            self._remember(user_id, _Persisted(row, inventory, revision, entries))
+        return player
+
+    def _load_done(self, user_id: int, task: asyncio.Task[Player | None]) -> None:
+        if self._pending_loads.get(user_id) is task:
+            del self._pending_loads[user_id]
+        if not task.cancelled():
+            task.exception()  # waiters re-raise it; don't log it as unretrieved when they all left
+
+    @timed_phase("save")
+    async def save_player_data(self, player: Player, *, durable: bool = False) -> None:
+        """Queue one player for the next group commit.
+
+        With ``durable=True`` this waits until the commit containing this save
+        has finished (e.g. on game over).
+        """
+        self.cache.put(player)
+        user_id = player.user_id
+        if self.leaderboard is not None:
+            self.leaderboard.update(user_id, player.name, player.distance, player.best_distance)
+        previous = self._persisted.get(user_id)
+        if self.journaled:
+            # The revision is the newest journal id (0 before the first entry); commits advance it.
+            revision = previous.revision if previous is not None else 0
+        else:
+            revision = random.getrandbits(63)
+        # Rows are snapshotted on the loop thread so the writer never reads a
+        # Player that a command is still mutating.
+        rows = (self._player_row(player, revision), self._inventory_rows(player))
+        inventory = journal.inventory_state(rows[1])
+
+        entry = None
+        snapshot = True
+        if self.journaled and previous is not None:
+            delta = journal.diff(previous.row, previous.inventory, rows[0], inventory)
+            if not delta:
+                # Nothing changed since the last save: nothing to write.
+                if durable:
+                    await self.flush()
+                return
+            encoded = journal.encode(delta)
+            entry = (
+                user_id, int(time.time() * 1000), journal.kind(previous.row, previous.inventory, delta),
+                current_command(), encoded,
+            )
+            self.journal_entries += 1
+            self.journal_bytes += len(encoded)
+            snapshot = previous.entries + 1 >= self.snapshot_interval
+        entries = 0 if snapshot else previous.entries + 1
+        self._remember(user_id, _Persisted(rows[0], inventory, revision, entries))
+
+        pending = self._dirty.get(user_id)
+        if pending is None:
+            # Based on what this process last read or wrote; unknown (new player): unconditional.
+            base = previous.revision if previous is not None else None
+            pending = self._dirty[user_id] = _Pending(player, rows, snapshot, base)
+        else:
+            pending.player, pending.rows = player, rows
+            pending.snapshot = pending.snapshot or snapshot
+        if entry is not None:
+            pending.entries.append(entry)
+        self._ensure_writer()
+        waiter: asyncio.Future[None] | None = None
+        if durable:
+            waiter = asyncio.get_running_loop().create_future()
+            self._durability_waiters.append(waiter)
+        if len(self._dirty) >= config.WRITE_BATCH_MAX_RECORDS:
+            self._commit_now.set()
+        self._wake.set()
+        if waiter is not None:
+            await waiter
+
+    def evict(self, user_id: int) -> Player | None:
+        """Drop a player from memory; the next load reads the database.
+
+        Refused (None) while the player has a save that is not committed yet
+        or a load in progress: call ``flush`` first.
+        """
+        if user_id in self._dirty or user_id in self._inflight or user_id in self._pending_loads:
+            return None
+        self._persisted.pop(user_id, None)
+        return self.cache.pop(user_id)
+
+    async def create_new_player(self, user_id: int, name: str) -> Player:
+        """Create, store and return a fresh player with the starter kit."""
+        player = Player.create(int(user_id), name)
+        await self.save_player_data(player)
+        return player
+
+    async def delete_player_data(self, user_id: int) -> None:
+        user_id = int(user_id)
+        self.cache.pop(user_id)
+        self._dirty.pop(user_id, None)
+        # _inflight is the batch being committed: dropping the user keeps loads from
+        # re-caching it and a failed commit from requeueing it. Its rows may still be
+        # written, but _delete runs after that commit on the same executor thread.
+        self._inflight.pop(user_id, None)
+        self._persisted.pop(user_id, None)
+        if self.leaderboard is not None:
+            self.leaderboard.remove(user_id)
+        await self._run(self._delete, user_id)
+        # A load that read the row before the delete may have cached it meanwhile.
+        self.cache.pop(user_id)
+        self._persisted.pop(user_id, None)
+
+    async def standings(self) -> Leaderboard:
+        """The distance rankings; the first call reads every player once."""
+        stale = self.shared and time.monotonic() - self._leaderboard_built > config.LEADERBOARD_REFRESH_INTERVAL
+        if (self.leaderboard is None or stale) and (self._leaderboard_task is None or self._leaderboard_task.done()):
+            self._leaderboard_task = asyncio.create_task(self._rebuild_leaderboard(), name="leaderboard-rebuild")
+        if self.leaderboard is None:
+            await asyncio.shield(self._leaderboard_task)
+        return self.leaderboard
+
+    async def _rebuild_leaderboard(self) -> None:
+        await self.flush()
+        try:
+            leaderboard = await self._run(self._build_leaderboard)
+        except Exception as e:
+            if self.leaderboard is None:
+                raise
+            print(f"Failed to rebuild the leaderboard, keeping the current one: {e}")
+            return
+        # Saves that landed during the read are newer than its rows.
+        for player in [*self.cache, *(pending.player for pending in self._dirty.values())]:
+            leaderboard.update(player.user_id, player.name, player.distance, player.best_distance)
+        self.leaderboard = leaderboard
+        self._leaderboard_built = time.monotonic()
+
+    async def read_journal(self, user_id: int, limit: int = 50) -> list[JournalEntry]:
+        """The player's newest ``limit`` journal entries, oldest first (audit trail)."""
+        await self.flush()
+        return await self._run(self._read_journal, int(user_id), limit)
+
+    def write_stats(self) -> dict[str, int]:
+        return {
+            "queued": len(self._dirty),
+            "commits": self.commits,
+            "records_committed": self.records_committed,
+            "stale_reloads": self.stale_reloads,
+            "write_conflicts": self.write_conflicts,
+            "snapshots": self.snapshots,
+            "journal_entries": self.journal_entries,
+            "journal_bytes": self.journal_bytes,
+        }
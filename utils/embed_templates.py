@@ -0,0 +1,151 @@
+"""Builders for the embeds the bot sends on every turn.
+
+One plain function per embed. What never changes — titles, field names,
+footers and colours — lives here as module constants, built once at import,
+so a per-turn build only formats the values that change. Embeds are built
+through discord.py's public API (``Embed``, ``add_field``, ``set_footer``,
+``set_thumbnail``), never its private attributes.
+
+Every builder takes keyword arguments only; those for user-facing embeds
+also take ``thumbnail`` (an image URL).
+"""
+from __future__ import annotations
+
+import discord
+
+_BLUE = discord.Colour.blue()
+_GOLD = discord.Colour.gold()
+_GREEN = discord.Colour.green()
+_RED = discord.Colour.red()
+_PURPLE = discord.Colour.purple()
+_GREY = discord.Colour.light_grey()
+
+
+def _embed(title: str, description: str | None, colour: discord.Colour, thumbnail: str | None = None) -> discord.Embed:
+    embed = discord.Embed(title=title, description=description, colour=colour)
+    if thumbnail is not None:
+        embed.set_thumbnail(url=thumbnail)
+    return embed
+
+
+# --- combat (cogs/cog_misc.py) ---
+
+def combat(
+    *,
+    description: str,
+    hp: int,
+    max_hp: int,
+    monster: str,
+    monster_hp: int,
+    monster_max_hp: int,
+    distance: int,
+    level: int,
+    colour: discord.Colour | None = None,
+) -> discord.Embed:
+    embed = discord.Embed(title="⚔️ 戦闘状況", description=description, colour=_BLUE if colour is None else colour)
+    embed.add_field(name="あなた", value=f"HP: {hp}/{max_hp}", inline=True)
+    embed.add_field(name=f"敵: {monster}", value=f"HP: {monster_hp}/{monster_max_hp}", inline=True)
+    embed.set_footer(text=f"距離: {distance}m | レベル: {level}")
+    return embed
+
+
+def combat_item(*, description: str) -> discord.Embed:
+    return discord.Embed(title="⚔️ 戦闘状況 - アイテム使用", description=description, colour=_GOLD)
+
+
+# --- status and inventory (cogs/cog_misc_2.py) ---
+
+def status(
+    *,
+    name: str,
+    hp: int,
+    max_hp: int,
+    atk: int,
+    def_val: int,
+    distance: int,
+    equipment: str,
+    thumbnail: str | None = None,
+) -> discord.Embed:
+    embed = _embed(f"👤 {name} のステータス", None, _GREEN, thumbnail)
+    embed.add_field(name="HP", value=f"{hp}/{max_hp}", inline=True)
+    embed.add_field(name="攻撃力 (ATK)", value=str(atk), inline=True)
+    embed.add_field(name="防御力 (DEF)", value=str(def_val), inline=True)
+    embed.add_field(name="進行距離", value=f"{distance}m", inline=False)
+    embed.add_field(name="装備品", value=equipment, inline=False)
+    embed.set_footer(text="装備品はATK/DEFに影響します。")
+    return embed
+
+
+def inventory(*, name: str, equipment: str, items: str, thumbnail: str | None = None) -> discord.Embed:
+    embed = _embed(f"🎒 {name} のインベントリ", None, _BLUE, thumbnail)
+    embed.add_field(name="現在装備中", value=equipment, inline=False)
+    embed.add_field(name="所持品", value=items, inline=False)
+    embed.set_footer(text="装備したい場合は /equip コマンドを使用してください。")
+    return embed
+
+
+# --- dungeon events (cogs/games.py) ---
+
+def event_monster(*, name: str, hp: int, attack: int, defense: int, distance: int) -> discord.Embed:
+    embed = discord.Embed(
+        title=f"⚔️ モンスター出現！ - {name}",
+        description=f"{name}が現れた！\nHP: {hp}, ATK: {attack}, DEF: {defense}\nどうする？ `/attack`, `/item`, `/run`",
+        colour=_RED,
+    )
+    embed.set_footer(text=f"現在地: {distance}m")
+    return embed
+
+
+def event_item(*, name: str, distance: int) -> discord.Embed:
+    embed = discord.Embed(
+        title=f"📦 アイテム発見！ - {name}", description=f"{name}を見つけた！インベントリに追加されました。", colour=_GOLD
+    )
+    embed.set_footer(text=f"現在地: {distance}m")
+    return embed
+
+
+def event_story(*, message: str, distance: int) -> discord.Embed:
+    embed = discord.Embed(title="📜 物語の断片", description=message, colour=_PURPLE)
+    embed.set_footer(text=f"現在地: {distance}m")
+    return embed
+
+
+def event_empty(*, message: str, distance: int) -> discord.Embed:
+    embed = discord.Embed(title="🚶‍♂️ 静かな道", description=message, colour=_GREY)
+    embed.set_footer(text=f"現在地: {distance}m")
+    return embed
+
+
+def advance_summary(*, steps: int, description: str, start: int, distance: int) -> discord.Embed:
+    embed = discord.Embed(title=f"🚶‍♂️ {steps}m前進した", description=description, colour=_BLUE)
+    embed.set_footer(text=f"{start}m → 現在地: {distance}m")
+    return embed
+
+
+def advance_monster(*, name: str, description: str, start: int, distance: int) -> discord.Embed:
+    embed = discord.Embed(title=f"⚔️ モンスター出現！ - {name}", description=description, colour=_RED)
+    embed.set_footer(text=f"{start}m → 現在地: {distance}m")
+    return embed
+
+
+def adventure_log(*, lines: str, distance: int) -> discord.Embed:
+    embed = discord.Embed(title="📜 冒険ログ", description=lines, colour=_BLUE)
+    embed.set_footer(text=f"現在地: {distance}m")
+    return embed
+
+
+# --- rankings (cogs/leaderboard.py) ---
+
+def leaderboard(*, title: str, lines: str, page: int, players: int, goal: int) -> discord.Embed:
+    embed = discord.Embed(title=f"🏆 {title}ランキング", description=lines, colour=_GOLD)
+    embed.set_footer(text=f"{page}ページ目 / 全{players}人 | 目標: {goal}m")
+    return embed
+
+
+def rank(*, name: str, best: str, current: str, players: int, goal: int, thumbnail: str | None = None) -> discord.Embed:
+    embed = _embed(f"🏅 {name} の順位", None, _GOLD, thumbnail)
+    embed.add_field(name="最高到達距離", value=best, inline=True)
+    embed.add_field(name="現在の進行距離", value=current, inline=True)
+    embed.set_footer(text=f"全{players}人中 | 目標: {goal}m")
+    return embed
+
@@ -0,0 +1,148 @@
+"""Precompiled, distance-banded event and loot tables.
+
+The road to the goal is cut into bands of ``ENCOUNTER_BAND_WIDTH`` metres.
+For each band every possible step outcome (each eligible monster, each loot
+item, each story line, each empty-road message) is compiled into one alias
+table, so rolling a step is one ``rng.random()`` call plus two list lookups.
+Tables are compiled from the content catalog when it is loaded (see
+``utils/content.py``), are immutable once built and are shared by every
+``GameLogic``.
+"""
+from __future__ import annotations
+
+import random
+from typing import Any, Generic, Sequence, TypeVar
+
+import config
+from models import catalog
+from models.dungeon import MonsterDef
+from models.player import ItemDef
+
+T = TypeVar("T")
+
+
+def monster_chance(distance: int) -> float:
+    """Encounter probability per step; rises linearly towards the goal."""
+    progress = min(distance / config.GOAL_DISTANCE, 1.0)
+    return config.BASE_MONSTER_CHANCE + (config.MAX_MONSTER_CHANCE - config.BASE_MONSTER_CHANCE) * progress
+
+
+class AliasTable(Generic[T]):
+    """Walker/Vose alias table: O(n) to build, O(1) per draw."""
+    __slots__ = ("outcomes", "_prob", "_alias", "_n")
+
+    def __init__(self, outcomes: Sequence[T], weights: Sequence[float]) -> None:
+        if not outcomes or len(outcomes) != len(weights):
+            raise ValueError("outcomes and weights must be non-empty and the same length")
+        total = float(sum(weights))
+        if total <= 0:
+            raise ValueError("weights must sum to a positive number")
+        n = len(outcomes)
+        scaled = [w * n / total for w in weights]
+        prob = [1.0] * n
+        alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] += scaled[s] - 1.0
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Whatever is left is 1.0 up to rounding error.
+        self.outcomes = tuple(outcomes)
+        self._prob = prob
+        self._alias = alias
+        self._n = n
+
+    def __len__(self) -> int:
+        return self._n
+
+    def sample(self, rng: random.Random) -> T:
+        u = rng.random() * self._n
+        i = int(u)
+        if u - i < self._prob[i]:
+            return self.outcomes[i]
+        return self.outcomes[self._alias[i]]
+
+    def probabilities(self) -> list[float]:
+        """Exact per-outcome probability implied by the table (for checks and analysis)."""
+        result = [0.0] * self._n
+        for i in range(self._n):
+            result[i] += self._prob[i] / self._n
+            result[self._alias[i]] += (1.0 - self._prob[i]) / self._n
+        return result
+
+
+# A compiled outcome is (event type, payload): a MonsterDef, an ItemDef or a message.
+Outcome = tuple[str, Any]
+
+
+class EncounterTables:
+    """Per-band alias tables for step events and for loot drops."""
+    __slots__ = ("band_width", "events", "loot")
+
+    def __init__(
+        self,
+        monsters: Sequence[MonsterDef],
+        loot: Sequence[tuple[int, ItemDef, int]],
+        stories: Sequence[tuple[int, str]],
+        empty_messages: Sequence[str],
+        item_event_chance: float,
+        story_event_chance: float,
+        band_width: int = config.ENCOUNTER_BAND_WIDTH,
+        goal: int = config.GOAL_DISTANCE,
+    ) -> None:
+        self.band_width = band_width
+        # One extra band covers everything at or beyond the goal.
+        starts = range(0, goal + band_width, band_width)
+        self.events: tuple[AliasTable[Outcome], ...] = tuple(
+            self._compile_events(d, monsters, loot, stories, empty_messages, item_event_chance, story_event_chance)
+            for d in starts
+        )
+        self.loot: tuple[AliasTable[ItemDef], ...] = tuple(self._compile_loot(d, loot) for d in starts)
+
+    @staticmethod
+    def _compile_loot(distance: int, loot: Sequence[tuple[int, ItemDef, int]]) -> AliasTable[ItemDef]:
+        eligible = [(item_def, w) for min_d, item_def, w in loot if distance >= min_d]
+        return AliasTable([d for d, _ in eligible], [w for _, w in eligible])
+
+    @staticmethod
+    def _compile_events(
+        distance: int,
+        monsters: Sequence[MonsterDef],
+        loot: Sequence[tuple[int, ItemDef, int]],
+        stories: Sequence[tuple[int, str]],
+        empty_messages: Sequence[str],
+        item_event_chance: float,
+        story_event_chance: float,
+    ) -> AliasTable[Outcome]:
+        outcomes: list[Outcome] = []
+        weights: list[float] = []
+
+        def add(kind: str, entries: list[tuple[Any, float]], share: float) -> None:
+            total = sum(w for _, w in entries)
+            for payload, w in entries:
+                outcomes.append((kind, payload))
+                weights.append(share * w / total)
+
+        p_monster = monster_chance(distance)
+        add("monster", [(d, d.weight) for d in monsters if distance >= d.min_distance], p_monster)
+        add("item", [(d, w) for min_d, d, w in loot if distance >= min_d], item_event_chance)
+        add("story", [(m, 1) for min_d, m in stories if distance >= min_d], story_event_chance)
+        add("empty", [(m, 1) for m in empty_messages], 1.0 - p_monster - item_event_chance - story_event_chance)
+        return AliasTable(outcomes, weights)
+
+    def band(self, distance: int) -> int:
+        return min(distance // self.band_width, len(self.events) - 1)
+
+    def roll_event(self, distance: int, rng: random.Random) -> Outcome:
+        return self.events[self.band(distance)].sample(rng)
+
+    def roll_loot(self, distance: int, rng: random.Random) -> ItemDef:
+        return self.loot[self.band(distance)].sample(rng)
+
+
+def default_tables() -> EncounterTables:
+    """The installed content catalog's tables (compiled when the catalog is loaded)."""
+    return catalog.current().tables
@@ -0,0 +1,208 @@
+"""Game rules: events, combat formulas, items and progression."""
+from __future__ import annotations
+
+import random
+from typing import Any
+
+import config
+from models.dungeon import Monster
+from models.player import Player, get_item_def
+from utils.encounter_tables import EncounterTables, default_tables
+
+
+class AdvanceResult:
+    """What happened during ``GameLogic.advance``."""
+    __slots__ = ("start_distance", "events", "monster")
+
+    def __init__(self, start_distance: int) -> None:
+        self.start_distance = start_distance
+        self.events: list[dict[str, Any]] = []  # every event rolled, each tagged with its "distance"
+        self.monster: Monster | None = None  # the encounter that stopped the advance, if any
+
+    @property
+    def steps(self) -> int:
+        return len(self.events)
+
+
+class BattleResult:
+    """Outcome of ``GameLogic.auto_battle``. Each side's damage is the same every turn."""
+    __slots__ = ("turns", "hit", "counter", "counters", "won")
+
+    def __init__(self, turns: int, hit: int, counter: int, counters: int, won: bool) -> None:
+        self.turns = turns  # attacks made
+        self.hit = hit  # damage per attack
+        self.counter = counter  # damage per counter-attack
+        self.counters = counters  # counter-attacks taken
+        self.won = won
+
+    @property
+    def damage_dealt(self) -> int:
+        return self.hit * self.turns
+
+    @property
+    def damage_taken(self) -> int:
+        return self.counter * self.counters
+
+
+class GameLogic:
+    """Pure game rules. All randomness goes through ``self.rng`` so runs can be seeded.
+
+    Event and loot rolls use the shared precompiled ``EncounterTables``:
+    the ones passed in, or else the installed content catalog's, looked up
+    per roll so a content reload takes effect immediately.
+    """
+
+    def __init__(self, rng: random.Random | None = None, tables: EncounterTables | None = None) -> None:
+        self.rng = rng or random.Random()
+        self._tables = tables
+
+    @property
+    def tables(self) -> EncounterTables:
+        return self._tables or default_tables()
+
+    # --- players ---
+
+    def initialize_player(self, user_id: int, name: str = "冒険者") -> Player:
+        return Player.create(user_id, name)
+
+    # --- events ---
+
+    def generate_event(self, player: Player) -> dict[str, Any]:
+        """Roll the event for the step the player just took (one table draw)."""
+        kind, payload = self.tables.roll_event(player.distance, self.rng)
+        if kind == "monster":
+            return {"type": "monster", "monster": Monster(payload)}
+        if kind == "item":
+            return {"type": "item", "item": payload}
+        return {"type": kind, "message": payload}
+
+    def advance(self, player: Player, max_steps: int) -> AdvanceResult:
+        """Move up to ``max_steps`` metres, resolving events as they come.
+
+        Items are added to the inventory on the way. The advance stops at the
+        first monster, which leaves the player in combat with it.
+        """
+        result = AdvanceResult(player.distance)
+        for _ in range(max_steps):
+            player.distance += 1
+            event = self.generate_event(player)
+            event["distance"] = player.distance
+            result.events.append(event)
+            if event["type"] == "item":
+                player.add_item(event["item"])
+            elif event["type"] == "monster":
+                player.in_combat = True
+                player.current_monster = result.monster = event["monster"]
+                break
+        player.best_distance = max(player.best_distance, player.distance)
+        return result
+
+    # --- combat ---
+
+    @staticmethod
+    def calculate_damage(player: Player, monster: Monster) -> int:
+        """Damage the player deals per attack."""
+        return max(1, player.total_atk - monster.defense)
+
+    @staticmethod
+    def calculate_monster_attack(monster: Monster, player: Player) -> int:
+        """Damage the monster deals per counter-attack."""
+        return max(1, monster.attack - player.total_def)
+
+    @staticmethod
+    def escape_chance(player: Player, monster: Monster) -> float:
+        chance = config.BASE_ESCAPE_CHANCE + (player.total_def - monster.attack) * 0.02
+        return min(0.9, max(0.2, chance))
+
+    def auto_battle(self, player: Player, monster: Monster) -> BattleResult:
+        """Repeat attack/counter-attack exchanges without stopping, solved in closed form.
+
+        Both damage formulas are deterministic, so the number of attacks to win
+        and the number of counters the player can survive follow directly from
+        HP. The battle stops short of the counter-attack that would be fatal and
+        leaves the player in combat to heal or run. Updates both HP values;
+        defeat rewards are left to ``handle_monster_defeat``.
+        """
+        hit = self.calculate_damage(player, monster)
+        counter = self.calculate_monster_attack(monster, player)
+        attacks_to_win = -(-monster.hp // hit)
+        survivable = (player.hp - 1) // counter
+        if attacks_to_win - 1 <= survivable:
+            result = BattleResult(attacks_to_win, hit, counter, attacks_to_win - 1, True)
+        else:
+            result = BattleResult(survivable, hit, counter, survivable, False)
+        monster.hp = max(0, monster.hp - result.damage_dealt)
+        player.hp -= result.damage_taken
+        return result
+
+    def attempt_escape(self, player: Player, monster: Monster) -> tuple[bool, str]:
+        if self.rng.random() < self.escape_chance(player, monster):
+            return True, f"{monster.name}から逃げ切った！"
+        return False, f"{monster.name}に回り込まれてしまった！"
+
+    def handle_monster_defeat(self, player: Player, monster: Monster) -> tuple[str, str | None]:
+        """Grant EXP, gold and a possible drop. Returns (loot message, level-up message)."""
+        definition = monster.definition
+        player.exp += definition.exp
+        player.gold += definition.gold
+        loot_message = f"{definition.exp} EXPと{definition.gold}ゴールドを手に入れた。"
+        if self.rng.random() < config.MONSTER_DROP_CHANCE:
+            item_def = self.tables.roll_loot(player.distance, self.rng)
+            player.add_item(item_def)
+            loot_message += f"\n{definition.name}は「{item_def.name}」を落とした！"
+
+        level_up_message = None
+        while player.exp >= self.exp_to_next_level(player.level):
+            player.exp -= self.exp_to_next_level(player.level)
+            player.level += 1
+            player.hp = player.max_hp
+            level_up_message = f"レベルが{player.level}に上がった！HPが全回復した。"
+        return loot_message, level_up_message
+
+    @staticmethod
+    def exp_to_next_level(level: int) -> int:
+        return level * 20
+
+    def handle_game_over(self, player: Player) -> str:
+        """Permadeath: end combat and reset progress, HP, items and level. Returns the message."""
+        message = (
+            f"💀 {player.name}は力尽きた……。{player.distance}m地点で冒険は終わった。\n"
+            "すべてを失い、入口からやり直しとなる。"
+        )
+        player.in_combat = False
+        player.current_monster = None
+        player.hp = player.max_hp
+        player.distance = 0
+        player.inventory.clear()
+        player.equipped_items = {slot: None for slot in player.equipped_items}
+        player.exp = 0
+        player.level = 1
+        player.atk = config.STARTING_ATTACK
+        player.def_val = config.STARTING_DEFENSE
+        return message
+
+    # --- items ---
+
+    @staticmethod
+    def is_item_usable_in_combat(item_name: str, player: Player) -> bool:
+        item = player.find_item(item_name)
+        return item is not None and item.item_type == "consumable"
+
+    def apply_item_effect(self, item_name: str, player: Player) -> str:
+        item_def = get_item_def(item_name)
+        if item_def.effect == "heal":
+            healed = min(item_def.value, player.max_hp - player.hp)
+            player.hp += healed
+            return f"HPが{healed}回復した！"
+        if item_def.effect == "damage" and player.current_monster:
+            monster = player.current_monster
+            dealt = min(item_def.value, monster.hp)
+            monster.hp -= dealt
+            return f"{monster.name}に{dealt}ダメージを与えた！"
+        return "何も起こらなかった。"
+
+    @staticmethod
+    def consume_item(item_name: str, player: Player) -> None:
+        item = player.find_item(item_name)
+        if item is not None:
+            player.inventory.take(item.definition)
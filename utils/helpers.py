@@ -7,7 +7,7 @@ import datetime
 def create_embed(title: str, description: str = "", color: discord.Color = discord.Color.blue()) -> discord.Embed:
     """Create a styled embed"""
     embed = discord.Embed(title=title, description=description, color=color)
-    embed.timestamp = datetime.datetime.now()
+    embed.timestamp = datetime.datetime.now(datetime.timezone.utc)
     return embed
 
 def format_error(error: str) -> discord.Embed:
@@ -0,0 +1,94 @@
+"""Prefix search over item names for slash-command autocomplete.
+
+Autocomplete runs on every keystroke, so a lookup must not scan the
+catalog or the player's inventory. ``PrefixIndex`` keeps its keys sorted:
+a search bisects to the first key starting with the typed text and walks
+forward only while keys still match, i.e. O(log n + matches). The catalog
+index has a key per suffix of each normalized display name (so "剣" finds
+"鉄の剣") plus the item id; callers then check each match against the
+player's ``Inventory`` in O(1), stopping at Discord's 25 choices.
+"""
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Generic, Iterable, Iterator, Mapping, TypeVar
+
+from models import catalog as content_catalog
+from models.player import Inventory, Item, ItemDef, normalize_name
+
+T = TypeVar("T")
+
+MAX_CHOICES = 25  # Discord's limit per autocomplete response
+
+
+class PrefixIndex(Generic[T]):
+    __slots__ = ("_keys", "_values")
+
+    def __init__(self, entries: Iterable[tuple[str, T]]) -> None:
+        pairs = sorted(entries, key=lambda entry: entry[0])
+        self._keys = [key for key, _ in pairs]
+        self._values = [value for _, value in pairs]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def matches(self, prefix: str) -> Iterator[T]:
+        """Values whose key starts with ``prefix`` (already normalized), in key order, each once."""
+        seen: set[int] = set()
+        i = bisect_left(self._keys, prefix)
+        while i < len(self._keys) and self._keys[i].startswith(prefix):
+            value = self._values[i]
+            if id(value) not in seen:
+                seen.add(id(value))
+                yield value
+            i += 1
+
+
+def build_item_index(catalog: Mapping[str, ItemDef]) -> PrefixIndex[ItemDef]:
+    entries: list[tuple[str, ItemDef]] = []
+    for item_def in catalog.values():
+        name = normalize_name(item_def.name)
+        entries.extend((name[i:], item_def) for i in range(len(name)))
+        entries.append((normalize_name(item_def.item_id), item_def))
+    return PrefixIndex(entries)
+
+
+_index: tuple[Mapping[str, ItemDef], PrefixIndex[ItemDef]] | None = None
+
+
+def item_index(catalog: Mapping[str, ItemDef]) -> PrefixIndex[ItemDef]:
+    """The index for ``catalog``, rebuilt only when a different catalog object is passed."""
+    global _index
+    if _index is None or _index[0] is not catalog:
+        _index = (catalog, build_item_index(catalog))
+    return _index[1]
+
+
+def search_items(text: str, catalog: Mapping[str, ItemDef] | None = None) -> Iterator[ItemDef]:
+    """Catalog items matching what the user has typed so far (default: the installed content's items).
+
+    The index is keyed by the catalog object, so a content reload rebuilds it on the next keystroke.
+    """
+    return item_index(catalog if catalog is not None else content_catalog.current().items).matches(normalize_name(text))
+
+
+def held_matches(inventory: Inventory, text: str, item_types: Iterable[str], limit: int = MAX_CHOICES) -> list[Item]:
+    """Up to ``limit`` of the player's stacks of ``item_types`` matching ``text``.
+
+    Empty input lists the type buckets directly; otherwise each catalog match
+    costs one dict lookup in the inventory, however large it is.
+    """
+    item_types = tuple(item_types)
+    if text.strip():
+        candidates: Iterable[Item | None] = (
+            inventory.get(item_def.item_id) for item_def in search_items(text) if item_def.item_type in item_types
+        )
+    else:
+        candidates = (item for item_type in item_types for item in inventory.by_type(item_type))
+    found: list[Item] = []
+    for item in candidates:
+        if item is not None:
+            found.append(item)
+            if len(found) == limit:
+                break
+    return found
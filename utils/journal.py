@@ -0,0 +1,88 @@
+"""Compact per-save deltas for the journal persistence mode.
+
+In ``PERSISTENCE_MODE = "journal"`` the ``DataManager`` does not rewrite a
+player's row on every save. It appends one ``journal`` row holding only
+what changed since the previous save, e.g. ``{"distance":42}`` for a
+quiet ``/m`` step, and rewrites the full row (the snapshot) every
+``JOURNAL_SNAPSHOT_INTERVAL`` entries. Loading replays the entries newer
+than the snapshot. The journal is never compacted, so it doubles as an
+audit trail: each entry records when, which command, and a coarse kind.
+
+The field order mirrors ``DataManager._player_row``; inventory rows are
+``(item_id, quantity, is_equipped)``, as ``_SELECT_INVENTORY`` returns them.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, NamedTuple, Sequence
+
+# Player row columns 1..14 (0 is user_id, 15 the revision, neither journaled)
+FIELDS: tuple[str, ...] = (
+    "name", "thread", "message", "hp", "max_hp", "atk", "def", "level",
+    "exp", "gold", "distance", "battle", "monster", "best",
+)
+_FIRST, _LAST = 1, len(FIELDS)
+_INDEX = {name: i for i, name in enumerate(FIELDS, _FIRST)}
+_HP, _DISTANCE = _INDEX["hp"], _INDEX["distance"]
+
+InventoryRow = tuple[str, int, int]
+
+
+class JournalEntry(NamedTuple):
+    id: int
+    at: int  # unix time, milliseconds
+    kind: str
+    command: str | None
+    delta: dict[str, Any]
+
+
+def inventory_state(inventory_rows: Sequence[tuple[Any, ...]]) -> list[InventoryRow]:
+    """``DataManager._inventory_rows`` output without the user id and item type."""
+    return [(item_id, quantity, is_equipped) for _, item_id, _, quantity, is_equipped in inventory_rows]
+
+
+def diff(
+    old_row: Sequence[Any], old_inventory: list[InventoryRow], new_row: Sequence[Any], new_inventory: list[InventoryRow]
+) -> dict[str, Any]:
+    delta: dict[str, Any] = {
+        FIELDS[i - _FIRST]: new_row[i] for i in range(_FIRST, _LAST + 1) if new_row[i] != old_row[i]
+    }
+    if new_inventory != old_inventory:
+        delta["inventory"] = [list(row) for row in new_inventory]
+    return delta
+
+
+def encode(delta: dict[str, Any]) -> str:
+    return json.dumps(delta, ensure_ascii=False, separators=(",", ":"))
+
+
+def kind(old_row: Sequence[Any], old_inventory: list[InventoryRow], delta: dict[str, Any]) -> str:
+    """A coarse label for the audit trail; replay does not depend on it."""
+    if "distance" in delta and delta["distance"] < old_row[_DISTANCE]:
+        return "defeat"  # game over resets the run
+    if "inventory" in delta:
+        old_counts = sum(quantity for _, quantity, _ in old_inventory)
+        new_counts = sum(quantity for _, quantity, _ in delta["inventory"])
+        if new_counts > old_counts:
+            return "loot"
+        if new_counts == old_counts:
+            return "equip"
+        return "use"
+    if "distance" in delta:
+        return "advance"
+    if "hp" in delta and delta["hp"] < old_row[_HP]:
+        return "damage"
+    if "battle" in delta or "monster" in delta:
+        return "battle"
+    return "update"
+
+
+def apply(row: list[Any], inventory: list[InventoryRow], delta_json: str) -> list[InventoryRow]:
+    """Replay one entry onto ``row`` (in place); returns the resulting inventory."""
+    delta = json.loads(delta_json)
+    for name, value in delta.items():
+        if name == "inventory":
+            inventory = [tuple(item) for item in value]
+        else:
+            row[_INDEX[name]] = value
+    return inventory
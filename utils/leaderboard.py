@@ -0,0 +1,209 @@
+"""In-memory distance rankings: top-K and a player's rank without scanning.
+
+``RankIndex`` maps each user to one non-negative value and keeps a Fenwick
+(binary indexed) tree of how many users hold each value, plus the users at
+each value in the order they got there. Updating a user, a rank query
+("how many are strictly ahead") and finding the next occupied value are
+O(log D), D being the largest value; top-K costs O(log D) per distinct
+value on the page. Users on the same value share a rank and are listed
+first-come, first-served.
+
+``Leaderboard`` keeps two of them, current and best distance, plus display
+names. The ``DataManager`` feeds it on every save and rebuilds it from the
+``players`` table (see ``DataManager.standings``).
+"""
+from __future__ import annotations
+
+from itertools import islice
+from typing import Iterable, NamedTuple
+
+BOARDS: tuple[str, ...] = ("best", "current")
+
+
+class Standing(NamedTuple):
+    rank: int
+    user_id: int
+    name: str
+    distance: int
+
+
+class RankIndex:
+    __slots__ = ("_tree", "_values", "_users_at", "_size")
+
+    def __init__(self) -> None:
+        self._size = 1024  # values 0..size-1; doubles when a larger value arrives
+        self._tree = [0] * (self._size + 1)
+        self._values: dict[int, int] = {}
+        self._users_at: dict[int, dict[int, None]] = {}  # value -> users, insertion ordered
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._values
+
+    def value(self, user_id: int) -> int | None:
+        return self._values.get(user_id)
+
+    # --- Fenwick tree over value + 1 ---
+
+    def _add(self, value: int, delta: int) -> None:
+        i = value + 1
+        while i <= self._size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def _count_upto(self, value: int) -> int:
+        """Users whose value is <= ``value``."""
+        i, total = min(value + 1, self._size), 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _value_of_nth(self, n: int) -> int:
+        """Smallest value v such that ``n`` users (1-based) have a value <= v."""
+        i, step = 0, self._size
+        while step:
+            if i + step <= self._size and self._tree[i + step] < n:
+                i += step
+                n -= self._tree[i]
+            step >>= 1
+        return i  # tree index i + 1 -> value i
+
+    def _grow(self, value: int) -> None:
+        while value >= self._size:
+            self._size *= 2
+        self._rebuild_tree()
+
+    def _rebuild_tree(self) -> None:
+        # Linear time: counts in place, then push each node into its parent.
+        tree = [0] * (self._size + 1)
+        for v, users in self._users_at.items():
+            tree[v + 1] = len(users)
+        for i in range(1, self._size + 1):
+            parent = i + (i & -i)
+            if parent <= self._size:
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    # --- updates ---
+
+    def set(self, user_id: int, value: int) -> None:
+        value = max(0, value)
+        old = self._values.get(user_id)
+        if old == value:
+            return
+        if old is not None:
+            self._discard(user_id, old)
+        if value >= self._size:
+            self._grow(value)
+        self._values[user_id] = value
+        self._users_at.setdefault(value, {})[user_id] = None
+        self._add(value, 1)
+
+    def load(self, values: Iterable[tuple[int, int]]) -> None:
+        """Bulk ``set`` of ``(user_id, value)`` pairs with one tree rebuild at the end."""
+        for user_id, value in values:
+            value = max(0, value)
+            old = self._values.get(user_id)
+            if old is not None:
+                users = self._users_at[old]
+                del users[user_id]
+                if not users:
+                    del self._users_at[old]
+            self._values[user_id] = value
+            self._users_at.setdefault(value, {})[user_id] = None
+        largest = max(self._users_at, default=0)
+        while largest >= self._size:
+            self._size *= 2
+        self._rebuild_tree()
+
+    def remove(self, user_id: int) -> None:
+        old = self._values.pop(user_id, None)
+        if old is not None:
+            self._discard(user_id, old)
+
+    def _discard(self, user_id: int, value: int) -> None:
+        users = self._users_at[value]
+        del users[user_id]
+        if not users:
+            del self._users_at[value]
+        self._add(value, -1)
+
+    # --- queries ---
+
+    def rank(self, user_id: int) -> int | None:
+        """1 + the number of users strictly ahead, or None if not ranked."""
+        value = self._values.get(user_id)
+        if value is None:
+            return None
+        return len(self._values) - self._count_upto(value) + 1
+
+    def top(self, k: int, offset: int = 0) -> list[tuple[int, int, int]]:
+        """``(rank, user_id, value)`` for places ``offset + 1`` .. ``offset + k``."""
+        page: list[tuple[int, int, int]] = []
+        total = len(self._values)
+        if k <= 0 or offset >= total:
+            return page
+        # Place offset + 1 is the (total - offset)-th user counting from the bottom.
+        value = self._value_of_nth(total - offset)
+        remaining = self._count_upto(value)  # users on this value or lower
+        skip = offset - (total - remaining)
+        while True:
+            users = self._users_at[value]
+            rank = total - remaining + 1
+            page.extend((rank, user_id, value) for user_id in islice(users, skip, skip + k - len(page)))
+            remaining -= len(users)
+            if len(page) == k or not remaining:
+                return page
+            value = self._value_of_nth(remaining)
+            skip = 0
+
+
+class Leaderboard:
+    """Current and best distance rankings plus the names to show with them."""
+
+    def __init__(self) -> None:
+        self.indexes = {board: RankIndex() for board in BOARDS}
+        self.names: dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def update(self, user_id: int, name: str, distance: int, best_distance: int) -> None:
+        self.names[user_id] = name
+        self.indexes["current"].set(user_id, distance)
+        self.indexes["best"].set(user_id, max(best_distance, distance))
+
+    def remove(self, user_id: int) -> None:
+        self.names.pop(user_id, None)
+        for index in self.indexes.values():
+            index.remove(user_id)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple[int, str, int, int]]) -> Leaderboard:
+        """Build from ``(user_id, name, distance, best_distance)`` rows."""
+        leaderboard = cls()
+        current: list[tuple[int, int]] = []
+        best: list[tuple[int, int]] = []
+        for user_id, name, distance, best_distance in rows:
+            leaderboard.names[user_id] = name
+            current.append((user_id, distance))
+            best.append((user_id, max(best_distance, distance)))
+        leaderboard.indexes["current"].load(current)
+        leaderboard.indexes["best"].load(best)
+        return leaderboard
+
+    def top(self, board: str, k: int, offset: int = 0) -> list[Standing]:
+        return [
+            Standing(rank, user_id, self.names.get(user_id, "冒険者"), value)
+            for rank, user_id, value in self.indexes[board].top(k, offset)
+        ]
+
+    def standing(self, board: str, user_id: int) -> Standing | None:
+        index = self.indexes[board]
+        rank = index.rank(user_id)
+        if rank is None:
+            return None
+        return Standing(rank, user_id, self.names.get(user_id, "冒険者"), index.value(user_id))
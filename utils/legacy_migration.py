@@ -0,0 +1,485 @@
+"""Stream the legacy whole-file JSON saves into the SQLite store.
+
+The old stores were single JSON documents, ``PLAYER_DATA_FILE`` (user id ->
+``Player.to_dict()`` record) and ``DUNGEON_DATA_FILE`` (user id -> run state
+such as distance, combat and thread, overriding the player record's
+fields); a top-level array of records carrying ``user_id`` is accepted too.
+They are far too big to ``json.load`` on small hosts, so
+``iter_json_entries`` reads the top-level container a chunk at a time and
+decodes one member at a time: memory stays at one chunk plus one record
+plus one batch, whatever the file size.
+
+The migration runs in two passes:
+
+1. ``DUNGEON_DATA_FILE`` is staged into a work database
+   (``MIGRATION_STATE_FILE``), one row per user, so the players pass can
+   join against it from disk instead of holding it in memory.
+2. ``PLAYER_DATA_FILE`` is read in batches of ``MIGRATION_BATCH_SIZE``;
+   each record is merged with its staged run state, converted with
+   ``Player.from_dict`` (legacy field names are mapped first) and checked;
+   valid players are written with ``DataManager.import_players`` in one
+   transaction per batch. Players already in the store are left alone.
+
+After every batch the byte offset reached is checkpointed in the work
+database, together with the file's size and mtime, so an interrupted run
+resumes where it stopped (a changed file is refused unless ``--restart``).
+A batch that committed just before a crash and is replayed on resume is
+skipped as already stored. ``--dry-run`` parses, converts and validates
+everything, and counts what would be imported, without writing to the
+store (its work database is a temporary file).
+
+    python -m utils.legacy_migration --dry-run
+    python -m utils.legacy_migration --batch-size 1000
+
+Run it before starting the bot, or restart the bot afterwards: a running
+bot's leaderboard only picks up the imported players when it is rebuilt.
+"""
+from __future__ import annotations
+
+import argparse
+import codecs
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import Any, Iterator
+
+import config
+from models.player import Player
+from utils.data_manager import DataManager
+
+try:
+    import resource  # Unix only; peak RSS in the report
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore[assignment]
+
+CHUNK_SIZE = 1 << 16  # bytes read per refill
+MAX_RECORD_SIZE = 1 << 24  # a single record larger than this is treated as corrupt
+MAX_ERRORS_SHOWN = 20
+
+# Legacy spellings (the original spec's column names) -> Player.from_dict keys
+FIELD_ALIASES = {
+    "id": "user_id",
+    "current_hp": "hp",
+    "defense": "def",
+    "in_battle": "in_combat",
+    "thread_id": "current_thread_id",
+    "monster": "current_monster",
+    "equipment": "equipped_items",
+}
+INT_FIELDS = ("hp", "max_hp", "atk", "def", "level", "exp", "gold", "distance", "best_distance")
+ID_FIELDS = ("current_thread_id", "last_event_message_id")
+
+_WORK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    source TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    container TEXT,
+    position INTEGER NOT NULL,
+    done INTEGER NOT NULL,
+    stats TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dungeon (
+    user_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+_WS = re.compile(r"[ \t\n\r]*")
+
+
+class JsonStreamError(ValueError):
+    """The file is not a JSON object or array of records."""
+
+
+# --- streaming reader ---
+
+def iter_json_entries(
+    path: str, position: int = 0, container: str | None = None, chunk_size: int = CHUNK_SIZE
+) -> Iterator[tuple[str | None, Any, str, int]]:
+    """Yield ``(key, value, container, end)`` for each member of the file's top-level object or array.
+
+    ``key`` is None for array items; ``container`` is ``"{"`` or ``"["``;
+    ``end`` is the byte offset just after the value. Passing that offset
+    and container back as ``position`` / ``container`` resumes with the
+    next member.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    with open(path, "rb") as f:
+        f.seek(position)
+        buf = ""
+        i = 0  # index into buf
+        pos = position  # byte offset of buf[i]
+        eof = False
+
+        def fill() -> bool:
+            nonlocal buf, i, eof
+            if eof:
+                return False
+            if i > chunk_size:
+                buf, i = buf[i:], 0  # drop what has been consumed
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf += utf8.decode(chunk, final=eof)
+            if len(buf) - i > MAX_RECORD_SIZE:
+                raise JsonStreamError(f"{path}: record at byte {pos} is larger than {MAX_RECORD_SIZE} bytes")
+            return True
+
+        def advance(n: int) -> None:
+            nonlocal i, pos
+            pos += len(buf[i:i + n].encode())
+            i += n
+
+        def next_char() -> str:
+            # Skip whitespace (always ASCII) and return the next character without consuming it.
+            nonlocal i, pos
+            while True:
+                end = _WS.match(buf, i).end()
+                pos += end - i
+                i = end
+                if i < len(buf):
+                    return buf[i]
+                if not fill():
+                    raise JsonStreamError(f"{path}: unexpected end of file at byte {pos}")
+
+        def value() -> Any:
+            while True:
+                try:
+                    result, end = decoder.raw_decode(buf, i)
+                except json.JSONDecodeError as e:
+                    if fill():
+                        continue
+                    raise JsonStreamError(f"{path}: invalid JSON at byte {pos}: {e.msg}") from None
+                # A number cut off by the chunk boundary decodes fine; make sure it ended.
+                if end == len(buf) and fill():
+                    continue
+                advance(end - i)
+                return result
+
+        if container is None:
+            if next_char() == "﻿":
+                advance(1)
+            container = next_char()
+            if container not in "{[":
+                raise JsonStreamError(f"{path}: expected a JSON object or array at byte {pos}")
+            advance(1)
+            first = True
+        else:
+            first = False
+        close = "}" if container == "{" else "]"
+
+        while True:
+            c = next_char()
+            if c == close:
+                return
+            if not first:
+                if c != ",":
+                    raise JsonStreamError(f"{path}: expected ',' or {close!r} at byte {pos}")
+                advance(1)
+                next_char()
+            first = False
+            key = None
+            if container == "{":
+                key = value()
+                if not isinstance(key, str) or next_char() != ":":
+                    raise JsonStreamError(f"{path}: expected a member name at byte {pos}")
+                advance(1)
+                next_char()
+            yield key, value(), container, pos
+
+
+# --- record conversion ---
+
+def legacy_player(key: str | None, record: Any, run_state: Any = None) -> Player:
+    """Build a ``Player`` from a legacy record (and its run-state overlay); raises ValueError/KeyError."""
+    if not isinstance(record, dict):
+        raise ValueError("record is not an object")
+    data = {FIELD_ALIASES.get(name, name): field for name, field in record.items()}
+    if run_state is not None:
+        if not isinstance(run_state, dict):
+            raise ValueError("run state is not an object")
+        data.update((FIELD_ALIASES.get(name, name), field) for name, field in run_state.items())
+    if key is not None:
+        if "user_id" in data and str(data["user_id"]) != key:
+            raise ValueError(f"user_id {data['user_id']!r} does not match its key")
+        data["user_id"] = key
+    user_id = data.get("user_id")
+    if isinstance(user_id, str) and user_id.isdigit():
+        data["user_id"] = user_id = int(user_id)
+    if not isinstance(user_id, int) or isinstance(user_id, bool) or user_id <= 0:
+        raise ValueError(f"invalid user_id {user_id!r}")
+    for field in INT_FIELDS:
+        number = data.get(field)
+        if number is not None and (not isinstance(number, int) or isinstance(number, bool) or number < 0):
+            raise ValueError(f"{field} must be a non-negative integer, got {number!r}")
+    for field in ID_FIELDS:
+        snowflake = data.get(field)
+        if isinstance(snowflake, str) and snowflake.isdigit():
+            data[field] = int(snowflake)
+        elif snowflake is not None and (not isinstance(snowflake, int) or isinstance(snowflake, bool)):
+            raise ValueError(f"{field} must be an id, got {snowflake!r}")
+    if not isinstance(data.get("inventory", []), list):
+        raise ValueError("inventory is not a list")
+    if not isinstance(data.get("equipped_items") or {}, dict):
+        raise ValueError("equipped_items is not an object")
+    player = Player.from_dict(data)
+    player.hp = min(player.hp, player.max_hp)
+    if player.in_combat and player.current_monster is None:
+        player.in_combat = False  # nothing to fight; the bot would reset it on the next command
+    return player
+
+
+# --- migration ---
+
+class Migration:
+    """One run of the two passes against a work database (see the module docstring)."""
+
+    def __init__(
+        self,
+        player_file: str = config.PLAYER_DATA_FILE,
+        dungeon_file: str = config.DUNGEON_DATA_FILE,
+        db_path: str = config.DATABASE_FILE,
+        state_file: str = config.MIGRATION_STATE_FILE,
+        *,
+        batch_size: int = config.MIGRATION_BATCH_SIZE,
+        dry_run: bool = False,
+        restart: bool = False,
+        progress_interval: float = 5.0,
+    ) -> None:
+        self.player_file = player_file
+        self.dungeon_file = dungeon_file
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.progress_interval = progress_interval
+        self.errors: list[str] = []
+        self.records_read = self.bytes_read = 0  # this run, both files
+        self._tmp: tempfile.TemporaryDirectory[str] | None = None
+        if dry_run:
+            # Never touch the real work database or the store.
+            self._tmp = tempfile.TemporaryDirectory(prefix="legacy-migration-")
+            state_file = os.path.join(self._tmp.name, "state.db")
+            self.store = DataManager(db_path) if os.path.exists(db_path) else None
+        else:
+            self.store = DataManager(db_path)
+        directory = os.path.dirname(state_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.work = sqlite3.connect(state_file, isolation_level=None)
+        self.work.execute("PRAGMA journal_mode=WAL")
+        self.work.executescript(_WORK_SCHEMA)
+        if restart:
+            self.work.execute("DELETE FROM checkpoints")
+            self.work.execute("DELETE FROM dungeon")
+
+    def close(self) -> None:
+        self.work.close()
+        if self.store is not None:
+            self.store._close()
+        if self._tmp is not None:
+            self._tmp.cleanup()
+
+    # --- checkpoints ---
+
+    @staticmethod
+    def _fingerprint(path: str) -> str:
+        st = os.stat(path)
+        return f"{st.st_size}:{st.st_mtime_ns}"
+
+    def _checkpoint(self, source: str, path: str) -> tuple[str | None, int, bool, dict[str, float]]:
+        """(container, position, done, stats) to resume ``source`` from."""
+        row = self.work.execute(
+            "SELECT fingerprint, container, position, done, stats FROM checkpoints WHERE source = ?", (source,)
+        ).fetchone()
+        if row is None:
+            return None, 0, False, {}
+        fingerprint, container, position, done, stats = row
+        if fingerprint != self._fingerprint(path):
+            raise SystemExit(f"{path} changed since the interrupted run; rerun with --restart to start over")
+        return container, position, bool(done), json.loads(stats)
+
+    def _save_checkpoint(self, source: str, path: str, container: str | None, position: int, done: bool, stats: dict[str, float]) -> None:
+        self.work.execute(
+            "INSERT OR REPLACE INTO checkpoints (source, fingerprint, container, position, done, stats) VALUES (?, ?, ?, ?, ?, ?)",
+            (source, self._fingerprint(path), container, position, int(done), json.dumps(stats)),
+        )
+
+    # --- passes ---
+
+    def _error(self, path: str, position: int, message: str) -> None:
+        if len(self.errors) < MAX_ERRORS_SHOWN:
+            self.errors.append(f"{os.path.basename(path)} @ byte {position}: {message}")
+
+    def _progress(self, label: str, path: str, position: int, records: int, started: float, resumed_at: int) -> None:
+        elapsed = time.perf_counter() - started
+        size = os.path.getsize(path)
+        print(
+            f"{label}: {records} records, {position / size:.1%} of {size / 2**20:.1f} MiB, "
+            f"{(position - resumed_at) / 2**20 / elapsed if elapsed else 0:.1f} MiB/s"
+        )
+
+    def stage_dungeon(self) -> dict[str, float]:
+        """Pass 1: copy each user's run state into the work database."""
+        path = self.dungeon_file
+        if not os.path.exists(path):
+            return {"records": 0, "invalid": 0}
+        container, position, done, stats = self._checkpoint("dungeon", path)
+        stats = {"records": 0, "invalid": 0, **stats}
+        if done:
+            return stats
+        started = last_report = time.perf_counter()
+        resumed_at = position
+        rows: list[tuple[int, str]] = []
+
+        def commit(end: int, finished: bool) -> None:
+            self.work.execute("BEGIN IMMEDIATE")
+            self.work.executemany("INSERT OR REPLACE INTO dungeon (user_id, data) VALUES (?, ?)", rows)
+            self._save_checkpoint("dungeon", path, container, end, finished, stats)
+            self.work.execute("COMMIT")
+            rows.clear()
+
+        for key, record, container, end in iter_json_entries(path, position, container):
+            stats["records"] += 1
+            self.records_read += 1
+            user_id = key if key is not None else (record.get("user_id") if isinstance(record, dict) else None)
+            if isinstance(user_id, str) and user_id.isdigit():
+                user_id = int(user_id)
+            if not isinstance(user_id, int) or not isinstance(record, dict):
+                stats["invalid"] += 1
+                self._error(path, end, "run state without a user id, or not an object")
+            else:
+                rows.append((user_id, json.dumps(record, ensure_ascii=False)))
+            position = end
+            if len(rows) >= self.batch_size:
+                commit(end, False)
+            if time.perf_counter() - last_report >= self.progress_interval:
+                last_report = time.perf_counter()
+                self._progress("dungeon", path, position, int(stats["records"]), started, resumed_at)
+        commit(position, True)
+        self.bytes_read += position - resumed_at
+        return stats
+
+    def import_players(self) -> dict[str, float]:
+        """Pass 2: merge, convert and store players a batch at a time."""
+        path = self.player_file
+        container, position, done, stats = self._checkpoint("players", path)
+        stats = {"records": 0, "imported": 0, "existing": 0, "invalid": 0, "with_run_state": 0, **stats}
+        if done:
+            return stats
+        started = last_report = time.perf_counter()
+        resumed_at = position
+        batch: list[tuple[str | None, Any, int]] = []
+
+        def flush(end: int, finished: bool) -> None:
+            keyed = {}
+            for key, record, at in batch:
+                user_id = key if key is not None else (record.get("user_id") if isinstance(record, dict) else None)
+                if user_id is not None:
+                    keyed[str(user_id)] = None
+            numeric = [int(user_id) for user_id in keyed if user_id.isdigit()]
+            run_states = {
+                str(user_id): json.loads(data)
+                for user_id, data in self.work.execute(
+                    f"SELECT user_id, data FROM dungeon WHERE user_id IN ({','.join('?' * len(numeric))})", numeric
+                )
+            } if numeric else {}
+            players: list[Player] = []
+            for key, record, at in batch:
+                user_id = key if key is not None else (record.get("user_id") if isinstance(record, dict) else None)
+                run_state = run_states.get(str(user_id))
+                stats["with_run_state"] += run_state is not None
+                try:
+                    players.append(legacy_player(key, record, run_state))
+                except (ValueError, KeyError, TypeError) as e:
+                    stats["invalid"] += 1
+                    self._error(path, at, f"user {user_id}: {e!r}" if user_id is not None else repr(e))
+                    continue
+            imported = self.store.import_players(players, dry_run=self.dry_run) if self.store is not None else players
+            stats["imported"] += len(imported)
+            stats["existing"] += len(players) - len(imported)
+            self.work.execute("BEGIN IMMEDIATE")
+            self._save_checkpoint("players", path, container, end, finished, stats)
+            self.work.execute("COMMIT")
+            batch.clear()
+
+        for key, record, container, end in iter_json_entries(path, position, container):
+            stats["records"] += 1
+            self.records_read += 1
+            batch.append((key, record, end))
+            position = end
+            if len(batch) >= self.batch_size:
+                flush(end, False)
+            if time.perf_counter() - last_report >= self.progress_interval:
+                last_report = time.perf_counter()
+                self._progress("players", path, position, int(stats["records"]), started, resumed_at)
+        flush(position, True)
+        self.bytes_read += position - resumed_at
+        return stats
+
+    def run(self) -> dict[str, dict[str, float]]:
+        if not os.path.exists(self.player_file):
+            raise SystemExit(f"{self.player_file} not found")
+        started = time.perf_counter()
+        dungeon = self.stage_dungeon()
+        players = self.import_players()
+        staged = self.work.execute("SELECT COUNT(*) FROM dungeon").fetchone()[0]
+        elapsed = time.perf_counter() - started
+        total = {
+            "seconds": elapsed,
+            "records_per_sec": self.records_read / elapsed if elapsed else 0.0,
+            "mib_per_sec": self.bytes_read / 2**20 / elapsed if elapsed else 0.0,
+            "run_states_without_player": max(0, staged - players["with_run_state"]),
+            "peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else 0.0,
+        }
+        return {"dungeon": dungeon, "players": players, "total": total}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Stream the legacy JSON saves into the SQLite store.")
+    parser.add_argument("--players", default=config.PLAYER_DATA_FILE, help="legacy player file")
+    parser.add_argument("--dungeon", default=config.DUNGEON_DATA_FILE, help="legacy run-state file (optional)")
+    parser.add_argument("--db", default=config.DATABASE_FILE, help="target SQLite store")
+    parser.add_argument("--state", default=config.MIGRATION_STATE_FILE, help="work database with checkpoints")
+    parser.add_argument("--batch-size", type=int, default=config.MIGRATION_BATCH_SIZE, help="records per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="parse and validate only; write nothing")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoints and start from the top")
+    args = parser.parse_args(argv)
+
+    migration = Migration(
+        args.players, args.dungeon, args.db, args.state,
+        batch_size=args.batch_size, dry_run=args.dry_run, restart=args.restart,
+    )
+    try:
+        report = migration.run()
+    except JsonStreamError as e:
+        raise SystemExit(f"Migration stopped (resume after fixing the file, or --restart): {e}")
+    finally:
+        migration.close()
+
+    players, dungeon, total = report["players"], report["dungeon"], report["total"]
+    if not migration.records_read:
+        print("Both files were already migrated by an earlier run (--restart to run again).")
+    verb = "would import" if args.dry_run else "imported"
+    print(
+        f"{'Dry run: ' if args.dry_run else ''}{int(players['records'])} player records, {verb} {int(players['imported'])}, "
+        f"{int(players['existing'])} already stored, {int(players['invalid'])} invalid; "
+        f"{int(dungeon['records'])} run-state records ({int(dungeon['invalid'])} invalid, "
+        f"{int(total['run_states_without_player'])} without a player)"
+    )
+    print(
+        f"{total['seconds']:.1f}s this run, {total['records_per_sec']:.0f} records/s, {total['mib_per_sec']:.1f} MiB/s, "
+        f"peak RSS {total['peak_rss_mib']:.1f} MiB"
+    )
+    for error in migration.errors:
+        print(f"  {error}")
+    if players["invalid"] > len(migration.errors):
+        print(f"  ... and {int(players['invalid']) - len(migration.errors)} more")
+    if args.dry_run and players["invalid"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
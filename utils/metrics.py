@@ -0,0 +1,310 @@
+"""Per-command latency breakdown and the Prometheus ``/metrics`` page.
+
+``InstrumentedTree`` (the bot's command tree) opens a ``CommandTimings``
+for every app command and closes it when the command completes or fails.
+While it is open, code anywhere below the command can attribute time to a
+phase with ``phase(name)``, ``timed(name, awaitable)`` or the
+``timed_phase(name)`` decorator; the current command is found through a
+context variable, so ``DataManager`` and ``PlayerLocks`` need no reference
+to it and are not slowed down outside a command.
+
+Phases recorded per command:
+
+* ``defer`` / ``response`` - the interaction defer and the replies
+* ``thread`` - thread creation and thread messages (channel traffic, queued
+  by the outbound scheduler)
+* ``lock`` - waiting for the player's lock
+* ``load`` / ``save`` - ``DataManager.load_player_data`` / ``save_player_data``
+* ``logic`` - everything else in the handler: game rules, embed building
+* ``total`` - the whole command
+
+Each (command, phase) pair keeps a log-bucketed histogram, exported as a
+Prometheus summary with p50/p95/p99 next to the player-cache, thread-cache,
+outbound-queue, session-sweeper, content-catalog and gateway-latency gauges
+(``render_prometheus``).
+``merge_prometheus`` combines the pages of several cluster workers.
+"""
+from __future__ import annotations
+
+import bisect
+import contextvars
+import functools
+import math
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Iterator, TypeVar
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from models import catalog
+
+T = TypeVar("T")
+
+QUANTILES: tuple[float, ...] = (0.5, 0.95, 0.99)
+MEASURED_PHASES: tuple[str, ...] = ("defer", "lock", "load", "save", "response", "thread")
+
+# Bucket upper bounds: 50µs to ~100s, four buckets per doubling (≈19% wide).
+_BOUNDS: tuple[float, ...] = tuple(50e-6 * 2 ** (i / 4) for i in range(84))
+
+
+class Histogram:
+    """Fixed log-scale buckets; quantiles are interpolated within a bucket."""
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(_BOUNDS) + 1)  # last bucket: above _BOUNDS[-1]
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return math.nan
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                low = _BOUNDS[i - 1] if i else 0.0
+                high = _BOUNDS[i] if i < len(_BOUNDS) else self.max
+                return min(low + (high - low) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+
+class CommandTimings:
+    """Phase durations of one running command."""
+    __slots__ = ("command", "start", "phases", "done")
+
+    def __init__(self, command: str) -> None:
+        self.command = command
+        self.start = time.perf_counter()
+        self.phases = dict.fromkeys(MEASURED_PHASES, 0.0)
+        self.done = False
+
+    def add(self, name: str, seconds: float) -> None:
+        # Tasks spawned by the command (delayed edits, ...) inherit the context
+        # variable; their work after the command finished is not the command's.
+        if not self.done:
+            self.phases[name] += seconds
+
+
+_current: contextvars.ContextVar[CommandTimings | None] = contextvars.ContextVar("command_timings", default=None)
+
+
+def current_command() -> str | None:
+    """Name of the app command running in this context, if any."""
+    timings = _current.get()
+    return timings.command if timings is not None and not timings.done else None
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Attribute the time spent in the block to ``name`` of the current command, if any."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+async def timed(name: str, awaitable: Awaitable[T]) -> T:
+    """``await awaitable``, attributing the wait to ``name``."""
+    with phase(name):
+        return await awaitable
+
+
+def timed_phase(name: str) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+    """Decorator form of ``phase`` for coroutine functions."""
+    def decorator(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            with phase(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class CommandMetrics:
+    """Histograms per (command, phase) and outcome counters per command."""
+
+    def __init__(self) -> None:
+        self.histograms: dict[tuple[str, str], Histogram] = {}
+        self.completed: dict[str, int] = {}
+        self.failed: dict[str, int] = {}
+
+    def begin(self, command: str) -> CommandTimings:
+        timings = CommandTimings(command)
+        _current.set(timings)
+        return timings
+
+    def finish(self, timings: CommandTimings, *, failed: bool = False) -> None:
+        if timings.done:
+            return
+        timings.done = True
+        total = time.perf_counter() - timings.start
+        self._observe(timings.command, "total", total)
+        for name, seconds in timings.phases.items():
+            self._observe(timings.command, name, seconds)
+        self._observe(timings.command, "logic", max(0.0, total - sum(timings.phases.values())))
+        outcomes = self.failed if failed else self.completed
+        outcomes[timings.command] = outcomes.get(timings.command, 0) + 1
+
+    def _observe(self, command: str, name: str, seconds: float) -> None:
+        histogram = self.histograms.get((command, name))
+        if histogram is None:
+            histogram = self.histograms[(command, name)] = Histogram()
+        histogram.observe(seconds)
+
+
+class InstrumentedTree(app_commands.CommandTree):
+    """Command tree that times every app command into ``client.metrics``.
+
+    Pass it as ``commands.Bot(..., tree_cls=InstrumentedTree)``.
+    """
+
+    def __init__(self, client: commands.Bot, *args: Any, **kwargs: Any) -> None:
+        super().__init__(client, *args, **kwargs)
+        client.add_listener(self.on_app_command_completion)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # Runs in the same task as the command, right before its callback.
+        metrics: CommandMetrics | None = getattr(self.client, "metrics", None)
+        # Autocomplete requests pass through here too but never complete; only commands are timed.
+        if metrics is not None and interaction.command is not None and interaction.type is discord.InteractionType.application_command:
+            interaction.extras["timings"] = metrics.begin(interaction.command.qualified_name)
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError, /) -> None:
+        self._finish(interaction, failed=True)
+        await super().on_error(interaction, error)
+
+    async def on_app_command_completion(self, interaction: discord.Interaction, command: Any) -> None:
+        self._finish(interaction)
+
+    def _finish(self, interaction: discord.Interaction, *, failed: bool = False) -> None:
+        timings = interaction.extras.get("timings")
+        if timings is not None:
+            self.client.metrics.finish(timings, failed=failed)
+
+
+# --- Prometheus text format ---
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def _family(lines: list[str], name: str, kind: str, help_text: str) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def _gauges(lines: list[str], prefix: str, help_text: str, stats: dict[str, float], counters: tuple[str, ...] = ()) -> None:
+    for key, value in stats.items():
+        name = f"{prefix}_{key}_total" if key in counters else f"{prefix}_{key}"
+        _family(lines, name, "counter" if key in counters else "gauge", f"{help_text} ({key})")
+        lines.append(f"{name} {_number(value)}")
+
+
+def render_prometheus(bot: commands.Bot) -> str:
+    """All bot metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines: list[str] = []
+    metrics: CommandMetrics = bot.metrics
+
+    _family(lines, "dungeon_command_seconds", "summary", "App command latency by phase.")
+    for (command, name), histogram in sorted(metrics.histograms.items()):
+        labels = {"command": command, "phase": name}
+        for q in QUANTILES:
+            lines.append(f"dungeon_command_seconds{_labels({**labels, 'quantile': str(q)})} {_number(histogram.quantile(q))}")
+        lines.append(f"dungeon_command_seconds_sum{_labels(labels)} {_number(histogram.sum)}")
+        lines.append(f"dungeon_command_seconds_count{_labels(labels)} {histogram.count}")
+    _family(lines, "dungeon_commands_total", "counter", "App commands run, by outcome.")
+    for outcome, counts in (("completed", metrics.completed), ("failed", metrics.failed)):
+        for command, count in sorted(counts.items()):
+            lines.append(f"dungeon_commands_total{_labels({'command': command, 'outcome': outcome})} {count}")
+
+    _gauges(lines, "dungeon_player_cache", "Player identity map", bot.data_manager.cache.stats(),
+            counters=("hits", "misses", "evictions"))
+    _gauges(lines, "dungeon_writer", "Group-commit writer", bot.data_manager.write_stats(),
+            counters=("commits", "records_committed", "stale_reloads", "write_conflicts", "snapshots", "journal_entries", "journal_bytes"))
+    thread_stats = bot.thread_resolver.stats()
+    lookups = thread_stats["hits"] + thread_stats["gateway_hits"] + thread_stats["negative_hits"] + thread_stats["fetches"]
+    thread_stats["hit_rate"] = (lookups - thread_stats["fetches"]) / lookups if lookups else 0.0
+    _gauges(lines, "dungeon_thread_cache", "Adventure thread resolver", thread_stats,
+            counters=("hits", "gateway_hits", "negative_hits", "fetches", "unarchives", "archives"))
+    _gauges(lines, "dungeon_outbound", "Outbound REST scheduler", bot.outbound.stats(),
+            counters=("sent", "failed", "superseded", "rate_limited", "library_rate_limited"))
+    _gauges(lines, "dungeon_session_sweeper", "Idle-session sweeper", bot.session_sweeper.stats(),
+            counters=("sweeps", "players_evicted", "threads_archived", "combat_cleared", "bytes_reclaimed"))
+
+    content = catalog.current()
+    _family(lines, "dungeon_content_info", "gauge", "Installed game content version (hash of content/).")
+    lines.append(f"dungeon_content_info{_labels({'version': content.version})} 1")
+    _gauges(lines, "dungeon_content", "Game content catalog",
+            {"load_seconds": content.load_seconds, "items": len(content.items), "monsters": len(content.monsters)})
+
+    _family(lines, "dungeon_gateway_latency_seconds", "gauge", "Gateway heartbeat latency.")
+    lines.append(f"dungeon_gateway_latency_seconds {_number(bot.latency)}")
+    return "\n".join(lines) + "\n"
+
+
+def merge_prometheus(pages: dict[str, str], label: str = "cluster") -> str:
+    """Combine pages from several processes, tagging each sample with ``label="<key>"``.
+
+    Samples of one metric family stay together under a single HELP/TYPE
+    header, as the exposition format requires.
+    """
+    families: dict[str, tuple[list[str], list[str]]] = {}  # name -> (header lines, samples)
+    for key, page in pages.items():
+        tag = f'{label}="{_escape(key)}"'
+        current: tuple[list[str], list[str]] | None = None
+        for line in page.splitlines():
+            if line.startswith("# "):
+                parts = line.split(" ", 3)
+                if len(parts) < 3 or parts[1] not in ("HELP", "TYPE"):
+                    continue
+                current = families.setdefault(parts[2], ([], []))
+                if not any(header.startswith(f"# {parts[1]} ") for header in current[0]):
+                    current[0].append(line)
+                continue
+            if not line or current is None:
+                continue
+            brace = line.find("{")
+            space = line.find(" ")
+            if 0 <= brace < space:
+                rest = line[brace + 1:]
+                line = f"{line[:brace + 1]}{tag}{'' if rest.startswith('}') else ','}{rest}"
+            else:
+                line = f"{line[:space]}{{{tag}}}{line[space:]}"
+            current[1].append(line)
+    lines: list[str] = []
+    for headers, samples in families.values():
+        lines.extend(headers)
+        lines.extend(samples)
+    return "\n".join(lines) + "\n" if lines else ""
@@ -0,0 +1,282 @@
+"""Central, priority-aware queue for outbound Discord REST calls.
+
+Cogs hand their sends and edits to ``OutboundScheduler.call`` (or
+``submit``) with a route and a priority instead of awaiting
+``thread.send``/``message.edit`` directly:
+
+* One queue per route (a channel, or an interaction's webhook), drained in
+  priority order by its own worker, so a busy thread cannot hold up
+  another player's replies and sends to one channel stay in order.
+* A global gate caps requests in flight; when it is full the highest
+  priority waiter goes next, so interaction replies overtake adventure-log
+  edits.
+* An edit that is still queued when a newer edit for the same message
+  arrives is replaced rather than sent twice.
+* 429s are retried after ``retry_after`` and counted, together with the
+  ones discord.py absorbs internally (seen through its ``discord.http``
+  log), and time spent queued is recorded per priority.
+
+Short ephemeral error replies skip the queue entirely and are still sent
+directly by the cogs.
+"""
+from __future__ import annotations
+
+import asyncio
+import enum
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+import discord
+
+import config
+
+T = TypeVar("T")
+Route = Hashable
+
+
+class Priority(enum.IntEnum):
+    INTERACTION = 0  # follow-ups the player is waiting on
+    MESSAGE = 1  # new thread messages (encounters, welcome)
+    LOG = 2  # adventure-log edits; fine to delay or merge
+
+
+def channel_route(channel_id: int) -> Route:
+    return ("channel", channel_id)
+
+
+def interaction_route(interaction: discord.Interaction) -> Route:
+    return ("webhook", interaction.token)
+
+
+class _Job:
+    __slots__ = ("priority", "seq", "request", "future", "supersede", "enqueued", "started")
+
+    def __init__(
+        self, priority: Priority, seq: int, request: Callable[[], Awaitable[Any]], future: asyncio.Future[Any],
+        supersede: Hashable | None,
+    ) -> None:
+        self.priority = priority
+        self.seq = seq
+        self.request = request
+        self.future = future
+        self.supersede = supersede
+        self.enqueued = time.monotonic()
+        self.started = False
+
+    def __lt__(self, other: _Job) -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class _QueueTimes:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+
+class _RateLimitLog(logging.Handler):
+    """Counts the 429s discord.py retries by itself (it only logs them)."""
+
+    def __init__(self, scheduler: OutboundScheduler) -> None:
+        super().__init__(logging.WARNING)
+        self.scheduler = scheduler
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if "rate limit" in str(record.msg):
+            self.scheduler.library_rate_limited += 1
+
+
+class OutboundScheduler:
+    """Per-route priority queues behind a global in-flight limit."""
+
+    def __init__(
+        self,
+        max_in_flight: int = config.OUTBOUND_MAX_IN_FLIGHT,
+        max_retries: int = config.OUTBOUND_MAX_RETRIES,
+        watch_library_log: bool = True,
+    ) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self._seq = itertools.count()
+        self._queues: dict[Route, list[_Job]] = {}
+        self._workers: dict[Route, asyncio.Task[None]] = {}
+        self._queued_by_key: dict[Hashable, _Job] = {}
+        self._in_flight = 0
+        self._gate_waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self.sent = 0
+        self.failed = 0
+        self.superseded = 0
+        self.rate_limited = 0  # 429s that reached us and were retried here
+        self.library_rate_limited = 0  # 429s discord.py handled internally
+        self.queue_times = {priority: _QueueTimes() for priority in Priority}
+        self._log_handler: _RateLimitLog | None = None
+        if watch_library_log:
+            self._log_handler = _RateLimitLog(self)
+            logging.getLogger("discord.http").addHandler(self._log_handler)
+
+    # --- submitting ---
+
+    def submit(
+        self,
+        route: Route,
+        request: Callable[[], Awaitable[T]],
+        *,
+        priority: Priority = Priority.MESSAGE,
+        supersede: Hashable | None = None,
+    ) -> asyncio.Future[T]:
+        """Queue ``request`` (a zero-argument coroutine factory) and return a future for its result.
+
+        With a ``supersede`` key (e.g. ``("edit", message_id)``), a job with the
+        same key that has not started yet gets this request instead, keeping
+        its place in the queue; both callers receive the one result.
+        """
+        if supersede is not None:
+            queued = self._queued_by_key.get(supersede)
+            if queued is not None and not queued.started:
+                queued.request = request
+                self.superseded += 1
+                return queued.future
+
+        future: asyncio.Future[T] = asyncio.get_running_loop().create_future()
+        job = _Job(priority, next(self._seq), request, future, supersede)
+        if supersede is not None:
+            self._queued_by_key[supersede] = job
+        heapq.heappush(self._queues.setdefault(route, []), job)
+        if route not in self._workers:
+            self._workers[route] = asyncio.create_task(self._drain_route(route))
+        return future
+
+    async def call(
+        self,
+        route: Route,
+        request: Callable[[], Awaitable[T]],
+        *,
+        priority: Priority = Priority.MESSAGE,
+        supersede: Hashable | None = None,
+    ) -> T:
+        """``submit`` and wait. Cancelling the caller does not cancel the send."""
+        return await asyncio.shield(self.submit(route, request, priority=priority, supersede=supersede))
+
+    # --- draining ---
+
+    async def _drain_route(self, route: Route) -> None:
+        queue = self._queues[route]
+        try:
+            while queue:
+                # Take the job only once we hold a slot: a worker cancelled while
+                # waiting (close()) leaves it queued, where close() cancels its future.
+                await self._acquire(queue[0].priority)
+                try:
+                    job = heapq.heappop(queue)
+                    # Until now a newer edit could still replace this job's request.
+                    job.started = True
+                    if job.supersede is not None and self._queued_by_key.get(job.supersede) is job:
+                        del self._queued_by_key[job.supersede]
+                    self.queue_times[job.priority].add(time.monotonic() - job.enqueued)
+                    try:
+                        result = await self._send(job)
+                    except asyncio.CancelledError:
+                        job.future.cancel()  # don't leave call() waiting forever
+                        raise
+                    except Exception as e:
+                        self.failed += 1
+                        if not job.future.done():
+                            job.future.set_exception(e)
+                    else:
+                        self.sent += 1
+                        if not job.future.done():
+                            job.future.set_result(result)
+                finally:
+                    self._release()
+        finally:
+            del self._queues[route]
+            del self._workers[route]
+
+    async def _send(self, job: _Job) -> Any:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await job.request()
+            except (discord.RateLimited, discord.HTTPException) as e:
+                retry_after = _retry_after(e)
+                if retry_after is None or attempt == self.max_retries:
+                    raise
+                self.rate_limited += 1
+                await asyncio.sleep(retry_after)
+
+    async def _acquire(self, priority: Priority) -> None:
+        if self._in_flight < self.max_in_flight and not self._gate_waiters:
+            self._in_flight += 1
+            return
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._gate_waiters, (priority, next(self._seq), waiter))
+        try:
+            await waiter  # the slot is handed over by _release
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()  # handed over just as we were cancelled: pass it on
+            raise
+
+    def _release(self) -> None:
+        while self._gate_waiters:
+            _, _, waiter = heapq.heappop(self._gate_waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
+
+    # --- lifecycle and stats ---
+
+    async def drain(self) -> None:
+        """Wait until everything queued so far has been sent."""
+        while self._workers:
+            await asyncio.gather(*self._workers.values(), return_exceptions=True)
+
+    def close(self) -> None:
+        for queue in self._queues.values():
+            for job in queue:
+                job.future.cancel()
+        for task in self._workers.values():
+            task.cancel()
+        self._gate_waiters.clear()  # their workers were just cancelled
+        if self._log_handler is not None:
+            logging.getLogger("discord.http").removeHandler(self._log_handler)
+            self._log_handler = None
+
+    def stats(self) -> dict[str, float]:
+        stats: dict[str, float] = {
+            "queued": sum(len(q) for q in self._queues.values()),
+            "in_flight": self._in_flight,
+            "sent": self.sent,
+            "failed": self.failed,
+            "superseded": self.superseded,
+            "rate_limited": self.rate_limited,
+            "library_rate_limited": self.library_rate_limited,
+        }
+        for priority, times in self.queue_times.items():
+            name = priority.name.lower()
+            stats[f"{name}_queue_mean_s"] = times.total / times.count if times.count else 0.0
+            stats[f"{name}_queue_max_s"] = times.max
+        return stats
+
+
+def _retry_after(error: Exception) -> float | None:
+    """Seconds to wait if ``error`` is a 429, else None."""
+    if isinstance(error, discord.RateLimited):
+        return error.retry_after
+    if isinstance(error, discord.HTTPException) and error.status == 429:
+        try:
+            return float(error.response.headers.get("Retry-After", 1.0))
+        except (AttributeError, TypeError, ValueError):
+            return 1.0
+    return None
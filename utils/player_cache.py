@@ -0,0 +1,117 @@
+"""Bounded identity map of loaded players."""
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Iterator
+
+from models.player import Player
+
+
+class PlayerCache:
+    """LRU map from user id to the single live ``Player`` object for that user.
+
+    Every cog shares one instance (owned by the bot's ``DataManager``), so a
+    burst of commands from one user reuses the same object instead of decoding
+    the player again. It also records when each player was last used, for
+    the idle-session sweeper (``utils/session_sweeper.py``).
+    """
+
+    def __init__(self, capacity: int) -> None:
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._players: OrderedDict[int, Player] = OrderedDict()
+        self._last_used: dict[int, float] = {}  # monotonic; same order as ``_players``
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._players
+
+    def __iter__(self) -> Iterator[Player]:
+        return iter(list(self._players.values()))
+
+    def get(self, user_id: int) -> Player | None:
+        """Return the cached player and mark it most recently used."""
+        player = self._players.get(user_id)
+        if player is None:
+            self.misses += 1
+            return None
+        self._players.move_to_end(user_id)
+        self._last_used[user_id] = time.monotonic()
+        self.hits += 1
+        return player
+
+    def peek(self, user_id: int) -> Player | None:
+        """Return the cached player without touching recency or counters."""
+        return self._players.get(user_id)
+
+    def put(self, player: Player) -> None:
+        """Make ``player`` the live object for its user, replacing any other."""
+        self._players[player.user_id] = player
+        self._players.move_to_end(player.user_id)
+        self._last_used[player.user_id] = time.monotonic()
+        self._evict()
+
+    def setdefault(self, player: Player) -> Player:
+        """Insert ``player`` only if its user is not cached; return the live object."""
+        cached = self._players.get(player.user_id)
+        if cached is not None:
+            self._players.move_to_end(player.user_id)
+            self._last_used[player.user_id] = time.monotonic()
+            return cached
+        self.put(player)
+        return player
+
+    def _evict(self) -> None:
+        while len(self._players) > self.capacity:
+            user_id, _ = self._players.popitem(last=False)
+            del self._last_used[user_id]
+            self.evictions += 1
+
+    def pop(self, user_id: int) -> Player | None:
+        self._last_used.pop(user_id, None)
+        return self._players.pop(user_id, None)
+
+    def clear(self) -> None:
+        self._players.clear()
+        self._last_used.clear()
+
+    def idle_for(self, user_id: int) -> float | None:
+        """Seconds since the player was last used, or None if not cached."""
+        last_used = self._last_used.get(user_id)
+        return None if last_used is None else time.monotonic() - last_used
+
+    def idle(self, seconds: float) -> list[int]:
+        """Users not used for at least ``seconds``, least recently used first.
+
+        Recency order is also last-use order, so this stops at the first
+        recent entry instead of scanning the whole cache.
+        """
+        cutoff = time.monotonic() - seconds
+        idle: list[int] = []
+        for user_id in self._players:
+            if self._last_used[user_id] > cutoff:
+                break
+            idle.append(user_id)
+        return idle
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "size": len(self._players),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
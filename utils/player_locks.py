@@ -0,0 +1,80 @@
+"""Per-player serialization of state-changing commands."""
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from utils.metrics import phase
+
+
+class CommandInProgress(Exception):
+    """Raised when the same command is already running or queued for a player."""
+
+    def __init__(self, user_id: int, command: str) -> None:
+        super().__init__(f"{command} is already in progress for {user_id}")
+        self.user_id = user_id
+        self.command = command
+
+
+class _PlayerSlot:
+    __slots__ = ("lock", "users", "commands")
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        self.users = 0  # holders plus waiters
+        self.commands: Counter[str] = Counter()
+
+
+class PlayerLocks:
+    """Registry of one ``asyncio.Lock`` per user id.
+
+    Commands for different players never contend; commands for the same player
+    run one after another. A slot is dropped as soon as nobody holds or waits
+    on it, so the registry only grows with concurrently active players.
+    """
+
+    def __init__(self) -> None:
+        self._slots: dict[int, _PlayerSlot] = {}
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def is_busy(self, user_id: int) -> bool:
+        return user_id in self._slots
+
+    def in_flight(self, user_id: int, command: str) -> bool:
+        """True if ``command`` is running or queued for ``user_id``."""
+        slot = self._slots.get(user_id)
+        return slot is not None and slot.commands[command] > 0
+
+    @asynccontextmanager
+    async def hold(self, user_id: int, command: str | None = None) -> AsyncIterator[None]:
+        """Run the block with exclusive access to ``user_id``'s state.
+
+        If ``command`` is given and the same command is already running or
+        queued for this user, ``CommandInProgress`` is raised immediately
+        instead of queueing a duplicate. Other commands wait their turn.
+        """
+        slot = self._slots.get(user_id)
+        if slot is None:
+            slot = self._slots[user_id] = _PlayerSlot()
+        elif command is not None and slot.commands[command] > 0:
+            raise CommandInProgress(user_id, command)
+        slot.users += 1
+        if command is not None:
+            slot.commands[command] += 1
+        try:
+            with phase("lock"):
+                await slot.lock.acquire()
+            try:
+                yield
+            finally:
+                slot.lock.release()
+        finally:
+            slot.users -= 1
+            if command is not None:
+                slot.commands[command] -= 1
+            if slot.users == 0:
+                del self._slots[user_id]
@@ -0,0 +1,230 @@
+"""Background sweep of idle sessions.
+
+Players who stop halfway through a run would otherwise stay in memory until
+the LRU cache happens to push them out, together with their monster, their
+adventure-log state and their ``Thread`` object, and their private thread
+stays open in the channel list. Every ``SESSION_SWEEP_INTERVAL`` seconds
+``SessionSweeper`` walks the idle end of the player cache (it is kept in
+last-use order, so the walk stops at the first recent player):
+
+* idle for ``THREAD_ARCHIVE_IDLE_SECONDS``: the adventure thread is
+  archived (``/m`` unarchives it again);
+* idle for ``SESSION_IDLE_SECONDS``: a stale ``in_combat`` flag without a
+  monster is cleared, queued saves are committed, the thread is archived
+  if it was not already, and the player, the cached thread and the
+  adventure-log state are dropped from memory. Cogs holding per-player
+  state hear about it through the ``on_player_idle(user_id)`` event.
+
+A player whose lock is held or awaited is left for the next sweep. Player
+locks are only held while a player is inspected; archiving happens after
+them, through ``bot.outbound`` at the lowest priority with at most
+``THREAD_ARCHIVE_CONCURRENCY`` requests queued, and is skipped for a player
+who came back in the meantime. Each sweep reports what it reclaimed: an
+estimate of the evicted objects' size and the process's resident memory
+(``stats``, ``/metrics``).
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import time
+from typing import Any
+
+from discord.ext import commands
+
+import config
+from models.player import Player
+from utils.data_manager import DataManager
+from utils.outbound import OutboundScheduler
+from utils.player_locks import PlayerLocks
+from utils.thread_resolver import ThreadResolver
+
+
+def resident_memory_bytes() -> int | None:
+    """Current resident set size, or None where ``/proc`` is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def player_footprint(player: Player) -> int:
+    """Approximate bytes owned by one player (item and monster definitions are shared, not counted)."""
+    size = sys.getsizeof(player) + sys.getsizeof(player.name) + sys.getsizeof(player.inventory)
+    size += sum(sys.getsizeof(item) for item in player.inventory)
+    size += sys.getsizeof(player.equipped_items)
+    size += sum(sys.getsizeof(item) for item in player.equipped_items.values() if item is not None)
+    if player.current_monster is not None:
+        size += sys.getsizeof(player.current_monster)
+    return size
+
+
+class SessionSweeper:
+    """Periodic idle-player eviction and thread archiving for one bot process."""
+
+    def __init__(
+        self,
+        bot: commands.Bot,
+        data_manager: DataManager,
+        player_locks: PlayerLocks,
+        thread_resolver: ThreadResolver,
+        outbound: OutboundScheduler,
+        *,
+        interval: float = config.SESSION_SWEEP_INTERVAL,
+        idle_seconds: float = config.SESSION_IDLE_SECONDS,
+        archive_seconds: float = config.THREAD_ARCHIVE_IDLE_SECONDS,
+        archive_concurrency: int = config.THREAD_ARCHIVE_CONCURRENCY,
+    ) -> None:
+        self.bot = bot
+        self.data_manager = data_manager
+        self.player_locks = player_locks
+        self.thread_resolver = thread_resolver
+        self.outbound = outbound
+        self.interval = interval
+        self.idle_seconds = idle_seconds
+        self.archive_seconds = min(archive_seconds, idle_seconds)  # never later than eviction
+        self.archive_concurrency = max(1, archive_concurrency)
+        self._task: asyncio.Task[None] | None = None
+        self.sweeps = 0
+        self.players_evicted = 0
+        self.threads_archived = 0
+        self.combat_cleared = 0
+        self.bytes_reclaimed = 0  # estimated, see player_footprint
+        self.last_sweep_seconds = 0.0
+
+    def start(self) -> None:
+        if self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._loop(), name="session-sweeper")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Failed to sweep idle sessions: {e}")
+
+    async def sweep(self) -> dict[str, float]:
+        """One pass over the idle players; returns what it did."""
+        start = time.perf_counter()
+        rss_before = resident_memory_bytes()
+        cache = self.data_manager.cache
+        to_archive: list[tuple[int, int]] = []  # (user id, thread id)
+        expired: list[int] = []
+        cleared: set[int] = set()  # saved by us, so no longer idle as far as the cache knows
+
+        for user_id in cache.idle(self.archive_seconds):
+            if self.player_locks.is_busy(user_id):
+                continue
+            async with self.player_locks.hold(user_id):
+                player = cache.peek(user_id)
+                idle_for = cache.idle_for(user_id)
+                if player is None or idle_for is None or idle_for < self.archive_seconds:
+                    continue  # used or evicted while we waited
+                if player.current_thread_id is not None:
+                    to_archive.append((user_id, player.current_thread_id))
+                if idle_for < self.idle_seconds:
+                    continue
+                if player.in_combat and player.current_monster is None:
+                    player.in_combat = False
+                    await self.data_manager.save_player_data(player)
+                    cleared.add(user_id)
+                expired.append(user_id)
+
+        # Outside the locks: a /m arriving now is not held up by our REST calls.
+        archived = await self._archive_all(to_archive)
+
+        # Commit their saves, then drop whoever is still idle and unlocked.
+        await self.data_manager.flush()
+        reclaimed = evicted = 0
+        for user_id in expired:
+            idle_for = cache.idle_for(user_id)
+            if self.player_locks.is_busy(user_id) or idle_for is None:
+                continue
+            if idle_for < self.idle_seconds and user_id not in cleared:
+                continue  # came back while the commit ran
+            player = self.data_manager.evict(user_id)
+            if player is None:
+                continue
+            evicted += 1
+            reclaimed += player_footprint(player)
+            if player.current_thread_id is not None:
+                self.thread_resolver.forget(player.current_thread_id)
+            self.bot.dispatch("player_idle", user_id)
+
+        # Let listeners drop their references before measuring.
+        await asyncio.sleep(0)
+        rss_after = resident_memory_bytes()
+        self.sweeps += 1
+        self.players_evicted += evicted
+        self.threads_archived += archived
+        self.combat_cleared += len(cleared)
+        self.bytes_reclaimed += reclaimed
+        self.last_sweep_seconds = time.perf_counter() - start
+        report = {
+            "evicted": evicted,
+            "archived": archived,
+            "combat_cleared": len(cleared),
+            "bytes_reclaimed": reclaimed,
+            "rss_before": rss_before or 0,
+            "rss_after": rss_after or 0,
+            "seconds": self.last_sweep_seconds,
+        }
+        if evicted or archived or cleared:
+            rss = f", RSS {rss_before / 2**20:.1f} -> {rss_after / 2**20:.1f} MiB" if rss_before and rss_after else ""
+            print(
+                f"Session sweep: evicted {evicted} idle player(s) (~{reclaimed / 1024:.1f} KiB), "
+                f"archived {archived} thread(s), cleared {len(cleared)} stale combat flag(s) "
+                f"in {self.last_sweep_seconds * 1000:.1f}ms{rss}"
+            )
+        return report
+
+    def _still_idle(self, user_id: int) -> bool:
+        if self.player_locks.is_busy(user_id):
+            return False
+        idle_for = self.data_manager.cache.idle_for(user_id)
+        return idle_for is None or idle_for >= self.archive_seconds  # None: evicted meanwhile, still idle
+
+    async def _archive_all(self, threads: list[tuple[int, int]]) -> int:
+        """Archive the collected threads, a few at a time; returns how many were archived now."""
+        slots = asyncio.Semaphore(self.archive_concurrency)
+
+        async def archive(user_id: int, thread_id: int) -> bool:
+            async with slots:
+                if not self._still_idle(user_id):
+                    return False
+                # A cache hit once archived: the resolver's Thread tracks the archived flag.
+                return await self.thread_resolver.archive(
+                    thread_id, self.outbound, wanted=lambda: self._still_idle(user_id)
+                )
+
+        results = await asyncio.gather(
+            *(archive(user_id, thread_id) for user_id, thread_id in threads), return_exceptions=True
+        )
+        for (_, thread_id), result in zip(threads, results):
+            if isinstance(result, Exception):
+                print(f"Failed to archive thread {thread_id}: {result}")
+        return sum(1 for result in results if result is True)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "sweeps": self.sweeps,
+            "players_evicted": self.players_evicted,
+            "threads_archived": self.threads_archived,
+            "combat_cleared": self.combat_cleared,
+            "bytes_reclaimed": self.bytes_reclaimed,
+            "last_sweep_seconds": self.last_sweep_seconds,
+            "cached_players": len(self.data_manager.cache),
+            "resident_bytes": resident_memory_bytes() or 0,
+        }
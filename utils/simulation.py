@@ -0,0 +1,272 @@
+"""Headless game simulation.
+
+Drives ``GameLogic`` for many simulated players without Discord, using a
+seeded RNG so runs are reproducible. Used for balance checks and by the
+benchmark suite (``python -m benchmarks.run``). Can also be run directly::
+
+    python -m utils.simulation --players 500 --actions 400 --seed 1
+"""
+from __future__ import annotations
+
+import argparse
+import functools
+import random
+import time
+import tracemalloc
+from array import array
+from typing import Any, Callable
+
+from models.dungeon import Monster
+from models.player import Item, ItemDef, Player
+from utils.game_logic import GameLogic
+
+# GameLogic entry points the commands use; these are timed individually.
+PROFILED_FUNCTIONS: tuple[str, ...] = (
+    "initialize_player",
+    "generate_event",
+    "calculate_damage",
+    "calculate_monster_attack",
+    "attempt_escape",
+    "handle_monster_defeat",
+    "handle_game_over",
+    "apply_item_effect",
+)
+
+HEAL_THRESHOLD = 0.35  # drink a potion below this HP ratio
+ESCAPE_THRESHOLD = 0.15  # try to run below this HP ratio with nothing to drink
+
+
+class FunctionProfile:
+    """Per-call latencies (ns) of one GameLogic function."""
+    __slots__ = ("name", "samples")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.samples = array("q")
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return float(ordered[min(len(ordered) - 1, int(q * len(ordered)))])
+
+    def summary(self) -> dict[str, float]:
+        calls = len(self.samples)
+        return {
+            "calls": calls,
+            "mean_ns": sum(self.samples) / calls if calls else 0.0,
+            "p50_ns": self.percentile(0.50),
+            "p95_ns": self.percentile(0.95),
+            "p99_ns": self.percentile(0.99),
+        }
+
+
+def _profile(game_logic: GameLogic) -> dict[str, FunctionProfile]:
+    """Shadow the profiled methods on this instance with timing wrappers."""
+    profiles: dict[str, FunctionProfile] = {}
+    for name in PROFILED_FUNCTIONS:
+        profile = profiles[name] = FunctionProfile(name)
+        setattr(game_logic, name, _timed(getattr(game_logic, name), profile.samples))
+    return profiles
+
+
+def _timed(func: Callable[..., Any], samples: array) -> Callable[..., Any]:
+    clock = time.perf_counter_ns
+    record = samples.append
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        start = clock()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record(clock() - start)
+
+    return wrapper
+
+
+class SimulationReport:
+    """Results of one ``Simulation.run``."""
+    __slots__ = (
+        "players", "actions", "metres", "seconds", "fights", "wins", "escapes", "deaths",
+        "max_distance", "profiles", "alloc_peak_bytes", "alloc_bytes_per_action",
+    )
+
+    def __init__(self) -> None:
+        self.players = 0
+        self.actions = 0
+        self.metres = 0
+        self.seconds = 0.0
+        self.fights = 0
+        self.wins = 0
+        self.escapes = 0
+        self.deaths = 0
+        self.max_distance = 0
+        self.profiles: dict[str, FunctionProfile] = {}
+        self.alloc_peak_bytes: int | None = None
+        self.alloc_bytes_per_action: float | None = None
+
+    @property
+    def actions_per_second(self) -> float:
+        return self.actions / self.seconds if self.seconds else 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "players": self.players,
+            "actions": self.actions,
+            "metres": self.metres,
+            "seconds": self.seconds,
+            "actions_per_second": self.actions_per_second,
+            "fights": self.fights,
+            "wins": self.wins,
+            "escapes": self.escapes,
+            "deaths": self.deaths,
+            "max_distance": self.max_distance,
+            "alloc_peak_bytes": self.alloc_peak_bytes,
+            "alloc_bytes_per_action": self.alloc_bytes_per_action,
+            "profile": {name: p.summary() for name, p in self.profiles.items()},
+        }
+
+    def format(self) -> str:
+        lines = [
+            f"players={self.players} actions={self.actions} metres={self.metres} "
+            f"time={self.seconds:.3f}s ({self.actions_per_second:,.0f} actions/s)",
+            f"fights={self.fights} wins={self.wins} escapes={self.escapes} deaths={self.deaths} "
+            f"max_distance={self.max_distance}m",
+        ]
+        if self.alloc_peak_bytes is not None:
+            lines.append(
+                f"alloc: peak={self.alloc_peak_bytes / 1024:.1f} KiB, "
+                f"net {self.alloc_bytes_per_action:.1f} B/action"
+            )
+        if self.profiles:
+            lines.append(f"{'function':<26}{'calls':>9}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}  (ns)")
+            for name, profile in self.profiles.items():
+                s = profile.summary()
+                lines.append(
+                    f"{name:<26}{s['calls']:>9}{s['mean_ns']:>10.0f}{s['p50_ns']:>10.0f}"
+                    f"{s['p95_ns']:>10.0f}{s['p99_ns']:>10.0f}"
+                )
+        return "\n".join(lines)
+
+
+class Simulation:
+    """Round-robin driver: every player takes one action per round.
+
+    An action is what one command would do: a 1m advance out of combat, or
+    one heal / escape attempt / attack exchange in combat.
+    """
+
+    def __init__(self, players: int, seed: int = 0, profile: bool = True) -> None:
+        self.game_logic = GameLogic(random.Random(seed))
+        self.profiles = _profile(self.game_logic) if profile else {}
+        self.players: list[Player] = [self.game_logic.initialize_player(i) for i in range(players)]
+        self.report = SimulationReport()
+        self.report.players = players
+        self.report.profiles = self.profiles
+
+    def step(self, player: Player) -> None:
+        game_logic = self.game_logic
+        report = self.report
+        report.actions += 1
+        if not player.in_combat:
+            player.distance += 1
+            report.metres += 1
+            event = game_logic.generate_event(player)
+            if event["type"] == "item":
+                self._pick_up(player, event["item"])
+            elif event["type"] == "monster":
+                player.in_combat = True
+                player.current_monster = event["monster"]
+                report.fights += 1
+            if player.distance > report.max_distance:
+                report.max_distance = player.distance
+            return
+
+        monster = player.current_monster
+        hp_ratio = player.hp / player.max_hp
+        if hp_ratio < HEAL_THRESHOLD:
+            potion = next((i for i in player.inventory if i.definition.effect == "heal"), None)
+            if potion is not None:
+                game_logic.apply_item_effect(potion.name, player)
+                game_logic.consume_item(potion.name, player)
+                self._counter_attack(player, monster)
+                return
+            if hp_ratio < ESCAPE_THRESHOLD:
+                escaped, _ = game_logic.attempt_escape(player, monster)
+                if escaped:
+                    player.in_combat = False
+                    player.current_monster = None
+                    report.escapes += 1
+                else:
+                    self._counter_attack(player, monster)
+                return
+
+        monster.hp = max(0, monster.hp - game_logic.calculate_damage(player, monster))
+        if monster.hp <= 0:
+            game_logic.handle_monster_defeat(player, monster)
+            player.in_combat = False
+            player.current_monster = None
+            report.wins += 1
+            return
+        self._counter_attack(player, monster)
+
+    @staticmethod
+    def _pick_up(player: Player, item_def: ItemDef) -> None:
+        """Take the item, equipping it straight away if it beats the current gear."""
+        if item_def.slot is None:
+            player.add_item(item_def)
+            return
+        current = player.equipped_items.get(item_def.slot)
+        if current is None or item_def.value > current.value:
+            if current is not None:
+                player.inventory.append(current)
+            player.equipped_items[item_def.slot] = Item(item_def)
+        else:
+            player.add_item(item_def)
+
+    def _counter_attack(self, player: Player, monster: Monster) -> None:
+        player.hp = max(0, player.hp - self.game_logic.calculate_monster_attack(monster, player))
+        if player.hp <= 0:
+            self.game_logic.handle_game_over(player)
+            self.report.deaths += 1
+
+    def run(self, actions_per_player: int, trace_allocations: bool = False) -> SimulationReport:
+        players = self.players
+        step = self.step
+        if trace_allocations:
+            tracemalloc.start()
+            base, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        for _ in range(actions_per_player):
+            for player in players:
+                step(player)
+        self.report.seconds += time.perf_counter() - start
+        if trace_allocations:
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.report.alloc_peak_bytes = peak - base
+            self.report.alloc_bytes_per_action = (current - base) / max(1, self.report.actions)
+        return self.report
+
+
+def run_simulation(
+    players: int, actions_per_player: int, seed: int = 0, profile: bool = True, trace_allocations: bool = False
+) -> SimulationReport:
+    return Simulation(players, seed, profile).run(actions_per_player, trace_allocations)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Run a headless GameLogic simulation.")
+    parser.add_argument("--players", type=int, default=500)
+    parser.add_argument("--actions", type=int, default=400, help="actions per player")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-profile", action="store_true", help="skip per-function timing")
+    parser.add_argument("--allocations", action="store_true", help="trace allocations (slower)")
+    args = parser.parse_args(argv)
+    report = run_simulation(args.players, args.actions, args.seed, not args.no_profile, args.allocations)
+    print(report.format())
+
+
+if __name__ == "__main__":
+    main()
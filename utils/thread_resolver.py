@@ -0,0 +1,246 @@
+"""Cached lookup of players' adventure threads.
+
+``bot.get_channel`` only knows active threads: Discord drops a thread from
+the gateway cache once it is archived, and private threads the bot has not
+seen since startup are not cached at all. Falling back to
+``bot.fetch_channel`` then costs a REST round trip on every ``/m`` and
+raises for deleted threads. ``ThreadResolver`` keeps the ``Thread`` objects
+it has seen (archived or not), remembers ids that came back missing or
+forbidden for ``THREAD_NEGATIVE_TTL`` seconds, and stays current from
+gateway thread events, so REST is only used for a thread's first lookup.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Callable
+
+import discord
+from discord.ext import commands
+
+import config
+from utils.metrics import timed_phase
+from utils.outbound import OutboundScheduler, Priority, channel_route
+
+MISSING = "missing"
+FORBIDDEN = "forbidden"
+
+
+class ThreadResolver:
+    """Thread id → ``discord.Thread`` with negative caching and on-demand unarchiving.
+
+    One instance per bot (``bot.thread_resolver``); it registers its own
+    gateway listeners.
+    """
+
+    def __init__(
+        self,
+        bot: commands.Bot,
+        capacity: int = config.THREAD_CACHE_SIZE,
+        negative_ttl: float = config.THREAD_NEGATIVE_TTL,
+    ) -> None:
+        self.bot = bot
+        self.capacity = capacity
+        self.negative_ttl = negative_ttl
+        self._threads: OrderedDict[int, discord.Thread] = OrderedDict()
+        self._negative: dict[int, tuple[float, str]] = {}  # thread id -> (expires at, reason)
+        self._fetches: dict[int, asyncio.Task[discord.Thread | None]] = {}
+        self.hits = 0
+        self.gateway_hits = 0
+        self.negative_hits = 0
+        self.fetches = 0
+        self.unarchives = 0
+        self.archives = 0
+        for event in (
+            self.on_thread_join, self.on_thread_update, self.on_thread_remove,
+            self.on_raw_thread_delete, self.on_guild_channel_delete, self.on_guild_remove,
+        ):
+            bot.add_listener(event)
+
+    # --- lookups ---
+
+    async def resolve(self, thread_id: int | None, *, unarchive: bool = False) -> discord.Thread | None:
+        """Return the thread, or None if it is gone or the bot cannot see it.
+
+        With ``unarchive=True`` an archived thread is reopened first so it can
+        be posted in.
+        """
+        if thread_id is None:
+            return None
+        thread = self._threads.get(thread_id)
+        if thread is not None:
+            self._threads.move_to_end(thread_id)
+            self.hits += 1
+        else:
+            thread = self._from_gateway(thread_id)
+            if thread is None:
+                if self.negative_reason(thread_id) is not None:
+                    self.negative_hits += 1
+                    return None
+                thread = await self._fetch(thread_id)
+                if thread is None:
+                    return None
+        if unarchive and thread.archived:
+            thread = await self._unarchive(thread)
+        return thread
+
+    def negative_reason(self, thread_id: int) -> str | None:
+        """``MISSING`` or ``FORBIDDEN`` while a failed lookup is still cached, else None."""
+        entry = self._negative.get(thread_id)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._negative[thread_id]
+            return None
+        return entry[1]
+
+    def _from_gateway(self, thread_id: int) -> discord.Thread | None:
+        channel = self.bot.get_channel(thread_id)
+        if not isinstance(channel, discord.Thread):
+            return None
+        self.gateway_hits += 1
+        self.remember(channel)
+        return channel
+
+    @timed_phase("thread")
+    async def _fetch(self, thread_id: int) -> discord.Thread | None:
+        # Concurrent lookups of the same id share one REST call.
+        task = self._fetches.get(thread_id)
+        if task is None:
+            task = self._fetches[thread_id] = asyncio.ensure_future(self._fetch_once(thread_id))
+            task.add_done_callback(lambda _: self._fetches.pop(thread_id, None))
+        return await asyncio.shield(task)
+
+    async def _fetch_once(self, thread_id: int) -> discord.Thread | None:
+        self.fetches += 1
+        try:
+            channel = await self.bot.fetch_channel(thread_id)
+        except discord.NotFound:
+            self.forget(thread_id, MISSING)
+            return None
+        except discord.Forbidden:
+            self.forget(thread_id, FORBIDDEN)
+            return None
+        except discord.HTTPException as e:
+            # Transient (5xx, rate limit): not cached either way.
+            print(f"Failed to fetch thread {thread_id}: {e}")
+            return None
+        if not isinstance(channel, discord.Thread):
+            self.forget(thread_id, MISSING)
+            return None
+        self.remember(channel)
+        return channel
+
+    @timed_phase("thread")
+    async def _unarchive(self, thread: discord.Thread) -> discord.Thread:
+        try:
+            thread = await thread.edit(archived=False)
+        except discord.HTTPException as e:
+            # Locked or no permission: hand back the archived thread; sending may still work.
+            print(f"Failed to unarchive thread {thread.id}: {e}")
+            return thread
+        self.unarchives += 1
+        self.remember(thread)
+        return thread
+
+    async def archive(
+        self,
+        thread_id: int | None,
+        outbound: OutboundScheduler,
+        *,
+        wanted: Callable[[], bool] | None = None,
+    ) -> bool:
+        """Archive the thread if it is still open (idle adventures); True if it was archived now.
+
+        The edit is queued on ``outbound`` behind everything else (``Priority.LOG``);
+        ``wanted`` is asked again when its turn comes, and the edit is dropped if
+        it says no (e.g. the player came back while it waited).
+        """
+        thread = await self.resolve(thread_id)
+        if thread is None or thread.archived:
+            return False
+
+        async def edit() -> discord.Thread | None:
+            current = self._threads.get(thread.id, thread)
+            if current.archived or (wanted is not None and not wanted()):
+                return None
+            return await current.edit(archived=True)
+
+        try:
+            archived = await outbound.call(channel_route(thread.id), edit, priority=Priority.LOG)
+        except discord.HTTPException as e:
+            print(f"Failed to archive thread {thread.id}: {e}")
+            return False
+        if archived is None:
+            return False
+        self.archives += 1
+        self.remember(archived)
+        return True
+
+    # --- cache maintenance ---
+
+    def remember(self, thread: discord.Thread) -> None:
+        """Cache a thread we know exists, e.g. one just created by ``/start``."""
+        self._negative.pop(thread.id, None)
+        self._threads[thread.id] = thread
+        self._threads.move_to_end(thread.id)
+        while len(self._threads) > self.capacity:
+            self._threads.popitem(last=False)
+
+    def forget(self, thread_id: int, reason: str | None = None) -> None:
+        """Drop a cached thread; with a ``reason``, also cache the failure for the TTL."""
+        self._threads.pop(thread_id, None)
+        if reason is not None:
+            now = time.monotonic()
+            if len(self._negative) >= self.capacity:
+                self._negative = {k: v for k, v in self._negative.items() if v[0] > now}
+            self._negative[thread_id] = (now + self.negative_ttl, reason)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "size": len(self._threads),
+            "negative": len(self._negative),
+            "hits": self.hits,
+            "gateway_hits": self.gateway_hits,
+            "negative_hits": self.negative_hits,
+            "fetches": self.fetches,
+            "unarchives": self.unarchives,
+            "archives": self.archives,
+        }
+
+    # --- gateway events ---
+
+    def _tracks(self, thread_id: int) -> bool:
+        # Only threads someone asked for; other threads in the guild are not our business.
+        return thread_id in self._threads or thread_id in self._negative
+
+    async def on_thread_join(self, thread: discord.Thread) -> None:
+        # Fired when the bot is added to a thread and when an uncached thread is unarchived.
+        if self._tracks(thread.id):
+            self.remember(thread)
+
+    async def on_thread_update(self, before: discord.Thread, after: discord.Thread) -> None:
+        # Archiving removes the thread from the gateway cache but not from ours.
+        if self._tracks(after.id):
+            self.remember(after)
+
+    async def on_thread_remove(self, thread: discord.Thread) -> None:
+        # The bot lost sight of the thread (e.g. removed from a private thread);
+        # the next lookup refetches and learns why.
+        self.forget(thread.id)
+
+    async def on_raw_thread_delete(self, payload: discord.RawThreadDeleteEvent) -> None:
+        # Fired for every thread in the guild: only ours are worth remembering as missing.
+        if self._tracks(payload.thread_id):
+            self.forget(payload.thread_id, MISSING)
+
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel) -> None:
+        for thread_id, thread in list(self._threads.items()):
+            if thread.parent_id == channel.id:
+                self.forget(thread_id, MISSING)
+
+    async def on_guild_remove(self, guild: discord.Guild) -> None:
+        for thread_id, thread in list(self._threads.items()):
+            if thread.guild.id == guild.id:
+                self.forget(thread_id, FORBIDDEN)